@@ -1,32 +1,79 @@
 from dotenv import load_dotenv
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request,Depends
+from fastapi import APIRouter, FastAPI, UploadFile, File, HTTPException, Request,Depends
 from fastapi.params import Query
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security  import HTTPBasic, HTTPBasicCredentials
-from ultralytics import YOLO
 from PIL import Image
+import cv2
+import numpy as np
 import os
 import uuid
 import shutil
 import time
+import asyncio
+import functools
+import json
+import hashlib
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 from typing import Annotated
 
-from db import get_db,engine
+from db import get_db,engine,SessionLocal,DB_ASYNC,AsyncSessionLocal,async_engine,get_async_db,read_engine,read_your_writes
 from models import Base
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import repository
+import async_repository
+from batcher import InferenceBatcher
+from worker_pool import ProcessInferencePool
+from model_loader import ModelLoader, load_yolo
+from jobs import JobWorkerPool
+from auth import CredentialCache
+from migrations import run_migrations
+from disk_cache import DiskLRUCache
+from image_variants import MAX_VARIANT_DIMENSION, VARIANT_FORMATS, render_variant, variant_key
+from http_cache import cached_file_response
+from uploader import BackgroundUploader
+from s3_transfer import create_client, transfer_config
+from s3_resolver import KeyResolver
+from write_behind import WRITE_BEHIND, WriteBehindQueue
 
 # S3 additions
-import boto3
 from botocore.exceptions import ClientError
 from mimetypes import guess_type
 
-# Disable GPU usage
-import torch
-torch.cuda.is_available = lambda: False
-
 load_dotenv() 
-app = FastAPI()
+
+def _warm_slots(image, runs):
+    # every executor thread's model copy, or every worker process, not just the first
+    if INFERENCE_MODE == "process":
+        return model_loader.get().warm_up(image, runs, **batcher.infer_kwargs)
+    return batcher.warm_up(image, runs)
+
+def _warm_up():
+    try:
+        model_loader.warm_up(_warm_slots)
+    except Exception:
+        pass  # logged by the loader; /ready keeps answering 503
+
+@asynccontextmanager
+async def lifespan(app):
+    # pick up jobs queued before this process started
+    job_workers.start()
+    # load and warm up the model in the background: /health answers right away,
+    # /ready only once the first inferences have run
+    threading.Thread(target=_warm_up, name="model-warmup", daemon=True).start()
+    yield
+    job_workers.stop()
+    s3_uploader.shutdown()
+    if write_behind is not None:
+        write_behind.stop()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 security=HTTPBasic()
 
@@ -40,7 +87,10 @@ AWS_S3_BUCKET = os.environ.get("AWS_S3_BUCKET")
 
 s3_client = None
 if AWS_REGION and AWS_S3_BUCKET:
-    s3_client = boto3.client("s3", region_name=AWS_REGION)
+    s3_client = create_client(AWS_REGION)
+# multipart threshold/chunk size and per-transfer concurrency (see s3_transfer.py);
+# boto3 is only imported when S3 is configured
+S3_TRANSFER_CONFIG = transfer_config() if s3_client is not None else None
 
 
 def _s3_required():
@@ -52,36 +102,28 @@ def _upload_to_s3(local_path: str, key: str):
     ctype, _ = guess_type(local_path)
     extra = {"ContentType": ctype or "application/octet-stream"}
     try:
-        s3_client.upload_file(local_path, AWS_S3_BUCKET, key, ExtraArgs=extra)
+        s3_client.upload_file(local_path, AWS_S3_BUCKET, key, ExtraArgs=extra, Config=S3_TRANSFER_CONFIG)
     except ClientError as e:
         raise HTTPException(status_code=502, detail=f"S3 upload failed: {e.response['Error']['Message']}")
+    s3_resolver.forget(key)
 
 def _download_from_s3(key: str, local_path: str):
     _s3_required()
     try:
-        s3_client.download_file(AWS_S3_BUCKET, key, local_path)
+        s3_client.download_file(AWS_S3_BUCKET, key, local_path, Config=S3_TRANSFER_CONFIG)
     except ClientError as e:
         if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
             raise HTTPException(status_code=404, detail="Image key not found in S3")
         raise HTTPException(status_code=502, detail=f"S3 download failed: {e.response['Error']['Message']}")
 
-def _object_exists(key: str) -> bool:
-    _s3_required()
-    try:
-        s3_client.head_object(Bucket=AWS_S3_BUCKET, Key=key)
-        return True
-    except ClientError as e:
-        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
-            return False
-        raise
-
 def _copy_s3_object(source_key: str, dest_key: str):
     _s3_required()
     try:
         s3_client.copy(
             {"Bucket": AWS_S3_BUCKET, "Key": source_key},
             AWS_S3_BUCKET,
-            dest_key
+            dest_key,
+            Config=S3_TRANSFER_CONFIG,
         )
     except ClientError as e:
         raise HTTPException(status_code=502, detail=f"S3 copy failed: {e.response['Error']['Message']}")
@@ -89,14 +131,54 @@ def _copy_s3_object(source_key: str, dest_key: str):
  
 
 # Download the AI model (tiny model ~6MB)
-model = YOLO("yolov8n.pt")  
+MODEL_WEIGHTS = "yolov8n.pt"
+
+# Inference gets its own executor so slow model calls never use up the
+# AnyIO threadpool that serves the light endpoints. File, DB and S3 work
+# done by /predict runs on a separate I/O executor.
+# INFERENCE_MODE=process moves the forward passes into INFERENCE_WORKERS
+# worker processes (TORCH_THREADS_PER_WORKER intra-op threads each).
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+TORCH_THREADS_PER_WORKER = int(os.getenv("TORCH_THREADS_PER_WORKER", "1"))
+IO_WORKERS = int(os.getenv("IO_WORKERS", "8"))
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+
+# The model (and torch with it) is loaded by the startup hook, or by the first
+# request when the app runs without one, never at import
+if INFERENCE_MODE == "process":
+    model_loader = ModelLoader(lambda: ProcessInferencePool(MODEL_WEIGHTS, INFERENCE_WORKERS, TORCH_THREADS_PER_WORKER),
+                               weights=MODEL_WEIGHTS)
+    model_factory = None  # the pool is safe to call from several threads
+else:
+    model_loader = ModelLoader(lambda: load_yolo(MODEL_WEIGHTS), weights=MODEL_WEIGHTS)
+    model_factory = (lambda: load_yolo(MODEL_WEIGHTS)) if INFERENCE_WORKERS > 1 else None
+def get_model():
+    return model_loader.get()
+
+# Concurrent /predict calls are grouped into batched forward passes
+batcher = InferenceBatcher(
+    model_loader,
+    executor=inference_executor,
+    max_in_flight=INFERENCE_WORKERS,
+    model_factory=model_factory,
+    device="cpu",
+)
 
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
+
+# Recently verified credentials skip the users query and the hash check
+credential_cache = CredentialCache()
 
 def verify_user(credentials: Annotated[HTTPBasicCredentials, Depends(security)],db: Session = Depends(get_db)):
     username = credentials.username.strip()
     password = credentials.password.strip()
 
+    if credential_cache.get(username, password):
+        return username
+
     user=repository.query_user_by_credentials(db,username,password)
     if not user:
         raise HTTPException(
@@ -104,8 +186,82 @@ def verify_user(credentials: Annotated[HTTPBasicCredentials, Depends(security)],
             detail="Invalid username or password",
             headers={"WWW-Authenticate": "Basic"},
         )
+    credential_cache.add(username, password)
     return username
 
+def get_read_db(request: Request, username: Annotated[str, Depends(verify_user)], db: Session = Depends(get_db)):
+    """
+    Session for read-only queries: a replica, unless the caller wrote within
+    READ_YOUR_WRITES_SECONDS (or the uid in the path was just written), in
+    which case the primary session from get_db
+    """
+    bind = read_engine()
+    if bind is engine or read_your_writes.pinned(username, request.path_params.get("uid")):
+        yield db
+        return
+    replica = SessionLocal(bind=bind)
+    try:
+        yield replica
+    finally:
+        replica.close()
+
+async def verify_user_async(credentials: Annotated[HTTPBasicCredentials, Depends(security)],
+                            db: AsyncSession = Depends(get_async_db)):
+    """
+    verify_user for the async read endpoints
+    """
+    username = credentials.username.strip()
+    password = credentials.password.strip()
+
+    if credential_cache.get(username, password):
+        return username
+
+    user = await async_repository.query_user_by_credentials(db, username, password)
+    if not user:
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid username or password",
+            headers={"WWW-Authenticate": "Basic"},
+        )
+    credential_cache.add(username, password)
+    return username
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+def _model_signature():
+    # Results are reused only for the same content, weights, library version and
+    # inference parameters. The weights are hashed once loaded, never at import.
+    return "{}:{}".format(model_loader.signature, json.dumps(batcher.infer_kwargs, sort_keys=True))
+
+dedup_stats = {"hits": 0, "misses": 0}
+
+# Annotated images can be left out of /predict and rendered on first request
+# from the original and the stored detections, into a size-bounded cache
+RENDER_ON_PREDICT = os.getenv("RENDER_ON_PREDICT", "1") == "1"
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR", "uploads/rendered")
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+render_cache = DiskLRUCache(RENDER_CACHE_DIR, RENDER_CACHE_MAX_BYTES)
+
+# Resized / re-encoded image variants served by the image endpoints
+VARIANT_CACHE_DIR = os.getenv("VARIANT_CACHE_DIR", "uploads/variants")
+VARIANT_CACHE_MAX_BYTES = int(os.getenv("VARIANT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+variant_cache = DiskLRUCache(VARIANT_CACHE_DIR, VARIANT_CACHE_MAX_BYTES)
+
+# Local read-through copy of S3 images fetched with ?img=, keyed by bucket, key and ETag
+S3_CACHE_DIR = os.getenv("S3_CACHE_DIR", "uploads/s3_cache")
+S3_CACHE_MAX_BYTES = int(os.getenv("S3_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+s3_cache = DiskLRUCache(S3_CACHE_DIR, S3_CACHE_MAX_BYTES)
+s3_cache_stats = {"requests": 0, "downloads": 0, "bytes_saved": 0}
+_stats_lock = threading.Lock()
+
+def _count(stats, key, amount=1):
+    with _stats_lock:
+        stats[key] += amount
+
+def _snapshot(stats):
+    with _stats_lock:
+        return dict(stats)
+
 
 #for the "Depends" statement in predict()
 async def optional_auth(request: Request):
@@ -114,10 +270,445 @@ async def optional_auth(request: Request):
         return None  # No credentials provided
     return await security(request)
 
+async def _run_io(func, *args, **kwargs):
+    """
+    Run blocking file/DB/S3 work on the I/O executor
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(func, *args, **kwargs))
+
+def _optional_user(credentials, db):
+    if not credentials:
+        return None
+    try:
+        return verify_user(credentials, db)
+    except HTTPException:
+        return None  # anonymous if invalid
+
+def _head_etag(key):
+    """
+    ETag of an S3 object, or None if it does not exist
+    """
+    _s3_required()
+    try:
+        return s3_client.head_object(Bucket=AWS_S3_BUCKET, Key=key)["ETag"].strip('"')
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise HTTPException(status_code=502, detail=f"S3 lookup failed: {e.response['Error']['Message']}")
+
+# Existence (and ETag) of S3 keys, remembered for S3_EXISTS_TTL / S3_MISSING_TTL seconds
+s3_resolver = KeyResolver(_head_etag)
+s3_copy_stats = {"copies": 0, "copy_failures": 0}
+_pending_copies = set()
+_pending_copies_lock = threading.Lock()
+
+def _copy_into_prefix(source_key, dest_key):
+    try:
+        _copy_s3_object(source_key, dest_key)
+        _count(s3_copy_stats, "copies")
+    except Exception:
+        _count(s3_copy_stats, "copy_failures")
+    finally:
+        s3_resolver.forget(dest_key)
+        with _pending_copies_lock:
+            _pending_copies.discard(dest_key)
+
+def _schedule_copy(source_key, dest_key):
+    """
+    Copy a fallback object into the user's prefix in the background, once per destination
+    """
+    with _pending_copies_lock:
+        if dest_key in _pending_copies:
+            return
+        _pending_copies.add(dest_key)
+    io_executor.submit(_copy_into_prefix, source_key, dest_key)
+
+def _download_cached(key: str, local_path: str, etag=None):
+    """
+    _download_from_s3 through the local S3 cache. The object's ETag is part of
+    the cache key, so a replaced object is never served stale; concurrent
+    misses on the same object share one download. Without an etag the object
+    is looked up first.
+    """
+    if etag is None:
+        etag = _head_etag(key)
+        if etag is None:
+            raise HTTPException(status_code=404, detail="Image key not found in S3")
+    raw = f"{AWS_S3_BUCKET}/{key}\0{etag}"
+    cache_key = hashlib.sha256(raw.encode()).hexdigest()[:32] + os.path.splitext(key)[1]
+    downloaded = []
+
+    def produce(tmp_path):
+        _download_from_s3(key, tmp_path)
+        downloaded.append(True)
+
+    _count(s3_cache_stats, "requests")
+    path = s3_cache.get_or_create(cache_key, produce)
+    try:
+        _link_or_copy(path, local_path)
+    except FileNotFoundError:
+        # evicted in between
+        _download_from_s3(key, local_path)
+        downloaded.append(True)
+    if downloaded:
+        _count(s3_cache_stats, "downloads")
+    else:
+        _count(s3_cache_stats, "bytes_saved", os.path.getsize(local_path))
+
+def _fetch_s3_image(img, username, user_folder, original_path):
+    """
+    Download <user_folder>/original/<img>; authenticated users fall back to
+    the anonymous pool and the bucket root. A fallback object is downloaded
+    directly while it is copied into the user's prefix in the background.
+    """
+    original_key = f"{user_folder}/original/{img}"
+    candidates = [original_key]
+    if username:
+        candidates += [
+            f"anonymous/original/{img}",  # from anonymous pool
+            img  # root level object (legacy placement)
+        ]
+    # revalidate a cached ETag: it keys the download cache, so a stale one
+    # would serve an object replaced in the bucket until S3_EXISTS_TTL passes
+    key, etag = s3_resolver.resolve(candidates, fresh=True)
+    if key is None:
+        raise HTTPException(status_code=404, detail="Image key not found in S3")
+    try:
+        _download_cached(key, original_path, etag)
+    except HTTPException as e:
+        if e.status_code == 404:
+            # deleted since it was looked up
+            s3_resolver.forget(key)
+        raise
+    if key != original_key:
+        _schedule_copy(key, original_key)
+
+def _save_upload(fileobj, original_path):
+    """
+    Copy the upload to disk, hashing it on the way; returns the sha256 hex digest
+    """
+    digest = hashlib.sha256()
+    with open(original_path, "wb") as f:
+        while chunk := fileobj.read(COPY_CHUNK_SIZE):
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+def _read_upload(fileobj):
+    """
+    Read the spooled upload into memory; returns (bytes, sha256 hex digest)
+    """
+    data = fileobj.read()
+    return data, hashlib.sha256(data).hexdigest()
+
+def _write_bytes(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+def _decode_image(data):
+    """
+    Decode encoded image bytes into the BGR array the model takes
+    """
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise HTTPException(status_code=400, detail="Could not decode image")
+    return image
+
+def _check_image_file(path):
+    """
+    Reject a file no image decoder recognises (only its header is read), so it
+    fails its own request instead of the shared batch it would be decoded in
+    """
+    if not cv2.haveImageReader(path):
+        raise HTTPException(status_code=400, detail="Could not decode image")
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(COPY_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _save_frame(annotated_frame, predicted_path):
+    annotated_image = Image.fromarray(annotated_frame)
+    annotated_image.save(predicted_path)
+
+def _save_annotated(result, predicted_path):
+    _save_frame(result.plot(), predicted_path)
+
+def _render_detections(image, detections):
+    """
+    Draw stored (label, score, box) detections on a BGR image exactly like Results.plot()
+    """
+    import torch
+    from ultralytics.engine.results import Results
+
+    names = get_model().names
+    class_ids = {name: idx for idx, name in names.items()}
+    rows = [[*box, score, class_ids.get(label, 0)] for label, score, box in detections]
+    boxes = torch.tensor(rows, dtype=torch.float32).reshape(-1, 6)
+    return Results(orig_img=image, path="", names=names, boxes=boxes).plot()
+
+def _render_to(path, original_path, detections):
+    image = cv2.imread(original_path)
+    if image is None:
+        raise HTTPException(status_code=404, detail="Predicted image file not found")
+    _save_frame(_render_detections(image, detections), path)
+
+def _detections_from_result(result):
+    """
+    (label, score, [x1, y1, x2, y2]) for every box, converted in one pass
+    """
+    boxes = result.boxes
+    return [
+        (result.names[int(cls)], float(conf), bbox)
+        for cls, conf, bbox in zip(boxes.cls.tolist(), boxes.conf.tolist(), boxes.xyxy.tolist())
+    ]
+
+def _write_pending(sessions):
+    with SessionLocal() as db:
+        repository.write_pending_sessions(sessions, db)
+    # the replicas see these later than the primary
+    for session in sessions:
+        read_your_writes.wrote(session.get("username"), [session["uid"]])
+
+# WRITE_BEHIND=1: sessions are journaled and buffered, and a single background
+# writer stores them in batches, so /predict does not wait on the database
+write_behind = WriteBehindQueue(_write_pending) if WRITE_BEHIND else None
+
+def _record_upload(uid, error):
+    status = "failed" if error else "uploaded"
+    if write_behind is not None and write_behind.update(uid, upload_status=status, upload_error=error):
+        return
+    with SessionLocal() as db:
+        repository.update_upload_status(uid, status, db, error=error)
+
+# Images are uploaded to S3 after the response; the outcome lands on the session's upload_status
+s3_uploader = BackgroundUploader(_upload_to_s3, _record_upload)
+
+def _link_or_copy(source, dest):
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copyfile(source, dest)
+
+def _find_duplicates(items, db):
+    """
+    Look for an earlier session on the same content, model and parameters for
+    each item. The lookups run one after another here because they share the
+    request's Session, which must not be used from several threads at once.
+    Returns {uid: (detections, predicted_image)} for the items with a hit.
+    """
+    found = {}
+    for item in items:
+        if item.error is not None:
+            continue
+        try:
+            duplicate = repository.query_session_by_content(item.content_hash, _model_signature(), db)
+            if duplicate is None:
+                _count(dedup_stats, "misses")
+                continue
+            objects = repository.query_get_prediction_by_uid(duplicate.uid, 'DetectionObjects', db, None)
+        except Exception as e:
+            item.error = e
+            continue
+        detections = [(obj.label, obj.score, json.loads(obj.box)) for obj in objects]
+        found[item.uid] = (detections, duplicate.predicted_image)
+    return found
+
+def _reuse_prediction(item, detections, predicted_image):
+    """
+    Reuse the detections of an earlier session found by _find_duplicates, so the
+    model is not run again, and link its annotated image to this uid (or draw
+    it from the detections if it has none)
+    """
+    item.detections = detections
+    item.deduplicated = True
+    if item.predicted_path:
+        if predicted_image and os.path.exists(predicted_image):
+            _link_or_copy(predicted_image, item.predicted_path)
+        else:
+            image = _decode_image(item.data) if item.data is not None else cv2.imread(item.original_path)
+            _save_frame(_render_detections(image, item.detections), item.predicted_path)
+    _count(dedup_stats, "hits")
+
+def _persist_items(items, username, db):
+    """
+    Store every finished item, with its detections, in a single transaction
+    (or hand them to the write-behind queue)
+    """
+    if write_behind is not None and items:
+        timestamp = datetime.now(timezone.utc)
+        write_behind.enqueue([
+            {
+                "uid": item.uid,
+                "timestamp": timestamp,
+                "username": username,
+                "original_image": item.original_path,
+                "predicted_image": item.predicted_path,
+                "detections": item.detections,
+                "content_hash": item.content_hash,
+                "model_signature": _model_signature(),
+                "upload_status": item.upload_status,
+            }
+            for item in items
+        ])
+    elif len(items) == 1:
+        item = items[0]
+        repository.save_prediction_session(
+            item.uid, item.original_path, item.predicted_path, username, db,
+            detections=item.detections, content_hash=item.content_hash, model_signature=_model_signature(),
+            upload_status=item.upload_status,
+        )
+    elif items:
+        repository.save_prediction_sessions(
+            [
+                {
+                    "uid": item.uid,
+                    "original_image": item.original_path,
+                    "predicted_image": item.predicted_path,
+                    "detections": item.detections,
+                    "content_hash": item.content_hash,
+                    "model_signature": _model_signature(),
+                    "upload_status": item.upload_status,
+                }
+                for item in items
+            ],
+            username,
+            db,
+        )
+    if items:
+        read_your_writes.wrote(username, [item.uid for item in items])
+
+class PredictionItem:
+    """
+    One image moving through the prediction pipeline
+    """
+
+    def __init__(self, name, user_folder, upload=None, img=None, uid=None, original_path=None, render=True):
+        ext = os.path.splitext(name)[1]
+        self.name = name
+        self.upload = upload
+        self.img = img
+        self.uid = uid or str(uuid.uuid4())
+        self.original_path = original_path or os.path.join(UPLOAD_DIR, self.uid + ext)
+        # None: annotated image is rendered lazily by GET /prediction/{uid}/image
+        self.predicted_path = os.path.join(PREDICTED_DIR, self.uid + ext) if render else None
+        self.original_key = f"{user_folder}/original/{name}"
+        self.predicted_key = f"{user_folder}/predicted/{name}"
+        self.content_hash = None
+        self.detections = None
+        self.deduplicated = False
+        self.data = None
+        self.write_task = None
+        self.upload_status = None
+        self.error = None
+
+    def s3_files(self):
+        # predicted_path is None when rendering was deferred
+        files = [(self.original_path, self.original_key)]
+        if self.predicted_path:
+            files.append((self.predicted_path, self.predicted_key))
+        return files
+
+    def response(self, processing_time):
+        return {
+            "prediction_uid": self.uid,
+            "detection_count": len(self.detections),
+            "labels": [label for label, _, _ in self.detections],
+            "time_took": processing_time,
+            "deduplicated": self.deduplicated,
+            "s3_original_key": self.original_key if AWS_S3_BUCKET else None,
+            "s3_predicted_key": self.predicted_key if AWS_S3_BUCKET and self.predicted_path else None,
+            "s3_upload_status": self.upload_status,
+        }
+
+    def error_entry(self):
+        if isinstance(self.error, HTTPException):
+            return {"filename": self.name, "status_code": self.error.status_code, "error": self.error.detail}
+        return {"filename": self.name, "status_code": 500, "error": str(self.error) or type(self.error).__name__}
+
+async def _gather_stage(items, stage):
+    """
+    Run stage(item) for every item still without an error, recording per-item failures
+    """
+    active = [item for item in items if item.error is None]
+    outcomes = await asyncio.gather(*(stage(item) for item in active), return_exceptions=True)
+    for item, outcome in zip(active, outcomes):
+        if isinstance(outcome, BaseException):
+            item.error = outcome
+
+async def _run_pipeline(items, username, db, dedup=True):
+    """
+    Fetch, deduplicate, infer, annotate, persist and upload a list of PredictionItems.
+    Each item ends with either detections or an error; every successful item is
+    stored in one transaction.
+    """
+    user_folder = username or "anonymous"
+
+    async def fetch(item):
+        if item.upload is not None:
+            # Keep the upload in memory: the model decodes it from the buffer and
+            # the original is written to disk in the background from the same bytes
+            item.data, item.content_hash = await _run_io(_read_upload, item.upload.file)
+            item.write_task = asyncio.ensure_future(_run_io(_write_bytes, item.original_path, item.data))
+            return
+        if item.img:
+            if os.path.splitext(item.img)[1].lower() not in [".jpg", ".jpeg", ".png"]:
+                raise HTTPException(status_code=400, detail="Unsupported image extension")
+            await _run_io(_fetch_s3_image, item.img, username, user_folder, item.original_path)
+        item.content_hash = await _run_io(_hash_file, item.original_path)
+
+    async def reuse(item):
+        await _run_io(_reuse_prediction, item, *duplicates[item.uid])
+
+    async def infer(item):
+        source = item.original_path
+        if item.data is not None:
+            source = await _run_io(_decode_image, item.data)
+        else:
+            await _run_io(_check_image_file, source)
+        result = await asyncio.wrap_future(batcher.submit(source))
+        if item.predicted_path:
+            await _run_io(_save_annotated, result, item.predicted_path)
+        item.detections = _detections_from_result(result)
+
+    await _gather_stage(items, fetch)
+    if dedup:
+        # the lookups share db, so they run on one thread; only linking and rendering fan out
+        duplicates = await _run_io(_find_duplicates, items, db)
+        await _gather_stage([item for item in items if item.uid in duplicates], reuse)
+
+    # Every image that still needs the model is queued concurrently so the batcher can group them
+    to_infer = [item for item in items if item.error is None and not item.deduplicated]
+    await _gather_stage(to_infer, infer)
+
+    # the original must be on disk before a session pointing at it is stored
+    for item in items:
+        if item.write_task is not None:
+            try:
+                await item.write_task
+            except Exception as e:
+                item.error = item.error or e
+        item.data = None
+
+    done = [item for item in items if item.error is None]
+    uploading = bool(AWS_S3_BUCKET and s3_client)
+    for item in done:
+        item.upload_status = "pending" if uploading else None
+    await _run_io(_persist_items, done, username, db)
+    # S3 uploads run in the background; the keys are reported as pending
+    if uploading:
+        await asyncio.gather(*(_run_io(s3_uploader.submit, i.uid, i.s3_files()) for i in done))
+
 @app.post("/predict")
-def predict(
+async def predict(
     file: UploadFile | None = File(None),
     img: str | None = Query(default=None, description="S3 image file name (e.g. beatles.jpeg)"),
+    mode: str = Query(default="sync", description="sync, or async to queue a job and poll GET /jobs/{job_id}"),
+    dedup: bool = Query(default=True, description="Reuse the result of an earlier prediction on identical content"),
+    render: bool = Query(default=RENDER_ON_PREDICT, description="Draw the annotated image now; if false it is rendered on first request"),
     credentials: Annotated[str | None, Depends(optional_auth)] = None,
     db: Session = Depends(get_db)
 ):
@@ -125,115 +716,135 @@ def predict(
     Predict objects in an image.
     Either upload a file OR provide ?img=<filename> to fetch from S3.
     If ?img is used, image will be downloaded from S3 at <bucket>/<user|anonymous>/original/<filename>.
-    After prediction both original and annotated images are stored locally and uploaded to S3:
+    After prediction both original and annotated images are stored locally and uploaded to S3
+    in the background (s3_upload_status is "pending" until the session records the outcome):
       <bucket>/<user|anonymous>/original/<filename>
       <bucket>/<user|anonymous>/predicted/<filename>
+    With ?mode=async the request is stored as a job and a job id is returned right away.
     """
+    if mode not in ("sync", "async"):
+        raise HTTPException(status_code=400, detail="mode must be sync or async")
     if not file and not img:
         raise HTTPException(status_code=400, detail="Provide an uploaded file or img query parameter")
     if file and img:
         raise HTTPException(status_code=400, detail="Use either file upload or img query parameter, not both")
+    if img and os.path.splitext(img)[1].lower() not in [".jpg", ".jpeg", ".png"]:
+        raise HTTPException(status_code=400, detail="Unsupported image extension")
 
-    username = None
-    if credentials:
-        try:
-            username = verify_user(credentials, db)
-        except HTTPException:
-            username = None  # anonymous if invalid
+    username = await _run_io(_optional_user, credentials, db)
+    user_folder = username or "anonymous"
+
+    start_time = time.time()
+
+    item = PredictionItem(img or file.filename, user_folder, upload=file, img=img, render=render)
+
+    if mode == "async":
+        # stage the upload next to the other originals so the job survives a restart
+        if file:
+            await _run_io(_save_upload, file.file, item.original_path)
+        job_id = str(uuid.uuid4())
+        await _run_io(repository.save_job, job_id, item.uid, item.name, img, item.original_path, username, db, dedup, render)
+        job_workers.notify()
+        return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
+
+    await _run_pipeline([item], username, db, dedup=dedup)
+    if item.error is not None:
+        raise item.error
+
+    processing_time = round(time.time() - start_time, 4)
+
+    return item.response(processing_time)
+
+@app.post("/predict/batch")
+async def predict_batch(
+    files: list[UploadFile] | None = File(None),
+    img: list[str] | None = Query(default=None, description="S3 image file names, repeat ?img= for each"),
+    dedup: bool = Query(default=True, description="Reuse the result of an earlier prediction on identical content"),
+    render: bool = Query(default=RENDER_ON_PREDICT, description="Draw the annotated images now; if false they are rendered on first request"),
+    credentials: Annotated[str | None, Depends(optional_auth)] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Predict objects in many images with one request.
+    Upload several files and/or pass ?img= several times. Credentials are checked once,
+    all images go through the model together and every session is stored in one transaction.
+    Results keep the input order; an image that fails is reported with its error
+    instead of failing the whole batch.
+    """
+    files = files or []
+    img = img or []
+    if not files and not img:
+        raise HTTPException(status_code=400, detail="Provide uploaded files or img query parameters")
 
+    username = await _run_io(_optional_user, credentials, db)
     user_folder = username or "anonymous"
 
     start_time = time.time()
 
-    if img:
-        # Use S3 image
-        ext = os.path.splitext(img)[1]
-        if ext.lower() not in [".jpg", ".jpeg", ".png"]:
-            raise HTTPException(status_code=400, detail="Unsupported image extension")
-        uid = str(uuid.uuid4())
-        original_path = os.path.join(UPLOAD_DIR, uid + ext)
-        predicted_path = os.path.join(PREDICTED_DIR, uid + ext)
+    items = [PredictionItem(upload.filename, user_folder, upload=upload, render=render) for upload in files]
+    items += [PredictionItem(name, user_folder, img=name, render=render) for name in img]
+    await _run_pipeline(items, username, db, dedup=dedup)
 
-        original_key = f"{user_folder}/original/{img}"
-        predicted_key = f"{user_folder}/predicted/{img}"
+    processing_time = round(time.time() - start_time, 4)
+
+    results = []
+    for item in items:
+        if item.error is not None:
+            results.append(item.error_entry())
+            continue
+        entry = {"filename": item.name}
+        entry.update(item.response(processing_time))
+        results.append(entry)
+    return {"results": results}
 
-        try:
-            _download_from_s3(original_key, original_path)
-        except HTTPException as e:
-            # If authenticated user and original not found, try fallback locations
-            if e.status_code == 404 and username:
-                fallback_keys = [
-                    f"anonymous/original/{img}",  # from anonymous pool
-                    img  # root level object (legacy placement)
-                ]
-                copied = False
-                for fk in fallback_keys:
-                    if _object_exists(fk):
-                        _copy_s3_object(fk, original_key)
-                        _download_from_s3(original_key, original_path)
-                        copied = True
-                        break
-                if not copied:
-                    raise  # re-raise original 404
-            else:
-                raise
-    else:
-        # ...existing code for uploaded file branch...
-        ext = os.path.splitext(file.filename)[1]
-        uid = str(uuid.uuid4())
-        original_path = os.path.join(UPLOAD_DIR, uid + ext)
-        predicted_path = os.path.join(PREDICTED_DIR, uid + ext)
-        with open(original_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-        original_filename = file.filename
-        predicted_filename = file.filename
-        original_key = f"{user_folder}/original/{original_filename}"
-        predicted_key = f"{user_folder}/predicted/{predicted_filename}"
-    # Run YOLO prediction
-    results = model(original_path, device="cpu")
-    annotated_frame = results[0].plot()
-    annotated_image = Image.fromarray(annotated_frame)
-    annotated_image.save(predicted_path)
 
-    # Persist to DB with local paths (unchanged logic)
-    repository.save_prediction_session(uid, original_path, predicted_path, username, db)
+def _run_job(job):
+    """
+    Job worker handler: runs the /predict pipeline on the worker thread's own event loop
+    """
+    start_time = time.time()
+    item = PredictionItem(
+        job.filename, job.username or "anonymous", img=job.img, uid=job.prediction_uid, original_path=job.original_path,
+        render=job.render is not False,
+    )
+    with SessionLocal() as db:
+        asyncio.run(_run_pipeline([item], job.username, db, dedup=job.dedup is not False))
+    if item.error is not None:
+        raise item.error
 
-    detected_labels = []
-    for box in results[0].boxes:
-        label_idx = int(box.cls[0].item())
-        label = model.names[label_idx]
-        score = float(box.conf[0])
-        bbox = box.xyxy[0].tolist()
-        repository.save_detection_object(uid, label, score, bbox, db)
-        detected_labels.append(label)
+    processing_time = round(time.time() - start_time, 4)
+    return item.response(processing_time)
 
-    # Upload to S3 (if configured)
-    if AWS_S3_BUCKET and s3_client:
-        try:
-            # If using img query param we keep provided name for keys
-            if img:
-                original_key = f"{user_folder}/original/{img}"
-                predicted_key = f"{user_folder}/predicted/{img}"
-            _upload_to_s3(original_path, original_key)
-            _upload_to_s3(predicted_path, predicted_key)
-        except HTTPException:
-            # Allow prediction to succeed even if S3 upload fails: could log here
-            pass
-
-    processing_time = round(time.time() - start_time, 2)
+job_workers = JobWorkerPool(_run_job, SessionLocal)
 
+@app.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    credentials: Annotated[str | None, Depends(optional_auth)] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Status of an async prediction job; includes the prediction payload once done
+    """
+    job = await _run_io(repository.query_job, job_id, db)
+    if job and job.username:
+        # jobs submitted with credentials are only visible to their owner
+        if await _run_io(_optional_user, credentials, db) != job.username:
+            job = None
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
     return {
-        "prediction_uid": uid,
-        "detection_count": len(results[0].boxes),
-        "labels": detected_labels,
-        "time_took": processing_time,
-        "s3_original_key": original_key if AWS_S3_BUCKET else None,
-        "s3_predicted_key": predicted_key if AWS_S3_BUCKET else None
+        "job_id": job.job_id,
+        "status": job.status,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
     }
 
-
 @app.get("/prediction/count")
-def get_prediction_count(username: Annotated[str, Depends(verify_user)], db: Session=Depends(get_db)):
+def get_prediction_count(username: Annotated[str, Depends(verify_user)], db: Session=Depends(get_read_db)):
     """
     Get total number of prediction sessions
     """
@@ -241,7 +852,7 @@ def get_prediction_count(username: Annotated[str, Depends(verify_user)], db: Ses
     return {"count": count}
 
 @app.get("/labels")
-def get_uniqe_labels(username: Annotated[str, Depends(verify_user)],db: Session = Depends(get_db)):
+def get_uniqe_labels(username: Annotated[str, Depends(verify_user)],db: Session = Depends(get_read_db)):
     """
     Get all unique labels from detection objects
     """
@@ -250,13 +861,13 @@ def get_uniqe_labels(username: Annotated[str, Depends(verify_user)],db: Session
 
 @app.delete("/prediction/{uid}")
 def delete_prediction(uid: str, username: Annotated[str, Depends(verify_user)], db: Session = Depends(get_db)):
-    # First, check if the prediction session exists and belongs to the user
-    dele1 = repository.query_delete_from(db, 'PredictionSession', uid, username)
-    if dele1 == 0:
+    if write_behind is not None:
+        write_behind.wait_for(uid)
+    # Only a session that exists and belongs to the user is deleted, with its
+    # detection objects and its contribution to the daily rollups
+    if repository.delete_prediction(uid, username, db) == 0:
         raise HTTPException(status_code=404, detail="Prediction not found")
-
-    # Delete detection objects (this might return 0 if no detections exist, which is valid)
-    repository.query_delete_from(db, 'DetectionObjects', uid, username)
+    read_your_writes.wrote(username, [uid])
 
     # Check for the file with any of the known image extensions
     deleted = False
@@ -270,6 +881,7 @@ def delete_prediction(uid: str, username: Annotated[str, Depends(verify_user)],
         if os.path.exists(predict_path):
             os.remove(predict_path)
             deleted = True
+        render_cache.discard(uid + ext)
 
     if not deleted:
         raise HTTPException(status_code=404, detail="Prediction file not found")
@@ -279,10 +891,13 @@ def delete_prediction(uid: str, username: Annotated[str, Depends(verify_user)],
         
 
 @app.get("/prediction/{uid}")
-def get_prediction_by_uid(uid: str,username: Annotated[str, Depends(verify_user)],db: Session = Depends(get_db)):
+def get_prediction_by_uid(uid: str,username: Annotated[str, Depends(verify_user)],db: Session = Depends(get_read_db)):
     """
     Get prediction session by uid with all detected objects
     """
+    pending = _pending_prediction(uid, username)
+    if pending is not None:
+        return pending
 
     # Get prediction session
     result = repository.query_get_prediction_by_uid(uid,'PredictionSession',db,username)
@@ -292,7 +907,27 @@ def get_prediction_by_uid(uid: str,username: Annotated[str, Depends(verify_user)
     # Get all detection objects for this prediction
     objects = repository.query_get_prediction_by_uid(uid,'DetectionObjects',db,username)
 
-    
+    return _prediction_response(result, objects)
+
+def _pending_prediction(uid, username):
+    # a session can still be waiting for the write-behind writer
+    if write_behind is None:
+        return None
+    pending = write_behind.get(uid)
+    if pending is None or pending["username"] != username:
+        return None
+    return {
+        "uid": pending["uid"],
+        "timestamp": pending["timestamp"],
+        "original_image": pending["original_image"],
+        "predicted_image": pending["predicted_image"],
+        "detection_objects": [
+            {"id": None, "label": label, "score": score, "box": [float(v) for v in box]}
+            for label, score, box in pending["detections"]
+        ]
+    }
+
+def _prediction_response(result, objects):
     return {
         "uid": result.uid,
         "timestamp": result.timestamp,
@@ -303,57 +938,325 @@ def get_prediction_by_uid(uid: str,username: Annotated[str, Depends(verify_user)
                 "id": obj.id,
                 "label": obj.label,
                 "score": obj.score,
-                "box": obj.box
+                "box": _box(obj)
             } for obj in objects
         ]
     }
 
+def _box(obj):
+    # rows written before the numeric columns existed may not be backfilled yet
+    if obj.x1 is None:
+        return json.loads(obj.box) if obj.box else None
+    return [obj.x1, obj.y1, obj.x2, obj.y2]
+
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+PageLimit = Annotated[int | None, Query(ge=1, le=MAX_PAGE_SIZE, description="Page size; the next page's cursor is returned in X-Next-Cursor")]
+PageAfter = Annotated[str | None, Query(description="X-Next-Cursor of the previous page")]
+PageStream = Annotated[bool, Query(description="Stream every matching session as NDJSON")]
+
+def _decode_cursor(after):
+    try:
+        return repository.decode_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _session_page(rows, limit, response):
+    # one extra row was fetched to tell whether there is a next page
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = repository.encode_cursor(rows[-1])
+    return [{"uid": row.uid, "timestamp": row.timestamp} for row in rows]
+
+def _ndjson_sessions(stmts, db):
+    # streams on a session of its own, against the engine the request was routed to
+    session_factory = functools.partial(SessionLocal, bind=db.get_bind())
+
+    def lines():
+        for row in repository.stream_rows(stmts, session_factory):
+            timestamp = row.timestamp.isoformat() if row.timestamp is not None else None
+            yield json.dumps({"uid": row.uid, "timestamp": timestamp}) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.get("/predictions/label/{label}")
-def get_predictions_by_label(label: str,username: Annotated[str, Depends(verify_user)],db: Session = Depends(get_db)):
+def get_predictions_by_label(label: str,username: Annotated[str, Depends(verify_user)],response: Response,
+                             db: Session = Depends(get_read_db), limit: PageLimit = None, after: PageAfter = None,
+                             stream: PageStream = False):
     """
-    Get prediction sessions containing objects with specified label
+    Get prediction sessions containing objects with specified label, newest first.
+    ?limit= pages by keyset (pass X-Next-Cursor as ?after=); ?stream=true returns NDJSON.
     """
-    rows=repository.query_get_prediction_by_label(label,db,username)    
-    return [{"uid": row.uid, "timestamp": row.timestamp} for row in rows]
+    cursor = _decode_cursor(after)
+    if stream:
+        return _ndjson_sessions(repository.predictions_by_label_stmts(label, username, after=cursor), db)
+    rows=repository.query_get_prediction_by_label(label,db,username, limit=limit and limit + 1, after=cursor)
+    return _session_page(rows, limit, response)
 
 @app.get("/predictions/score/{min_score}")
-def get_predictions_by_score(min_score: float,username: Annotated[str, Depends(verify_user)],db: Session=Depends(get_db)):
+def get_predictions_by_score(min_score: float,username: Annotated[str, Depends(verify_user)],response: Response,
+                             db: Session=Depends(get_read_db), limit: PageLimit = None, after: PageAfter = None,
+                             stream: PageStream = False):
     """
-    Get prediction sessions containing objects with score >= min_score
+    Get prediction sessions containing objects with score >= min_score, newest first.
+    ?limit= pages by keyset (pass X-Next-Cursor as ?after=); ?stream=true returns NDJSON.
     """
-    rows=repository.query_get_prediction_by_score(min_score,db,username)    
-    return [{"uid": row.uid, "timestamp": row.timestamp} for row in rows]
+    cursor = _decode_cursor(after)
+    if stream:
+        return _ndjson_sessions(repository.predictions_by_score_stmts(min_score, username, after=cursor), db)
+    rows=repository.query_get_prediction_by_score(min_score,db,username, limit=limit and limit + 1, after=cursor)
+    return _session_page(rows, limit, response)
+
+@app.get("/predictions/region")
+def get_predictions_in_region(x1: float, y1: float, x2: float, y2: float,
+                              username: Annotated[str, Depends(verify_user)], response: Response,
+                              db: Session = Depends(get_read_db), contained: bool = False,
+                              limit: PageLimit = None, after: PageAfter = None, stream: PageStream = False):
+    """
+    Get prediction sessions with an object overlapping the pixel region (x1, y1)-(x2, y2),
+    or lying entirely inside it with ?contained=true, newest first. Paged like /predictions/label.
+    """
+    if x2 <= x1 or y2 <= y1:
+        raise HTTPException(status_code=400, detail="Region must have x1 < x2 and y1 < y2")
+    cursor = _decode_cursor(after)
+    if stream:
+        return _ndjson_sessions(repository.predictions_in_region_stmts(x1, y1, x2, y2, username, contained, after=cursor), db)
+    rows = repository.query_get_predictions_in_region(x1, y1, x2, y2, db, username, contained,
+                                                       limit=limit and limit + 1, after=cursor)
+    return _session_page(rows, limit, response)
+
+@app.get("/predictions/size")
+def get_predictions_by_size(username: Annotated[str, Depends(verify_user)], response: Response,
+                            db: Session = Depends(get_read_db),
+                            min_area: Annotated[float | None, Query(ge=0)] = None,
+                            min_width: Annotated[float | None, Query(ge=0)] = None,
+                            min_height: Annotated[float | None, Query(ge=0)] = None,
+                            limit: PageLimit = None, after: PageAfter = None, stream: PageStream = False):
+    """
+    Get prediction sessions with an object whose box is at least min_area square pixels
+    and/or min_width x min_height, newest first. Paged like /predictions/label.
+    """
+    if min_area is None and min_width is None and min_height is None:
+        raise HTTPException(status_code=400, detail="Give min_area, min_width or min_height")
+    cursor = _decode_cursor(after)
+    if stream:
+        return _ndjson_sessions(repository.predictions_by_size_stmts(username, min_area, min_width, min_height, after=cursor), db)
+    rows = repository.query_get_predictions_by_size(db, username, min_area, min_width, min_height,
+                                                     limit=limit and limit + 1, after=cursor)
+    return _session_page(rows, limit, response)
+
+# Async twins of the read endpoints. With DB_ASYNC=1 they replace the sync
+# ones, so polling clients waiting on the database don't tie up threadpool threads.
+async_reads = APIRouter()
+
+@async_reads.get("/prediction/count")
+async def get_prediction_count_async(username: Annotated[str, Depends(verify_user_async)],
+                                     db: AsyncSession = Depends(get_async_db)):
+    """
+    Get total number of prediction sessions
+    """
+    return {"count": await async_repository.query_prediction_count(db, username)}
+
+@async_reads.get("/labels")
+async def get_unique_labels_async(username: Annotated[str, Depends(verify_user_async)],
+                                  db: AsyncSession = Depends(get_async_db)):
+    """
+    Get all unique labels from detection objects
+    """
+    return {"labels": await async_repository.query_unique_labels(db, username)}
+
+@async_reads.get("/prediction/{uid}")
+async def get_prediction_by_uid_async(uid: str, username: Annotated[str, Depends(verify_user_async)],
+                                      db: AsyncSession = Depends(get_async_db)):
+    """
+    Get prediction session by uid with all detected objects
+    """
+    pending = _pending_prediction(uid, username)
+    if pending is not None:
+        return pending
+    result = await async_repository.query_get_prediction_by_uid(uid, 'PredictionSession', db, username)
+    if not result:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    objects = await async_repository.query_get_prediction_by_uid(uid, 'DetectionObjects', db, username)
+    return _prediction_response(result, objects)
+
+def _ndjson_sessions_async(stmts):
+    async def lines():
+        async for row in async_repository.stream_rows(stmts, AsyncSessionLocal):
+            timestamp = row.timestamp.isoformat() if row.timestamp is not None else None
+            yield json.dumps({"uid": row.uid, "timestamp": timestamp}) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@async_reads.get("/predictions/label/{label}")
+async def get_predictions_by_label_async(label: str, username: Annotated[str, Depends(verify_user_async)],
+                                         response: Response, db: AsyncSession = Depends(get_async_db),
+                                         limit: PageLimit = None, after: PageAfter = None, stream: PageStream = False):
+    """
+    Get prediction sessions containing objects with specified label, newest first.
+    ?limit= pages by keyset (pass X-Next-Cursor as ?after=); ?stream=true returns NDJSON.
+    """
+    cursor = _decode_cursor(after)
+    if stream:
+        return _ndjson_sessions_async(repository.predictions_by_label_stmts(label, username, after=cursor))
+    rows = await async_repository.query_get_prediction_by_label(label, db, username, limit=limit and limit + 1, after=cursor)
+    return _session_page(rows, limit, response)
+
+@async_reads.get("/predictions/score/{min_score}")
+async def get_predictions_by_score_async(min_score: float, username: Annotated[str, Depends(verify_user_async)],
+                                         response: Response, db: AsyncSession = Depends(get_async_db),
+                                         limit: PageLimit = None, after: PageAfter = None, stream: PageStream = False):
+    """
+    Get prediction sessions containing objects with score >= min_score, newest first.
+    ?limit= pages by keyset (pass X-Next-Cursor as ?after=); ?stream=true returns NDJSON.
+    """
+    cursor = _decode_cursor(after)
+    if stream:
+        return _ndjson_sessions_async(repository.predictions_by_score_stmts(min_score, username, after=cursor))
+    rows = await async_repository.query_get_prediction_by_score(min_score, db, username, limit=limit and limit + 1, after=cursor)
+    return _session_page(rows, limit, response)
+
+@async_reads.get("/predictions/region")
+async def get_predictions_in_region_async(x1: float, y1: float, x2: float, y2: float,
+                                          username: Annotated[str, Depends(verify_user_async)], response: Response,
+                                          db: AsyncSession = Depends(get_async_db), contained: bool = False,
+                                          limit: PageLimit = None, after: PageAfter = None, stream: PageStream = False):
+    """
+    Get prediction sessions with an object overlapping the pixel region (x1, y1)-(x2, y2),
+    or lying entirely inside it with ?contained=true, newest first. Paged like /predictions/label.
+    """
+    if x2 <= x1 or y2 <= y1:
+        raise HTTPException(status_code=400, detail="Region must have x1 < x2 and y1 < y2")
+    cursor = _decode_cursor(after)
+    if stream:
+        return _ndjson_sessions_async(repository.predictions_in_region_stmts(x1, y1, x2, y2, username, contained, after=cursor))
+    rows = await async_repository.query_get_predictions_in_region(x1, y1, x2, y2, db, username, contained,
+                                                                   limit=limit and limit + 1, after=cursor)
+    return _session_page(rows, limit, response)
+
+@async_reads.get("/predictions/size")
+async def get_predictions_by_size_async(username: Annotated[str, Depends(verify_user_async)], response: Response,
+                                        db: AsyncSession = Depends(get_async_db),
+                                        min_area: Annotated[float | None, Query(ge=0)] = None,
+                                        min_width: Annotated[float | None, Query(ge=0)] = None,
+                                        min_height: Annotated[float | None, Query(ge=0)] = None,
+                                        limit: PageLimit = None, after: PageAfter = None, stream: PageStream = False):
+    """
+    Get prediction sessions with an object whose box is at least min_area square pixels
+    and/or min_width x min_height, newest first. Paged like /predictions/label.
+    """
+    if min_area is None and min_width is None and min_height is None:
+        raise HTTPException(status_code=400, detail="Give min_area, min_width or min_height")
+    cursor = _decode_cursor(after)
+    if stream:
+        return _ndjson_sessions_async(repository.predictions_by_size_stmts(username, min_area, min_width, min_height, after=cursor))
+    rows = await async_repository.query_get_predictions_by_size(db, username, min_area, min_width, min_height,
+                                                                 limit=limit and limit + 1, after=cursor)
+    return _session_page(rows, limit, response)
+
+def use_async_reads(target, router=async_reads):
+    """
+    Put router's endpoints in place of the routes of target with the same path
+    and methods, keeping their position so matching order is unchanged
+    """
+    def key(route):
+        return getattr(route, "path", None), frozenset(getattr(route, "methods", None) or ())
+
+    added = len(router.routes)
+    for route in router.routes:
+        target.add_api_route(route.path, route.endpoint, methods=list(route.methods))
+    replacements = {key(route): route for route in target.router.routes[-added:]}
+    del target.router.routes[-added:]
+    target.router.routes[:] = [replacements.pop(key(route), route) for route in target.router.routes]
+    target.router.routes.extend(replacements.values())
+
+if DB_ASYNC:
+    use_async_reads(app)
+
+def _variant(path, w, h, format):
+    """
+    Resized and/or re-encoded copy of path from the variant cache; concurrent
+    requests for the same uncached variant share one render
+    """
+    if format is not None and format not in VARIANT_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported image format")
+    if w is None and h is None and format is None:
+        return path
+    key = variant_key(path, w, h, format)
+    return variant_cache.get_or_create(key, lambda tmp_path: render_variant(path, tmp_path, w, h, format))
 
 @app.get("/image/{type}/{filename}")
-def get_image(type: str, filename: str,credentials: Annotated[str, Depends(verify_user)]):
+def get_image(
+    type: str,
+    filename: str,
+    request: Request,
+    credentials: Annotated[str, Depends(verify_user)],
+    w: int | None = Query(default=None, ge=1, le=MAX_VARIANT_DIMENSION, description="Resize to at most this width"),
+    h: int | None = Query(default=None, ge=1, le=MAX_VARIANT_DIMENSION, description="Resize to at most this height"),
+    format: str | None = Query(default=None, description="Re-encode as jpeg, png or webp"),
+):
     """
-    Get image by type and filename
+    Get image by type and filename, optionally resized (?w=, ?h=) or re-encoded (?format=)
     """
     if type not in ["original", "predicted"]:
         raise HTTPException(status_code=400, detail="Invalid image type")
     path = os.path.join("uploads", type, filename)
     if not os.path.exists(path):
         raise HTTPException(status_code=404, detail="Image not found")
-    return FileResponse(path)
+    path = _variant(path, w, h, format)
+    return cached_file_response(request, path, VARIANT_FORMATS[format][2] if format else None, etag_seed=filename)
+
+def _lazy_render(uid, original_path, db):
+    """
+    Render the annotated image from the original and the stored detections,
+    once, into the render cache; concurrent first requests share one render
+    """
+    def produce(tmp_path):
+        objects = repository.query_get_prediction_by_uid(uid, 'DetectionObjects', db, None)
+        detections = [(obj.label, obj.score, json.loads(obj.box)) for obj in objects]
+        _render_to(tmp_path, original_path, detections)
+
+    return render_cache.get_or_create(uid + os.path.splitext(original_path)[1], produce)
 
 @app.get("/prediction/{uid}/image")
-def get_prediction_image(uid: str, request: Request,username: Annotated[str, Depends(verify_user)],db: Session = Depends(get_db)):
+def get_prediction_image(
+    uid: str,
+    request: Request,
+    username: Annotated[str, Depends(verify_user)],
+    db: Session = Depends(get_db),
+    w: int | None = Query(default=None, ge=1, le=MAX_VARIANT_DIMENSION, description="Resize to at most this width"),
+    h: int | None = Query(default=None, ge=1, le=MAX_VARIANT_DIMENSION, description="Resize to at most this height"),
+    format: str | None = Query(default=None, description="Re-encode as jpeg, png or webp"),
+):
     """
-    Get prediction image by uid
+    Get prediction image by uid, optionally resized (?w=, ?h=) or re-encoded (?format=)
     """
     accept = request.headers.get("accept", "")
+    if write_behind is not None:
+        write_behind.wait_for(uid)
     row = repository.query_get_prediction_image(uid,db,username)
     if not row:
         raise HTTPException(status_code=404, detail="Prediction not found")
     image_path = row[0]
 
-    if not os.path.exists(image_path):
+    if image_path is None and row.original_image:
+        # rendering was deferred at prediction time
+        image_path = _lazy_render(uid, row.original_image, db)
+
+    if not image_path or not os.path.exists(image_path):
         raise HTTPException(status_code=404, detail="Predicted image file not found")
 
+    if format is not None:
+        if format not in VARIANT_FORMATS:
+            raise HTTPException(status_code=400, detail="Unsupported image format")
+        media_type = VARIANT_FORMATS[format][2]
+        if not any(t in accept for t in (media_type, "image/*", "*/*")):
+            raise HTTPException(status_code=406, detail="Client does not accept an image format")
+        return cached_file_response(request, _variant(image_path, w, h, format), media_type,
+                                    etag_seed=uid, headers={"Vary": "Accept"})
+    image_path = _variant(image_path, w, h, None)
+
     if "image/png" in accept:
-        return FileResponse(image_path, media_type="image/png")
+        return cached_file_response(request, image_path, "image/png", etag_seed=uid, headers={"Vary": "Accept"})
     elif "image/jpeg" in accept or "image/jpg" in accept:
-        return FileResponse(image_path, media_type="image/jpeg")
+        return cached_file_response(request, image_path, "image/jpeg", etag_seed=uid, headers={"Vary": "Accept"})
     else:
         # If the client doesn't accept image, respond with 406 Not Acceptable
         raise HTTPException(status_code=406, detail="Client does not accept an image format")
@@ -365,6 +1268,7 @@ def register_user(credentials: Annotated[HTTPBasicCredentials, Depends(security)
     password = credentials.password.strip()
 
     row=repository.query_add_user(username,password,db)
+    credential_cache.invalidate(username)
     if row=='Username already exists':
         raise HTTPException(status_code=400, detail="Username already exists")
     return {"message": "User registered successfully"}
@@ -373,12 +1277,48 @@ def register_user(credentials: Annotated[HTTPBasicCredentials, Depends(security)
 
 
 @app.get("/health")
-def health():
+async def health():
     """
     Health check endpoint
     """
     return {"status": "ok"}
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness: 503 until the model is loaded and warmed up
+    """
+    stats = model_loader.stats()
+    if not model_loader.ready():
+        status = "failed" if stats["error"] else "warming_up"
+        return JSONResponse(status_code=503, content={"status": status, "model": stats})
+    return {"status": "ready", "model": stats}
+
+def _s3_cache_metrics():
+    stats = _snapshot(s3_cache_stats)
+    requests = stats["requests"]
+    stats["hit_ratio"] = round((requests - stats["downloads"]) / requests, 4) if requests else None
+    stats.update(s3_cache.stats())
+    return stats
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Runtime statistics for the inference pipeline
+    """
+    return {
+        "batcher": batcher.stats(),
+        "model": model_loader.stats(),
+        "auth_cache": credential_cache.stats(),
+        "dedup": _snapshot(dedup_stats),
+        "render_cache": render_cache.stats(),
+        "variant_cache": variant_cache.stats(),
+        "s3_uploads": s3_uploader.stats(),
+        "s3_cache": _s3_cache_metrics(),
+        "s3_resolver": {**s3_resolver.stats(), **_snapshot(s3_copy_stats)},
+        "write_behind": write_behind.stats() if write_behind is not None else None,
+    }
+
 if __name__ == "__main__":  # pragma: no cover
     import uvicorn
     uvicorn.run("app:app", host="0.0.0.0", port=8080,reload=True)
\ No newline at end of file
@@ -0,0 +1,133 @@
+# async_repository.py
+"""
+Async versions of the repository functions, for an AsyncSession from
+db.AsyncSessionLocal. Reads build the same statements as repository.py and
+await them; multi-statement writes (and the rollup-backed counts) run the
+sync implementation on the session's connection through run_sync, which
+keeps a single copy of that logic without blocking the event loop.
+"""
+
+import asyncio
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import repository
+from auth import hash_password, is_hashed, verify_password
+from models import DetectionObjects, PredictionJob, PredictionSession, Users
+
+
+async def save_prediction_session(uid, original_image, predicted_image, username, db: AsyncSession, detections=None,
+                                  content_hash=None, model_signature=None, upload_status=None):
+    await db.run_sync(lambda session: repository.save_prediction_session(
+        uid, original_image, predicted_image, username, session, detections=detections,
+        content_hash=content_hash, model_signature=model_signature, upload_status=upload_status))
+
+async def save_prediction_sessions(sessions, username, db: AsyncSession):
+    await db.run_sync(lambda session: repository.save_prediction_sessions(sessions, username, session))
+
+async def save_detection_object(prediction_uid, label, score, box, db: AsyncSession):
+    await db.run_sync(lambda session: repository.save_detection_object(prediction_uid, label, score, box, session))
+
+async def save_job(job_id, prediction_uid, filename, img, original_path, username, db: AsyncSession, dedup=True, render=True):
+    return await db.run_sync(lambda session: repository.save_job(
+        job_id, prediction_uid, filename, img, original_path, username, session, dedup=dedup, render=render))
+
+async def update_upload_status(uid, status, db: AsyncSession, error=None):
+    await db.run_sync(lambda session: repository.update_upload_status(uid, status, session, error=error))
+
+async def delete_prediction(uid, username, db: AsyncSession):
+    return await db.run_sync(lambda session: repository.delete_prediction(uid, username, session))
+
+async def query_session_by_content(content_hash, model_signature, db: AsyncSession):
+    if not content_hash:
+        return None
+    result = await db.execute(
+        select(PredictionSession)
+        .filter_by(content_hash=content_hash, model_signature=model_signature)
+        .order_by(PredictionSession.timestamp.desc())
+        .limit(1)
+    )
+    return result.scalars().first()
+
+async def query_user_by_credentials(db: AsyncSession, username, password):
+    user = (await db.execute(select(Users).filter_by(username=username).limit(1))).scalars().first()
+    # PBKDF2 takes a few hundred milliseconds; keep it off the event loop
+    if not user or not await asyncio.to_thread(verify_password, password, user.password):
+        return None
+    if not is_hashed(user.password):
+        # upgrade a legacy plaintext password on successful login
+        user.password = await asyncio.to_thread(hash_password, password)
+        await db.commit()
+    return user
+
+async def query_prediction_count(db: AsyncSession, username):
+    return await db.run_sync(repository.query_prediction_count, username)
+
+async def query_unique_labels(db: AsyncSession, username):
+    return await db.run_sync(repository.query_unique_labels, username)
+
+async def query_delete_from(db: AsyncSession, db_name, uid, username):
+    return await db.run_sync(lambda session: repository.query_delete_from(session, db_name, uid, username))
+
+async def query_get_prediction_by_uid(uid, db_name, db: AsyncSession, username):
+    if db_name == 'PredictionSession':
+        result = await db.execute(select(PredictionSession).filter_by(uid=uid, username=username).limit(1))
+        return result.scalars().first()
+    result = await db.execute(select(DetectionObjects).filter_by(prediction_uid=uid))
+    return result.scalars().all()
+
+async def query_page(db: AsyncSession, stmts, limit=None):
+    rows = []
+    for stmt in stmts:
+        if limit is not None:
+            if len(rows) >= limit:
+                break
+            stmt = stmt.limit(limit - len(rows))
+        rows.extend((await db.execute(stmt)).all())
+    return rows
+
+async def query_get_prediction_by_label(label, db: AsyncSession, username, limit=None, after=None):
+    return await query_page(db, repository.predictions_by_label_stmts(label, username, after), limit)
+
+async def query_get_prediction_by_score(min_score, db: AsyncSession, username, limit=None, after=None):
+    return await query_page(db, repository.predictions_by_score_stmts(min_score, username, after), limit)
+
+async def query_get_predictions_in_region(x1, y1, x2, y2, db: AsyncSession, username, contained=False, limit=None, after=None):
+    stmts = repository.predictions_in_region_stmts(x1, y1, x2, y2, username, contained, after)
+    return await query_page(db, stmts, limit)
+
+async def query_get_predictions_by_size(db: AsyncSession, username, min_area=None, min_width=None, min_height=None,
+                                        limit=None, after=None):
+    stmts = repository.predictions_by_size_stmts(username, min_area, min_width, min_height, after)
+    return await query_page(db, stmts, limit)
+
+async def stream_rows(stmts, session_factory, batch_size=1000):
+    """
+    Async generator over the rows of stmts, in order, from server-side cursors on a session of its own
+    """
+    async with session_factory() as db:
+        for stmt in stmts:
+            result = await db.stream(stmt.execution_options(yield_per=batch_size))
+            async for partition in result.partitions():
+                for row in partition:
+                    yield row
+
+async def query_get_prediction_image(uid, db: AsyncSession, username):
+    result = await db.execute(
+        select(PredictionSession.predicted_image, PredictionSession.original_image)
+        .where(and_(PredictionSession.uid == uid, PredictionSession.username == username))
+    )
+    return result.first()
+
+async def query_add_user(username, password, db: AsyncSession):
+    existing_user = (await db.execute(select(Users.username).filter_by(username=username).limit(1))).first()
+    if existing_user:
+        return 'Username already exists'
+    row = Users(username=username, password=await asyncio.to_thread(hash_password, password))
+    db.add(row)
+    await db.commit()
+    return row
+
+async def query_job(job_id, db: AsyncSession):
+    return (await db.execute(select(PredictionJob).filter_by(job_id=job_id).limit(1))).scalars().first()
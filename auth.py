@@ -0,0 +1,112 @@
+# auth.py
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", "600000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+
+_SCHEME = "pbkdf2_sha256"
+
+
+def hash_password(password, iterations=PASSWORD_HASH_ITERATIONS):
+    """
+    Salted PBKDF2 hash in the form pbkdf2_sha256$<iterations>$<salt>$<hash>
+    """
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return "$".join([
+        _SCHEME,
+        str(iterations),
+        base64.b64encode(salt).decode(),
+        base64.b64encode(digest).decode(),
+    ])
+
+
+def is_hashed(stored):
+    return bool(stored) and stored.startswith(_SCHEME + "$")
+
+
+def verify_password(password, stored):
+    """
+    Check a password against a stored hash. Rows written before hashing was
+    introduced still hold the plaintext password and are compared directly.
+    """
+    if not stored:
+        return False
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode(), stored.encode())
+    try:
+        _, iterations, salt, expected = stored.split("$")
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), base64.b64decode(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest, base64.b64decode(expected))
+
+
+class CredentialCache:
+    """
+    In-process TTL/LRU cache of recently verified credentials.
+
+    Entries are keyed by an HMAC of username and password under a per-process
+    random key, so plaintext passwords are never kept in memory. A hit skips
+    both the users query and the password hash check.
+    """
+
+    def __init__(self, ttl=AUTH_CACHE_TTL, maxsize=AUTH_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._key = secrets.token_bytes(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _digest(self, username, password):
+        return hmac.new(self._key, f"{username}\0{password}".encode(), hashlib.sha256).digest()
+
+    def get(self, username, password):
+        key = self._digest(username, password)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+
+    def add(self, username, password):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        key = self._digest(username, password)
+        with self._lock:
+            self._entries[key] = (username, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username):
+        with self._lock:
+            stale = [key for key, (name, _) in self._entries.items() if name == username]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        return {"hits": self.hits, "misses": self.misses, "size": size, "ttl": self.ttl, "maxsize": self.maxsize}
@@ -0,0 +1,236 @@
+# batcher.py
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "15"))
+_WARMUP_BARRIER_TIMEOUT = 30.0
+
+
+class _Request:
+    __slots__ = ("source", "future", "enqueued_at")
+
+    def __init__(self, source):
+        self.source = source
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class InferenceBatcher:
+    """
+    Collects inference requests that arrive within a short window and runs
+    them through the model as a single batched call.
+
+    Requests are grouped until either max_batch_size images are queued or
+    max_wait_ms has passed since the first one arrived. Each caller gets a
+    Future that resolves to its own Results object.
+
+    When an executor is given, batches run on it instead of the collector
+    thread, with at most max_in_flight batches running at once. While every
+    slot is busy, new requests keep queueing so the next batch fills up.
+    A model_factory gives each executor thread its own model copy, since a
+    single YOLO instance must not be called from several threads at once.
+
+    If a batched call fails, its requests are retried one at a time, so a
+    bad source only fails its own caller and not the unrelated requests it
+    happened to be batched with.
+    """
+
+    def __init__(self, model, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS,
+                 executor=None, max_in_flight=1, model_factory=None, **infer_kwargs):
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.executor = executor
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.model_factory = model_factory
+        self.infer_kwargs = infer_kwargs
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.max_in_flight)
+        self._local = threading.local()
+        self._shared_model_taken = False
+        self._thread = None
+        self._stats = {
+            "batches": 0,
+            "images": 0,
+            "max_batch_size": 0,
+            "errors": 0,
+            "split_batches": 0,
+            "total_queue_wait_ms": 0.0,
+            "max_queue_wait_ms": 0.0,
+        }
+
+    def submit(self, source) -> Future:
+        """
+        Queue a single image source (path or array) and return a Future
+        resolving to its Results object.
+        """
+        self._ensure_started()
+        request = _Request(source)
+        self._queue.put(request)
+        return request.future
+
+    def predict(self, source):
+        """
+        Blocking helper: submit and wait for the result.
+        """
+        return self.submit(source).result()
+
+    def warm_up(self, source, runs=1):
+        """
+        Have every inference slot load its model and run runs forward passes
+        on source now, instead of on the first live requests that land on it.
+        With an executor, max_in_flight tasks are held at a barrier so each
+        runs on its own thread (and so gets its own model_factory copy).
+        Returns per-slot load and warm-up times in milliseconds.
+        """
+        if self.executor is None:
+            return [self._warm_slot(source, runs)]
+        barrier = threading.Barrier(self.max_in_flight)
+
+        def warm():
+            try:
+                barrier.wait(_WARMUP_BARRIER_TIMEOUT)
+            except threading.BrokenBarrierError:
+                pass  # fewer free threads than slots; warm whatever thread this is
+            return self._warm_slot(source, runs)
+
+        futures = [self.executor.submit(warm) for _ in range(self.max_in_flight)]
+        return [f.result() for f in futures]
+
+    def _warm_slot(self, source, runs):
+        started = time.perf_counter()
+        model = self._thread_model()
+        loaded = time.perf_counter()
+        for _ in range(runs):
+            model([source], **self.infer_kwargs)
+        return {
+            "slot": threading.current_thread().name,
+            "load_ms": round((loaded - started) * 1000, 1),
+            "warmup_ms": round((time.perf_counter() - loaded) * 1000, 1),
+        }
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        images = stats["images"]
+        stats["avg_batch_size"] = round(images / batches, 2) if batches else 0.0
+        stats["avg_queue_wait_ms"] = round(stats["total_queue_wait_ms"] / images, 2) if images else 0.0
+        stats["total_queue_wait_ms"] = round(stats["total_queue_wait_ms"], 2)
+        stats["max_queue_wait_ms"] = round(stats["max_queue_wait_ms"], 2)
+        stats["queued"] = self._queue.qsize()
+        stats["config"] = {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_in_flight": self.max_in_flight if self.executor else 1,
+        }
+        return stats
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        # Block for the first request, then keep the window open until the
+        # batch is full or the deadline passes.
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            if self.executor is None:
+                self._run_batch(self._collect())
+                continue
+            self._slots.acquire()
+            batch = self._collect()
+            try:
+                self.executor.submit(self._run_batch_in_slot, batch)
+            except RuntimeError as e:
+                # executor was shut down
+                self._slots.release()
+                for r in batch:
+                    r.future.set_exception(e)
+
+    def _run_batch_in_slot(self, batch):
+        try:
+            self._run_batch(batch)
+        finally:
+            self._slots.release()
+
+    def _thread_model(self):
+        if self.model_factory is None:
+            return self.model
+        model = getattr(self._local, "model", None)
+        if model is None:
+            with self._lock:
+                if not self._shared_model_taken:
+                    self._shared_model_taken = True
+                    model = self.model
+            if model is None:
+                model = self.model_factory()
+            self._local.model = model
+        return model
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+        waits = [(started - r.enqueued_at) * 1000.0 for r in batch]
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["images"] += len(batch)
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+            self._stats["total_queue_wait_ms"] += sum(waits)
+            self._stats["max_queue_wait_ms"] = max(self._stats["max_queue_wait_ms"], max(waits))
+
+        model = None
+        try:
+            model = self._thread_model()
+            results = self._infer(model, batch)
+        except Exception as e:
+            if model is None or len(batch) == 1:
+                for r in batch:
+                    self._fail(r, e)
+                return
+            with self._lock:
+                self._stats["split_batches"] += 1
+            for r in batch:
+                try:
+                    result, = self._infer(model, [r])
+                except Exception as e:
+                    self._fail(r, e)
+                else:
+                    r.future.set_result(result)
+            return
+
+        for r, result in zip(batch, results):
+            r.future.set_result(result)
+
+    def _infer(self, model, batch):
+        results = model([r.source for r in batch], **self.infer_kwargs)
+        if len(results) != len(batch):
+            raise RuntimeError(f"Model returned {len(results)} results for a batch of {len(batch)}")
+        return results
+
+    def _fail(self, request, error):
+        with self._lock:
+            self._stats["errors"] += 1
+        request.future.set_exception(error)
@@ -0,0 +1,125 @@
+"""
+Requests/second of /prediction/{uid} and /labels at high concurrency, served
+by the sync endpoints (a threadpool thread per request) and by the async
+ones (DB_ASYNC=1, aiosqlite), on a scratch SQLite database.
+
+    python benchmarks/bench_async_db.py --concurrency 200 --requests 4000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app as app_module  # noqa: E402
+import repository  # noqa: E402
+from db import create_async_db_engine, create_db_engine, use_single_writer  # noqa: E402
+from models import Base  # noqa: E402
+
+USERNAME = "bench"
+LABELS = ["person", "car", "dog", "cat", "bicycle", "truck"]
+
+
+def seed(session_factory, sessions):
+    rng = random.Random(0)
+    uids = [str(uuid.uuid4()) for _ in range(sessions)]
+    with session_factory() as db:
+        repository.save_prediction_sessions([
+            {"uid": uid, "original_image": "o.jpg", "predicted_image": "p.jpg",
+             "detections": [(rng.choice(LABELS), rng.random(), [0, 0, 10, 10]) for _ in range(3)]}
+            for uid in uids
+        ], USERNAME, db)
+    return uids
+
+
+def sync_app(session_factory):
+    bench_app = FastAPI()
+    bench_app.get("/prediction/count")(app_module.get_prediction_count)
+    bench_app.get("/labels")(app_module.get_uniqe_labels)
+    bench_app.get("/prediction/{uid}")(app_module.get_prediction_by_uid)
+
+    def get_db():
+        with session_factory() as db:
+            yield db
+
+    bench_app.dependency_overrides = {app_module.verify_user: lambda: USERNAME, app_module.get_db: get_db}
+    return bench_app
+
+
+def async_app(session_factory):
+    bench_app = FastAPI()
+    bench_app.include_router(app_module.async_reads)
+
+    async def get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    bench_app.dependency_overrides = {app_module.verify_user_async: lambda: USERNAME,
+                                      app_module.get_async_db: get_async_db}
+    return bench_app
+
+
+async def hammer(bench_app, paths, concurrency, requests):
+    transport = httpx.ASGITransport(app=bench_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = iter(range(requests))
+        errors = 0
+
+        async def worker():
+            nonlocal errors
+            for i in queue:
+                response = await client.get(paths[i % len(paths)])
+                errors += response.status_code != 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start), errors
+
+
+async def run(session_factory, async_factory, uids, concurrency, requests):
+    workloads = {"/prediction/{uid}": [f"/prediction/{uid}" for uid in uids], "/labels": ["/labels"]}
+    print(f"{'endpoint':<18} {'mode':<6} {'req/s':>8} {'errors':>7}")
+    for name, paths in workloads.items():
+        for mode, bench_app in (("sync", sync_app(session_factory)), ("async", async_app(async_factory))):
+            rate, errors = await hammer(bench_app, paths, concurrency, requests)
+            print(f"{name:<18} {mode:<6} {rate:>8.0f} {errors:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--sessions", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_db_engine(url)
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+        use_single_writer(session_factory)
+        uids = seed(session_factory, args.sessions)
+        async_engine = create_async_db_engine(url)
+        async_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+
+        async def bench():
+            try:
+                await run(session_factory, async_factory, uids, args.concurrency, args.requests)
+            finally:
+                await async_engine.dispose()
+
+        asyncio.run(bench())
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
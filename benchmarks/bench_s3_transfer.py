@@ -0,0 +1,73 @@
+"""
+Upload throughput against an in-process S3 stand-in (moto) at several
+concurrency levels, with the default botocore client and with the tuned one
+from s3_transfer.
+
+    python benchmarks/bench_s3_transfer.py --files 64 --size-kb 256 --concurrency 1 4 16 32
+
+moto has no network latency, so absolute numbers only show where threads
+start queuing on the connection pool, not real S3 throughput.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from moto import mock_aws
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from s3_transfer import create_client, transfer_config  # noqa: E402
+
+BUCKET = "bench-bucket"
+REGION = "us-east-1"
+
+
+def run(client, config, paths, concurrency):
+    def upload(i):
+        extra = {"Config": config} if config is not None else {}
+        client.upload_file(paths[i % len(paths)], BUCKET, f"bench/{i}.bin", **extra)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(upload, range(len(paths))))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=64)
+    parser.add_argument("--size-kb", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+    with tempfile.TemporaryDirectory() as tmp, mock_aws():
+        paths = []
+        for i in range(args.files):
+            path = os.path.join(tmp, f"{i}.bin")
+            with open(path, "wb") as f:
+                f.write(os.urandom(args.size_kb * 1024))
+            paths.append(path)
+
+        clients = {
+            "default": (boto3.client("s3", region_name=REGION), None),
+            "tuned": (create_client(REGION), transfer_config()),
+        }
+        clients["default"][0].create_bucket(Bucket=BUCKET)
+
+        total_mb = args.files * args.size_kb / 1024
+        print(f"{'client':<8} {'threads':>7} {'seconds':>8} {'MB/s':>8} {'files/s':>8}")
+        for concurrency in args.concurrency:
+            for name, (client, config) in clients.items():
+                elapsed = run(client, config, paths, concurrency)
+                print(f"{name:<8} {concurrency:>7} {elapsed:>8.3f} {total_mb / elapsed:>8.1f} {args.files / elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Mixed read/write throughput on a scratch SQLite database, with the default
+engine and with the SQLite profile from db.py (WAL, synchronous=NORMAL, mmap,
+busy timeout, sized pool and the single-writer lock).
+
+    python benchmarks/bench_sqlite_profile.py --threads 16 --seconds 5 --write-ratio 0.2
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import repository  # noqa: E402
+from db import create_db_engine, use_single_writer  # noqa: E402
+from models import Base  # noqa: E402
+
+USERS = [f"user{i}" for i in range(20)]
+
+
+def run(session_factory, threads, seconds, write_ratio):
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        rng = random.Random()
+        local = {"reads": 0, "writes": 0, "locked": 0}
+        while time.perf_counter() < deadline:
+            username = rng.choice(USERS)
+            with session_factory() as db:
+                try:
+                    if rng.random() < write_ratio:
+                        repository.save_prediction_session(
+                            str(uuid.uuid4()), "original.jpg", "predicted.jpg", username, db,
+                            detections=[("person", rng.random(), [0, 0, 10, 10])] * 3,
+                        )
+                        local["writes"] += 1
+                    else:
+                        repository.query_prediction_count(db, username)
+                        local["reads"] += 1
+                except OperationalError:
+                    local["locked"] += 1
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{'profile':<9} {'reads/s':>9} {'writes/s':>9} {'locked':>7}")
+    for name, profile in (("default", False), ("sqlite", True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", sqlite_profile=profile)
+            Base.metadata.create_all(bind=engine)
+            session_factory = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+            if profile:
+                use_single_writer(session_factory)
+            counts = run(session_factory, args.threads, args.seconds, args.write_ratio)
+            engine.dispose()
+        print(f"{name:<9} {counts['reads'] / args.seconds:>9.0f} {counts['writes'] / args.seconds:>9.0f} {counts['locked']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Query plans and timings of the seven-day /prediction/count and /labels
+queries on a scratch SQLite database with millions of rows, without and with
+idx_session_user_time / idx_detection_uid_label.
+
+    python benchmarks/bench_time_window_indexes.py --sessions 2000000 --users 1000
+
+Exits non-zero if, with the indexes, either query is not answered from
+covering indexes.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import repository  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+from models import Base  # noqa: E402
+
+NEW_INDEXES = ("idx_session_user_time", "idx_detection_uid_label")
+LABELS = ["person", "car", "dog", "cat", "bicycle", "bus", "truck", "bird"]
+
+
+def populate(path, sessions, users, days):
+    conn = sqlite3.connect(path)
+    now = datetime.now(timezone.utc)
+    batch = 50_000
+    for start in range(0, sessions, batch):
+        session_rows = []
+        detection_rows = []
+        for _ in range(min(batch, sessions - start)):
+            uid = str(uuid.uuid4())
+            timestamp = now - timedelta(seconds=random.randrange(days * 86400))
+            session_rows.append((uid, timestamp.strftime("%Y-%m-%d %H:%M:%S.%f"), f"user{random.randrange(users)}"))
+            detection_rows.extend((uid, random.choice(LABELS), random.random()) for _ in range(3))
+        conn.executemany("INSERT INTO prediction_sessions (uid, timestamp, username) VALUES (?, ?, ?)", session_rows)
+        conn.executemany("INSERT INTO detection_objects (prediction_uid, label, score) VALUES (?, ?, ?)", detection_rows)
+        conn.commit()
+    conn.close()
+
+
+def measure(engine, username, repeat):
+    plans = {}
+    timings = {}
+    since = datetime.now(timezone.utc) - timedelta(days=7)
+    statements = {
+        "count": repository.prediction_count_stmt(username, since),
+        "labels": repository.unique_labels_stmt(username, since),
+    }
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        return "EXPLAIN QUERY PLAN " + statement, parameters
+
+    with engine.connect() as conn:
+        event.listen(engine, "before_cursor_execute", explain, retval=True)
+        try:
+            for name, stmt in statements.items():
+                plans[name] = [row[-1] for row in conn.execute(stmt)]
+        finally:
+            event.remove(engine, "before_cursor_execute", explain)
+        for name, stmt in statements.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                conn.execute(stmt).all()
+            timings[name] = (time.perf_counter() - start) / repeat * 1000
+    return plans, timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            for name in NEW_INDEXES:
+                conn.exec_driver_sql(f"DROP INDEX {name}")
+
+        start = time.perf_counter()
+        populate(path, args.sessions, args.users, args.days)
+        print(f"populated {args.sessions} sessions in {time.perf_counter() - start:.1f}s")
+
+        results = {"before": measure(engine, "user1", args.repeat)}
+        start = time.perf_counter()
+        run_migrations(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+        print(f"migration built the indexes in {time.perf_counter() - start:.1f}s")
+        results["after"] = measure(engine, "user1", args.repeat)
+        engine.dispose()
+
+    covering = True
+    for phase, (plans, timings) in results.items():
+        print(f"\n{phase} indexes")
+        for name in ("count", "labels"):
+            print(f"  {name:<7} {timings[name]:9.2f} ms")
+            for line in plans[name]:
+                print(f"          {line}")
+    for name, plan in results["after"][0].items():
+        searches = [line for line in plan if line.startswith(("SEARCH", "SCAN"))]
+        if not all("COVERING INDEX" in line for line in searches):
+            print(f"\n{name}: not an index-only plan")
+            covering = False
+    sys.exit(0 if covering else 1)
+
+
+if __name__ == "__main__":
+    main()
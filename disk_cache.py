@@ -0,0 +1,145 @@
+# disk_cache.py
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class DiskLRUCache:
+    """
+    A directory of files kept under a total byte budget, evicting the least
+    recently used entries first.
+
+    get_or_create() coalesces concurrent misses: the first caller runs the
+    producer while the others wait for its file. Producers write to a
+    temporary path (ending with the key, so the extension is preserved) that
+    is renamed into place once complete, so readers never see partial files.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        # index files left by a previous run, oldest first
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(".tmp-"):
+                os.remove(path)
+            elif os.path.isfile(path):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._bytes += size
+        self._evict()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """
+        Path of a cached entry, or None
+        """
+        path = self.path_for(key)
+        with self._lock:
+            if key in self._entries and os.path.exists(path):
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return path
+            self._forget(key)
+        return None
+
+    def get_or_create(self, key, producer):
+        """
+        Return the path for key, calling producer(tmp_path) to create it on a miss
+        """
+        path = self.path_for(key)
+        with self._lock:
+            if key in self._entries and os.path.exists(path):
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return path
+            self._forget(key)
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                self._stats["misses"] += 1
+        if not owner:
+            return future.result()
+
+        tmp_path = os.path.join(self.directory, f".tmp-{uuid.uuid4().hex}-{key}")
+        try:
+            producer(tmp_path)
+            os.replace(tmp_path, path)
+            self._add(key, os.path.getsize(path))
+            future.set_result(path)
+            return path
+        except BaseException as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def put_file(self, key, source_path):
+        """
+        Copy-free insert of an existing file (moved into the cache)
+        """
+        path = self.path_for(key)
+        os.replace(source_path, path)
+        self._add(key, os.path.getsize(path))
+        return path
+
+    def discard(self, key):
+        with self._lock:
+            self._forget(key)
+        path = self.path_for(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes)
+        return stats
+
+    def _add(self, key, size):
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = size
+            self._bytes += size
+            self._evict(keep=key)
+
+    def _forget(self, key):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._bytes -= size
+
+    def _evict(self, keep=None):
+        while self._bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            if key == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(key)
+                continue
+            self._forget(key)
+            self._stats["evictions"] += 1
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
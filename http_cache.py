@@ -0,0 +1,141 @@
+# http_cache.py
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+# Image files are named by uid and never rewritten, so they can be cached for good.
+# "private" keeps shared caches from storing responses to authenticated requests;
+# set IMAGE_CACHE_CONTROL to "public, ..." when a CDN in front handles auth.
+IMAGE_CACHE_CONTROL = os.getenv("IMAGE_CACHE_CONTROL", "private, max-age=31536000, immutable")
+_CHUNK_SIZE = 64 * 1024
+_DIGEST_CACHE_SIZE = 4096
+
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def content_digest(path, stat=None):
+    """
+    sha256 of a file, memoized on (path, mtime, size) so repeat requests don't re-read it
+    """
+    stat = stat or os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _digests_lock:
+        digest = _digests.get(key)
+        if digest is not None:
+            _digests.move_to_end(key)
+            return digest
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    with _digests_lock:
+        _digests[key] = digest
+        while len(_digests) > _DIGEST_CACHE_SIZE:
+            _digests.popitem(last=False)
+    return digest
+
+
+def strong_etag(seed, path, stat=None):
+    digest = hashlib.sha256(f"{seed}:{content_digest(path, stat)}".encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def _etag_matches(header, etag):
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _not_modified_since(header, mtime):
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(mtime) <= since
+
+
+def _parse_range(header, size):
+    """
+    (start, end) for a single "bytes=" range, "invalid" if unsatisfiable and
+    None when the header should be ignored (malformed or several ranges)
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first == "":
+            length = int(last)
+            if length <= 0:
+                return "invalid"
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return "invalid"
+    return start, min(end, size - 1)
+
+
+def _iter_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def cached_file_response(request, path, media_type=None, etag_seed="", headers=None):
+    """
+    FileResponse with a strong ETag, Last-Modified and immutable Cache-Control.
+    Answers If-None-Match / If-Modified-Since with 304 and a single byte Range
+    (honouring If-Range) with 206.
+    """
+    stat = os.stat(path)
+    media_type = media_type or guess_type(path)[0] or "application/octet-stream"
+    # the media type is part of the representation, so it's part of the validator too
+    etag = strong_etag(f"{etag_seed}:{media_type}", path, stat)
+    headers = {
+        **(headers or {}),
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": IMAGE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    elif _not_modified_since(request.headers.get("if-modified-since"), stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, stat.st_size)
+        if byte_range == "invalid":
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{stat.st_size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(_iter_range(path, start, end), status_code=206,
+                                     media_type=media_type, headers=headers)
+
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
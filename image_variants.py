@@ -0,0 +1,53 @@
+# image_variants.py
+
+import hashlib
+import os
+
+from PIL import Image
+
+# format name -> (PIL format, file extension, media type)
+VARIANT_FORMATS = {
+    "jpeg": ("JPEG", ".jpg", "image/jpeg"),
+    "jpg": ("JPEG", ".jpg", "image/jpeg"),
+    "png": ("PNG", ".png", "image/png"),
+    "webp": ("WEBP", ".webp", "image/webp"),
+}
+MAX_VARIANT_DIMENSION = 4096
+VARIANT_QUALITY = int(os.getenv("VARIANT_QUALITY", "85"))
+
+
+def variant_key(source_path, width=None, height=None, fmt=None):
+    """
+    Cache key for a variant. It includes the source's size and mtime, so a
+    rewritten source never serves a stale variant.
+    """
+    stat = os.stat(source_path)
+    ext = VARIANT_FORMATS[fmt][1] if fmt else os.path.splitext(source_path)[1]
+    raw = f"{os.path.abspath(source_path)}|{stat.st_mtime_ns}|{stat.st_size}|{width}|{height}|{fmt}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:32] + ext
+
+
+def target_size(size, width=None, height=None):
+    """
+    Fit inside width x height keeping the aspect ratio; a single bound scales
+    proportionally. Images are never upscaled.
+    """
+    src_w, src_h = size
+    scale = 1.0
+    if width:
+        scale = min(scale, width / src_w)
+    if height:
+        scale = min(scale, height / src_h)
+    return max(1, round(src_w * scale)), max(1, round(src_h * scale))
+
+
+def render_variant(source_path, dest_path, width=None, height=None, fmt=None):
+    with Image.open(source_path) as image:
+        pil_format = VARIANT_FORMATS[fmt][0] if fmt else image.format
+        size = target_size(image.size, width, height)
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+        if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        options = {"quality": VARIANT_QUALITY} if pil_format in ("JPEG", "WEBP") else {"optimize": True}
+        image.save(dest_path, format=pil_format, **options)
@@ -0,0 +1,96 @@
+# jobs.py
+
+import logging
+import os
+import threading
+
+import repository
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+# a job still running after this many seconds is assumed lost with its process
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "600"))
+# longest pause after repeated database errors (the pause doubles from poll_interval)
+JOB_MAX_BACKOFF = float(os.getenv("JOB_MAX_BACKOFF", "30"))
+
+
+class JobWorkerPool:
+    """
+    Background threads that drain the prediction_jobs table.
+
+    Jobs live in the application database, so anything still queued is picked
+    up again after a restart without an external broker. Jobs left running by
+    a crashed process are claimed again once they are stale_after seconds old. handler(job) returns the JSON-serializable payload
+    stored on the job; any exception marks the job failed.
+    """
+
+    def __init__(self, handler, session_factory, workers=JOB_WORKERS, poll_interval=JOB_POLL_INTERVAL,
+                 stale_after=JOB_STALE_AFTER):
+        self.handler = handler
+        self.session_factory = session_factory
+        self.workers = max(1, int(workers))
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def notify(self):
+        """
+        Wake an idle worker after a job was enqueued
+        """
+        self.start()
+        self._wakeup.set()
+
+    def stop(self, timeout=5.0):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in threads:
+            thread.join(timeout)
+
+    def _run(self):
+        failures = 0
+        while not self._stopping.is_set():
+            # clear before looking, so a notify() that races with an empty
+            # claim still wakes us up
+            self._wakeup.clear()
+            try:
+                with self.session_factory() as db:
+                    job = repository.claim_next_job(db, stale_after=self.stale_after)
+                    if job is not None:
+                        self._process(job, db)
+            except Exception:
+                # e.g. a transient "database is locked"; a job whose finish_job
+                # failed is claimed again once stale. The thread must survive,
+                # start() never replaces it.
+                failures += 1
+                logger.exception("job worker iteration failed")
+                self._stopping.wait(min(self.poll_interval * 2 ** failures, JOB_MAX_BACKOFF))
+                continue
+            failures = 0
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+
+    def _process(self, job, db):
+        try:
+            result = self.handler(job)
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e) or type(e).__name__
+            repository.finish_job(job.job_id, db, error=str(detail))
+        else:
+            repository.finish_job(job.job_id, db, result=result)
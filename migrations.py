@@ -0,0 +1,118 @@
+# migrations.py
+"""
+Schema migrations, applied by run_migrations() on every start, and the
+one-off data backfills that are too slow for startup.
+
+    python migrations.py --backfill-boxes   # fill the numeric box columns of old detections
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from sqlalchemy import and_, bindparam, inspect, select, text, update
+from sqlalchemy.orm import Session
+
+import rollups
+from repository import box_columns
+from models import Base, DailyPredictionCount, DetectionObjects, PredictionSession
+
+BOX_BACKFILL_BATCH_SIZE = int(os.getenv("BOX_BACKFILL_BATCH_SIZE", "5000"))
+# area of a detection whose box JSON can't be parsed, so the backfill skips it next time
+UNPARSEABLE_BOX_AREA = -1.0
+
+
+def _add_missing_columns(conn, table):
+    inspector = inspect(conn)
+    if not inspector.has_table(table.name):
+        return
+    existing = {column["name"] for column in inspector.get_columns(table.name)}
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+
+def run_migrations(engine):
+    """
+    Bring an existing database up to the current models.
+    create_all() only creates missing tables, so columns and indexes added to
+    existing tables later are applied here. Safe to run on every start;
+    backfill_boxes() scans detection_objects, so it is run explicitly instead.
+    """
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            _add_missing_columns(conn, table)
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+    _backfill_rollups(engine)
+
+
+def backfill_boxes(engine, batch_size=BOX_BACKFILL_BATCH_SIZE):
+    """
+    Fill the numeric box columns of detections stored before they existed from
+    the box JSON, one short transaction per batch so writers are never held up
+    for long. Rows whose box can't be parsed get UNPARSEABLE_BOX_AREA (and
+    no coordinates), so a later run doesn't scan them again. Returns the
+    number of rows filled.
+    """
+    changes = (
+        update(DetectionObjects.__table__)
+        .where(DetectionObjects.id == bindparam("row_id"))
+        .values({name: bindparam(f"new_{name}") for name in ("x1", "y1", "x2", "y2", "area")})
+    )
+    last_id = 0
+    filled = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(DetectionObjects.id, DetectionObjects.box)
+                .where(and_(DetectionObjects.id > last_id, DetectionObjects.x1.is_(None),
+                            DetectionObjects.area.is_(None), DetectionObjects.box.is_not(None)))
+                .order_by(DetectionObjects.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return filled
+            last_id = rows[-1].id
+            values = []
+            for row_id, box in rows:
+                try:
+                    columns = box_columns(json.loads(box))
+                    del columns["box"]
+                    filled += 1
+                except (TypeError, ValueError):
+                    columns = {"x1": None, "y1": None, "x2": None, "y2": None, "area": UNPARSEABLE_BOX_AREA}
+                values.append({"row_id": row_id, **{f"new_{name}": value for name, value in columns.items()}})
+            conn.execute(changes, values)
+
+
+def _backfill_rollups(engine):
+    # the rollup tables are new to a database that already has sessions
+    with Session(engine) as db:
+        if db.execute(select(DailyPredictionCount.username).limit(1)).first() is not None:
+            return
+        if db.execute(select(PredictionSession.uid).where(PredictionSession.username.is_not(None)).limit(1)).first():
+            rollups.rebuild(db)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the data backfills that are too slow for startup")
+    parser.add_argument("--backfill-boxes", action="store_true",
+                        help="fill the numeric box columns of detections stored before they existed")
+    args = parser.parse_args(argv)
+    if not args.backfill_boxes:
+        parser.print_help()
+        return 2
+
+    from db import engine
+
+    run_migrations(engine)
+    print(f"filled the box columns of {backfill_boxes(engine)} detections")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+# model_loader.py
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from importlib.metadata import version
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_WARMUP_RUNS = int(os.getenv("MODEL_WARMUP_RUNS", "2"))
+MODEL_WARMUP_SIZE = int(os.getenv("MODEL_WARMUP_SIZE", "640"))
+
+
+def load_yolo(weights):
+    """
+    CPU-only YOLO model for weights. torch and ultralytics are imported here,
+    not at module import, so importing the app stays cheap.
+    """
+    import torch
+    torch.cuda.is_available = lambda: False
+    from ultralytics import YOLO
+    return YOLO(weights)
+
+
+class ModelLoader:
+    """
+    Holds the model, loading it on first use or from the startup hook, and
+    runs warm-up inferences so the first real request doesn't pay for graph
+    construction and allocator growth.
+
+    The loader is callable like the model it wraps, so it can be handed to
+    InferenceBatcher before anything is loaded. ready() turns true once
+    warm_up() has warmed every inference slot.
+    """
+
+    def __init__(self, load, weights=None, warmup_runs=MODEL_WARMUP_RUNS, warmup_size=MODEL_WARMUP_SIZE):
+        self._load = load
+        self.weights = weights
+        self._signature = None
+        self.warmup_runs = max(0, warmup_runs)
+        self.warmup_size = max(32, warmup_size)
+        self._model = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stats = {"loaded": False, "ready": False, "load_ms": None, "warmup_ms": None,
+                       "warmup_runs": 0, "slots": [], "error": None}
+
+    def get(self):
+        model = self._model
+        if model is None:
+            with self._lock:
+                if self._model is None:
+                    started = time.perf_counter()
+                    self._model = self._load()
+                    self._stats["load_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                    self._stats["loaded"] = True
+                model = self._model
+        return model
+
+    def __call__(self, sources, **infer_kwargs):
+        return self.get()(sources, **infer_kwargs)
+
+    @property
+    def names(self):
+        return self.get().names
+
+    @property
+    def signature(self):
+        """
+        "<weights>:<sha256 prefix>:<ultralytics version>" of the weights the
+        loaded model was built from. Computed once, after loading, since the
+        weights file may only exist once the model has downloaded it.
+        """
+        if self._signature is None:
+            model = self.get()
+            path = getattr(model, "ckpt_path", None) or self.weights
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            self._signature = "{}:{}:{}".format(self.weights, digest.hexdigest()[:16], version("ultralytics"))
+        return self._signature
+
+    def warm_up(self, warm_slots):
+        """
+        Load the model, then call warm_slots(image, runs) to load and warm
+        every inference slot with warmup_runs blank frames (see
+        InferenceBatcher.warm_up and ProcessInferencePool.warm_up), and mark
+        the loader ready. load_ms is the first model's load; warmup_ms covers
+        the whole slot phase, including the other slots' model loads, which
+        are listed per slot under "slots".
+        """
+        try:
+            self.get()
+            image = np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8)
+            started = time.perf_counter()
+            slots = warm_slots(image, self.warmup_runs)
+            self._stats["warmup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self._stats["warmup_runs"] = self.warmup_runs * len(slots)
+            self._stats["slots"] = slots
+        except Exception as e:
+            logger.exception("model warm-up failed")
+            self._stats["error"] = str(e)
+            raise
+        self._stats["ready"] = True
+        self._ready.set()
+
+    def ready(self):
+        return self._ready.is_set()
+
+    def stats(self):
+        return dict(self._stats)
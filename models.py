@@ -1,6 +1,6 @@
 # models.py
 
-from sqlalchemy import Column, Index, String, DateTime, Integer, Float
+from sqlalchemy import Boolean, Column, Date, Index, String, DateTime, Integer, Float, Text
 
 from datetime import datetime,timezone
 from sqlalchemy.orm import declarative_base
@@ -16,10 +16,16 @@ class PredictionSession(Base):
     __tablename__ = 'prediction_sessions'
     
     uid = Column(String, primary_key=True)
-    timestamp = Column(DateTime, default=datetime.now(timezone.utc))
+    timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     original_image = Column(String)
     predicted_image = Column(String)
     username=Column(String)
+    # sha256 of the original image and the model/parameters used, for deduplication
+    content_hash=Column(String)
+    model_signature=Column(String)
+    # S3 upload of the images: pending -> uploaded | failed (NULL when S3 is not configured)
+    upload_status=Column(String)
+    upload_error=Column(String)
 
 class DetectionObjects(Base):
     """
@@ -38,6 +44,12 @@ class DetectionObjects(Base):
     label=Column(String)
     score=Column(Float)
     box=Column(String)
+    # the box as numbers (pixels), so geometry can be filtered in SQL
+    x1=Column(Float)
+    y1=Column(Float)
+    x2=Column(Float)
+    y2=Column(Float)
+    area=Column(Float)
 
 class Users(Base):
     __tablename__='users'
@@ -46,9 +58,62 @@ class Users(Base):
     username=Column(String,unique=True)
     password=Column(String)
 
+class DailyPredictionCount(Base):
+    """
+    Per-user, per-day (UTC) number of prediction sessions, kept up to date by
+    the repository writes; see rollups.py
+    """
+    __tablename__='daily_prediction_counts'
+
+    username=Column(String,primary_key=True)
+    day=Column(Date,primary_key=True)
+    session_count=Column(Integer,nullable=False,default=0)
+
+class DailyLabelCount(Base):
+    """
+    Per-user, per-day (UTC) label occurrences and best score. When a session
+    is deleted, max_score is recomputed from the detections that remain.
+    """
+    __tablename__='daily_label_counts'
+
+    username=Column(String,primary_key=True)
+    day=Column(Date,primary_key=True)
+    label=Column(String,primary_key=True)
+    occurrences=Column(Integer,nullable=False,default=0)
+    max_score=Column(Float)
+
+class PredictionJob(Base):
+    """
+    Queued /predict?mode=async request, drained by the background job workers.
+    status moves queued -> running -> done | failed; result holds the JSON payload.
+    """
+    __tablename__='prediction_jobs'
+
+    job_id=Column(String,primary_key=True)
+    status=Column(String,default="queued")
+    username=Column(String)
+    prediction_uid=Column(String)
+    filename=Column(String)
+    img=Column(String)
+    original_path=Column(String)
+    dedup=Column(Boolean,default=True)
+    render=Column(Boolean,default=True)
+    created_at=Column(DateTime,default=lambda: datetime.now(timezone.utc))
+    started_at=Column(DateTime)
+    finished_at=Column(DateTime)
+    result=Column(Text)
+    error=Column(String)
+
 
 Index("idx_prediction_uid", DetectionObjects.prediction_uid)
 Index("idx_label", DetectionObjects.label)
 Index("idx_score", DetectionObjects.score)
-
-
+Index("idx_session_content", PredictionSession.content_hash, PredictionSession.model_signature)
+# time-window queries per user; uid is included so they are answered from the index alone
+Index("idx_session_user_time", PredictionSession.username, PredictionSession.timestamp, PredictionSession.uid)
+Index("idx_detection_uid_label", DetectionObjects.prediction_uid, DetectionObjects.label)
+Index("idx_detection_uid_score", DetectionObjects.prediction_uid, DetectionObjects.score)
+Index("idx_detection_uid_area", DetectionObjects.prediction_uid, DetectionObjects.area)
+Index("idx_detection_uid_box", DetectionObjects.prediction_uid, DetectionObjects.x1, DetectionObjects.y1,
+      DetectionObjects.x2, DetectionObjects.y2)
+Index("idx_job_status", PredictionJob.status, PredictionJob.created_at)
@@ -1,47 +1,200 @@
 from datetime import datetime, timezone, timedelta
+import base64
 import json
 from sqlalchemy.orm import Session
-from models import PredictionSession,Users,DetectionObjects
-from sqlalchemy import and_, delete, distinct, func, join, select
+from auth import hash_password, is_hashed, verify_password
+import rollups
+from models import PredictionJob,PredictionSession,Users,DetectionObjects
+from sqlalchemy import and_, delete, exists, func, insert, join, or_, select, update
 
-def save_prediction_session(uid, original_image, predicted_image,username,db: Session):
+def save_prediction_session(uid, original_image, predicted_image,username,db: Session, detections=None,
+                            content_hash=None, model_signature=None, upload_status=None):
     """
-    Save prediction session to database
+    Save prediction session to database.
+    detections is an optional list of (label, score, box) tuples; they are bulk
+    inserted in the same transaction, so a session is never stored half-written.
     """
-    row = PredictionSession(uid=uid, predicted_image=predicted_image, original_image=original_image,username=username)
-    # Add the instance to the session and commit
-    db.add(row)
+    save_prediction_sessions([{
+        "uid": uid,
+        "original_image": original_image,
+        "predicted_image": predicted_image,
+        "detections": detections or [],
+        "content_hash": content_hash,
+        "model_signature": model_signature,
+        "upload_status": upload_status,
+    }], username, db)
+
+def box_columns(box):
+    """
+    Column values for a [x1, y1, x2, y2] box: the JSON text kept for older
+    readers plus the numeric coordinates and area
+    """
+    text = json.dumps(box)
+    x1, y1, x2, y2 = (float(v) for v in box)
+    return {"box": text, "x1": x1, "y1": y1, "x2": x2, "y2": y2,
+            "area": max(x2 - x1, 0.0) * max(y2 - y1, 0.0)}
+
+def save_prediction_sessions(sessions, username, db: Session):
+    """
+    Save several prediction sessions (dicts with uid, original_image, predicted_image,
+    detections and optionally content_hash / model_signature / upload_status / timestamp /
+    username) together with all of their detection objects in a single transaction
+    """
+    try:
+        _insert_sessions(sessions, username, db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def _insert_sessions(sessions, username, db: Session):
+    session_rows = []
+    detection_rows = []
+    for session in sessions:
+        uid = session["uid"]
+        row = {
+            "uid": uid,
+            "original_image": session["original_image"],
+            "predicted_image": session["predicted_image"],
+            "username": session.get("username", username),
+            "content_hash": session.get("content_hash"),
+            "model_signature": session.get("model_signature"),
+            "upload_status": session.get("upload_status"),
+            "upload_error": session.get("upload_error"),
+            # set here rather than by the column default, so the rollups use the same day
+            "timestamp": session.get("timestamp") or datetime.now(timezone.utc),
+        }
+        session_rows.append(row)
+        detection_rows.extend(
+            {"prediction_uid": uid, "label": label, "score": score, **box_columns(box)}
+            for label, score, box in session["detections"]
+        )
+    if session_rows:
+        db.execute(insert(PredictionSession), session_rows)
+    if detection_rows:
+        db.execute(insert(DetectionObjects), detection_rows)
+    rollups.add_sessions(db, [
+        (row["username"], row["timestamp"], [(label, score) for label, score, _ in session["detections"]])
+        for row, session in zip(session_rows, sessions)
+    ])
+
+def write_pending_sessions(sessions, db: Session):
+    """
+    Flush sessions buffered by the write-behind queue in one transaction. Sessions
+    already stored (replayed from the journal, or changed while being written) only
+    get their upload status refreshed, so the same batch can be written twice.
+    """
+    uids = [session["uid"] for session in sessions]
+    try:
+        stored = set(db.execute(select(PredictionSession.uid).where(PredictionSession.uid.in_(uids))).scalars())
+        _insert_sessions([session for session in sessions if session["uid"] not in stored], None, db)
+        for session in sessions:
+            if session["uid"] in stored:
+                db.execute(
+                    update(PredictionSession)
+                    .where(PredictionSession.uid == session["uid"])
+                    .values(upload_status=session.get("upload_status"), upload_error=session.get("upload_error"))
+                )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def update_upload_status(uid, status, db: Session, error=None):
+    """
+    Record the outcome of the background S3 upload of a session's images
+    """
+    db.execute(
+        update(PredictionSession)
+        .where(PredictionSession.uid == uid)
+        .values(upload_status=status, upload_error=error)
+    )
     db.commit()
 
+def query_session_by_content(content_hash, model_signature, db: Session):
+    """
+    Most recent session predicted from the same content with the same model signature
+    """
+    if not content_hash:
+        return None
+    return (
+        db.query(PredictionSession)
+        .filter_by(content_hash=content_hash, model_signature=model_signature)
+        .order_by(PredictionSession.timestamp.desc())
+        .first()
+    )
+
 def save_detection_object(prediction_uid, label, score, box,db:Session):
     """
     Save detection object to database
     """
-    row=DetectionObjects(prediction_uid=prediction_uid,label=label,score=score,box=json.dumps(box))
+    row=DetectionObjects(prediction_uid=prediction_uid,label=label,score=score,**box_columns(box))
     db.add(row)
     db.commit()
 
 def query_user_by_credentials(db: Session, username, password):
-    return db.query(Users).filter_by(username=username, password=password).first()
+    user = db.query(Users).filter_by(username=username).first()
+    if not user or not verify_password(password, user.password):
+        return None
+    if not is_hashed(user.password):
+        # upgrade a legacy plaintext password on successful login
+        user.password = hash_password(password)
+        db.commit()
+    return user
 
-def query_prediction_count(db: Session,username):
-    seven_days_ago = datetime.now(timezone.utc) - timedelta(days=7)
-    count = db.query(func.count(PredictionSession.uid)).filter(and_(PredictionSession.timestamp >= seven_days_ago,PredictionSession.username == username)).scalar()
-    return count
+def _time_window(since, until):
+    window = PredictionSession.timestamp >= since
+    if until is not None:
+        window = and_(window, PredictionSession.timestamp < until)
+    return window
 
-def query_unique_labels(db: Session,username):
-    seven_days_ago = datetime.now(timezone.utc) - timedelta(days=7)
+def prediction_count_stmt(username, since, until=None):
+    # count(*) rather than count(uid) keeps the plan on idx_session_user_time alone
+    return (
+        select(func.count())
+        .select_from(PredictionSession)
+        .where(and_(PredictionSession.username == username, _time_window(since, until)))
+    )
 
-    stmt = (
-        select(distinct(DetectionObjects.label))
+def unique_labels_stmt(username, since, until=None):
+    return (
+        select(DetectionObjects.label)
         .select_from(
             join(DetectionObjects, PredictionSession, DetectionObjects.prediction_uid == PredictionSession.uid)
         )
-        .where(and_(PredictionSession.timestamp >= seven_days_ago ,PredictionSession.username==username))
+        .where(and_(_time_window(since, until) ,PredictionSession.username==username))
+        .distinct()
     )
 
-    result = db.execute(stmt).scalars().all()
-    return result
+def _seven_day_window():
+    """
+    The last seven days split into raw ranges and rolled-up days: the partial
+    first day [since, first_full_day) and today [today, ...) come from the raw
+    tables, the closed days in between from the daily rollups
+    """
+    now = datetime.now(timezone.utc)
+    since = now - timedelta(days=7)
+    first_full_day = since.date() + timedelta(days=1)
+    today = now.date()
+    raw_ranges = [
+        (since, datetime.combine(first_full_day, datetime.min.time(), timezone.utc)),
+        (datetime.combine(today, datetime.min.time(), timezone.utc), None),
+    ]
+    return raw_ranges, first_full_day, today
+
+def query_prediction_count(db: Session,username):
+    raw_ranges, first_full_day, today = _seven_day_window()
+    count = rollups.count_sessions(db, username, first_full_day, today)
+    for since, until in raw_ranges:
+        count += db.execute(prediction_count_stmt(username, since, until)).scalar()
+    return count
+
+def query_unique_labels(db: Session,username):
+    raw_ranges, first_full_day, today = _seven_day_window()
+    labels = set(rollups.labels_seen(db, username, first_full_day, today))
+    for since, until in raw_ranges:
+        labels.update(db.execute(unique_labels_stmt(username, since, until)).scalars())
+    return sorted(labels)
 
 def query_delete_from(db: Session, db_name, uid, username):
     if db_name == 'PredictionSession':
@@ -62,6 +215,29 @@ def query_delete_from(db: Session, db_name, uid, username):
     db.commit()
     return result.rowcount
 
+def delete_prediction(uid, username, db: Session):
+    """
+    Delete a session owned by username with its detection objects and take it
+    out of the daily rollups, in one transaction. Returns the number of
+    sessions deleted (0 or 1).
+    """
+    try:
+        session = db.execute(
+            select(PredictionSession.timestamp)
+            .where(and_(PredictionSession.uid == uid, PredictionSession.username == username))
+        ).first()
+        if session is None:
+            return 0
+        labels = db.execute(select(DetectionObjects.label).where(DetectionObjects.prediction_uid == uid)).scalars().all()
+        db.execute(delete(DetectionObjects).where(DetectionObjects.prediction_uid == uid))
+        db.execute(delete(PredictionSession).where(PredictionSession.uid == uid))
+        rollups.remove_session(db, username, session.timestamp, labels)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return 1
+
 def query_get_prediction_by_uid(uid, db_name, db: Session,username):
     if db_name=='PredictionSession':
         result=db.query(PredictionSession).filter_by(uid=uid,username=username).first()
@@ -69,26 +245,125 @@ def query_get_prediction_by_uid(uid, db_name, db: Session,username):
     result=db.query(DetectionObjects).filter_by(prediction_uid=uid).all()
     return result
 
-def query_get_prediction_by_label(label,db: Session,username):
-    rows = (
-    db.query(PredictionSession.uid, PredictionSession.timestamp)
-    .join(DetectionObjects, PredictionSession.uid == DetectionObjects.prediction_uid)
-    .filter(DetectionObjects.label == label,PredictionSession.username==username)
-    .distinct()
-    .all())
-    return rows
+def encode_cursor(row):
+    """
+    Opaque keyset cursor pointing just past row (a (uid, timestamp) result)
+    """
+    timestamp = row.timestamp.isoformat() if row.timestamp is not None else None
+    return base64.urlsafe_b64encode(json.dumps([timestamp, row.uid]).encode()).decode()
+
+def decode_cursor(cursor):
+    """
+    (timestamp, uid) from encode_cursor; ValueError if malformed
+    """
+    try:
+        timestamp, uid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (datetime.fromisoformat(timestamp) if timestamp is not None else None), str(uid)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("invalid cursor") from e
+
+def _sessions_page(condition, username, after=None):
+    """
+    Statements listing the sessions of username having a detection object
+    matching condition, newest first, keyset-paginated on (timestamp, uid).
+    Run them in order (see query_page / stream_rows): timestamped sessions
+    first, each page an index range seek from the cursor on
+    idx_session_user_time, then the legacy sessions without a timestamp.
+    """
+    def base():
+        return (
+            select(PredictionSession.uid, PredictionSession.timestamp)
+            .where(PredictionSession.username == username)
+            .where(exists().where(and_(DetectionObjects.prediction_uid == PredictionSession.uid, condition)))
+        )
 
-def query_get_prediction_by_score(min_score,db,username):
-    rows = (
-    db.query(PredictionSession.uid, PredictionSession.timestamp)
-    .join(DetectionObjects, PredictionSession.uid == DetectionObjects.prediction_uid)
-    .filter(DetectionObjects.score >= min_score,PredictionSession.username==username)
-    .distinct()
-    .all())
+    # plain DESC, so a backward scan of the ascending index already gives this order
+    timestamped = base().order_by(PredictionSession.timestamp.desc(), PredictionSession.uid.desc())
+    untimed = base().where(PredictionSession.timestamp.is_(None)).order_by(PredictionSession.uid.desc())
+    if after is None:
+        return [timestamped.where(PredictionSession.timestamp.is_not(None)), untimed]
+    timestamp, uid = after
+    if timestamp is None:
+        return [untimed.where(PredictionSession.uid < uid)]
+    # timestamp <= t bounds the range seek; the OR only drops the rows at t up to the cursor
+    return [
+        timestamped.where(and_(
+            PredictionSession.timestamp <= timestamp,
+            or_(PredictionSession.timestamp < timestamp, PredictionSession.uid < uid),
+        )),
+        untimed,
+    ]
+
+def predictions_by_label_stmts(label, username, after=None):
+    return _sessions_page(DetectionObjects.label == label, username, after)
+
+def predictions_by_score_stmts(min_score, username, after=None):
+    return _sessions_page(DetectionObjects.score >= min_score, username, after)
+
+def predictions_in_region_stmts(x1, y1, x2, y2, username, contained=False, after=None):
+    """
+    Sessions with an object overlapping (or, with contained, lying inside) the region
+    """
+    if contained:
+        condition = and_(DetectionObjects.x1 >= x1, DetectionObjects.y1 >= y1,
+                         DetectionObjects.x2 <= x2, DetectionObjects.y2 <= y2)
+    else:
+        condition = and_(DetectionObjects.x1 < x2, DetectionObjects.x2 > x1,
+                         DetectionObjects.y1 < y2, DetectionObjects.y2 > y1)
+    return _sessions_page(condition, username, after)
+
+def predictions_by_size_stmts(username, min_area=None, min_width=None, min_height=None, after=None):
+    """
+    Sessions with an object at least min_area square pixels and/or min_width x min_height
+    """
+    conditions = []
+    if min_area is not None:
+        conditions.append(DetectionObjects.area >= min_area)
+    if min_width is not None:
+        conditions.append(DetectionObjects.x2 - DetectionObjects.x1 >= min_width)
+    if min_height is not None:
+        conditions.append(DetectionObjects.y2 - DetectionObjects.y1 >= min_height)
+    return _sessions_page(and_(*conditions), username, after)
+
+def query_page(db, stmts, limit=None):
+    """
+    Up to limit rows from the statements of _sessions_page, run in order
+    """
+    rows = []
+    for stmt in stmts:
+        if limit is not None:
+            if len(rows) >= limit:
+                break
+            stmt = stmt.limit(limit - len(rows))
+        rows.extend(db.execute(stmt).all())
     return rows
 
+def query_get_prediction_by_label(label,db: Session,username, limit=None, after=None):
+    return query_page(db, predictions_by_label_stmts(label, username, after), limit)
+
+def query_get_prediction_by_score(min_score,db,username, limit=None, after=None):
+    return query_page(db, predictions_by_score_stmts(min_score, username, after), limit)
+
+def query_get_predictions_in_region(x1, y1, x2, y2, db, username, contained=False, limit=None, after=None):
+    return query_page(db, predictions_in_region_stmts(x1, y1, x2, y2, username, contained, after), limit)
+
+def query_get_predictions_by_size(db, username, min_area=None, min_width=None, min_height=None, limit=None, after=None):
+    return query_page(db, predictions_by_size_stmts(username, min_area, min_width, min_height, after), limit)
+
+def stream_rows(stmts, session_factory, batch_size=1000):
+    """
+    Yield the rows of stmts, one after the other, from a server-side cursor on
+    a session of its own, batch_size at a time, so memory stays flat however
+    many rows there are
+    """
+    with session_factory() as db:
+        for stmt in stmts:
+            result = db.execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+            for partition in result.partitions():
+                yield from partition
+
 def query_get_prediction_image(uid,db,username):
-    row=select(PredictionSession.predicted_image).select_from(PredictionSession).where(and_(PredictionSession.uid==uid,PredictionSession.username==username))
+    row=select(PredictionSession.predicted_image, PredictionSession.original_image).select_from(PredictionSession).where(and_(PredictionSession.uid==uid,PredictionSession.username==username))
     result = db.execute(row).first() 
     return result
 
@@ -96,14 +371,56 @@ def query_add_user(username,password,db):
     existing_user = db.query(Users).filter(Users.username == username).first()
     if existing_user:
         return 'Username already exists'
-    row=Users(username=username,password=password)
+    row=Users(username=username,password=hash_password(password))
     db.add(row)
     db.commit()
     return row
 
+def save_job(job_id, prediction_uid, filename, img, original_path, username, db: Session, dedup=True, render=True):
+    row = PredictionJob(job_id=job_id, prediction_uid=prediction_uid, filename=filename, img=img,
+                        original_path=original_path, username=username, dedup=dedup, render=render, status="queued")
+    db.add(row)
+    db.commit()
+    return row
 
-        
-    
-
+def query_job(job_id, db: Session):
+    return db.query(PredictionJob).filter_by(job_id=job_id).first()
 
+def claim_next_job(db: Session, stale_after=None):
+    """
+    Atomically move the oldest claimable job to running and return it (None if the queue is empty).
+    Jobs still marked running after stale_after seconds are assumed to belong to a dead
+    process and are claimed again. The conditional UPDATE makes the claim safe with
+    several workers or processes.
+    """
+    claimable = PredictionJob.status == "queued"
+    if stale_after is not None:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=stale_after)
+        claimable = claimable | and_(PredictionJob.status == "running", PredictionJob.started_at < cutoff)
+    while True:
+        job_id = db.execute(
+            select(PredictionJob.job_id).where(claimable).order_by(PredictionJob.created_at).limit(1)
+        ).scalar()
+        if job_id is None:
+            return None
+        claimed = db.execute(
+            update(PredictionJob)
+            .where(and_(PredictionJob.job_id == job_id, claimable))
+            .values(status="running", started_at=datetime.now(timezone.utc))
+        )
+        db.commit()
+        if claimed.rowcount == 1:
+            return query_job(job_id, db)
 
+def finish_job(job_id, db: Session, result=None, error=None):
+    db.execute(
+        update(PredictionJob)
+        .where(PredictionJob.job_id == job_id)
+        .values(
+            status="failed" if error else "done",
+            result=json.dumps(result) if result is not None else None,
+            error=error,
+            finished_at=datetime.now(timezone.utc),
+        )
+    )
+    db.commit()
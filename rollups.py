@@ -0,0 +1,259 @@
+# rollups.py
+"""
+Daily per-user rollups behind /prediction/count and /labels.
+
+The repository adds to them in the same transaction that stores sessions and
+subtracts when a session is deleted. Closed days are answered from the rollups
+and only today and the partial first day of the window read the raw tables.
+
+    python rollups.py            # compare rollups with the raw tables, rebuild on mismatch
+    python rollups.py --check    # only report differences (exit status 1 if any)
+    python rollups.py --rebuild  # rebuild unconditionally
+"""
+
+import argparse
+import sys
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import Date, and_, case, cast, delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import DailyLabelCount, DailyPredictionCount, DetectionObjects, PredictionSession
+
+
+def utc_day(timestamp):
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return timestamp.date()
+
+
+def _upsert(db, table, rows, keys, set_):
+    insert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else postgresql_insert
+    stmt = insert(table)
+    db.execute(stmt.on_conflict_do_update(index_elements=keys, set_=set_(stmt.excluded)), rows)
+
+
+def add_sessions(db, sessions):
+    """
+    Count new sessions, given as (username, timestamp, [(label, score), ...]).
+    Runs inside the caller's transaction.
+    """
+    counts = defaultdict(int)
+    labels = {}
+    for username, timestamp, detections in sessions:
+        if username is None or timestamp is None:
+            continue
+        day = utc_day(timestamp)
+        counts[(username, day)] += 1
+        for label, score in detections:
+            occurrences, max_score = labels.get((username, day, label), (0, None))
+            if score is not None and (max_score is None or score > max_score):
+                max_score = score
+            labels[(username, day, label)] = (occurrences + 1, max_score)
+    if counts:
+        _upsert(
+            db, DailyPredictionCount,
+            [{"username": u, "day": d, "session_count": n} for (u, d), n in counts.items()],
+            ["username", "day"],
+            lambda excluded: {"session_count": DailyPredictionCount.session_count + excluded.session_count},
+        )
+    if labels:
+        _upsert(
+            db, DailyLabelCount,
+            [
+                {"username": u, "day": d, "label": label, "occurrences": n, "max_score": score}
+                for (u, d, label), (n, score) in labels.items()
+            ],
+            ["username", "day", "label"],
+            lambda excluded: {
+                "occurrences": DailyLabelCount.occurrences + excluded.occurrences,
+                "max_score": case(
+                    (DailyLabelCount.max_score.is_(None), excluded.max_score),
+                    (excluded.max_score > DailyLabelCount.max_score, excluded.max_score),
+                    else_=DailyLabelCount.max_score,
+                ),
+            },
+        )
+
+
+def _minus(column, n):
+    return case((column > n, column - n), else_=0)
+
+
+def _remaining_max_score(username, day, label):
+    # highest score of label among the user's sessions still stored that day
+    start = datetime.combine(day, time.min, timezone.utc)
+    return (
+        select(func.max(DetectionObjects.score))
+        .join(PredictionSession, DetectionObjects.prediction_uid == PredictionSession.uid)
+        .where(and_(
+            PredictionSession.username == username,
+            PredictionSession.timestamp >= start,
+            PredictionSession.timestamp < start + timedelta(days=1),
+            DetectionObjects.label == label,
+        ))
+        .scalar_subquery()
+    )
+
+
+def remove_session(db, username, timestamp, labels):
+    """
+    Undo add_sessions for one deleted session, which must already be deleted:
+    counts never go below zero and max_score is recomputed from what is left
+    """
+    if username is None or timestamp is None:
+        return
+    day = utc_day(timestamp)
+    db.execute(
+        update(DailyPredictionCount)
+        .where(and_(DailyPredictionCount.username == username, DailyPredictionCount.day == day))
+        .values(session_count=_minus(DailyPredictionCount.session_count, 1))
+    )
+    occurrences = defaultdict(int)
+    for label in labels:
+        occurrences[label] += 1
+    for label, n in occurrences.items():
+        db.execute(
+            update(DailyLabelCount)
+            .where(and_(DailyLabelCount.username == username, DailyLabelCount.day == day, DailyLabelCount.label == label))
+            .values(occurrences=_minus(DailyLabelCount.occurrences, n),
+                    max_score=_remaining_max_score(username, day, label))
+        )
+
+
+def count_sessions(db, username, first_day, end_day):
+    """
+    Sessions of username on days first_day <= day < end_day
+    """
+    return db.execute(
+        select(func.coalesce(func.sum(DailyPredictionCount.session_count), 0))
+        .where(and_(
+            DailyPredictionCount.username == username,
+            DailyPredictionCount.day >= first_day,
+            DailyPredictionCount.day < end_day,
+        ))
+    ).scalar()
+
+
+def labels_seen(db, username, first_day, end_day):
+    return db.execute(
+        select(DailyLabelCount.label)
+        .where(and_(
+            DailyLabelCount.username == username,
+            DailyLabelCount.day >= first_day,
+            DailyLabelCount.day < end_day,
+            DailyLabelCount.occurrences > 0,
+        ))
+        .distinct()
+    ).scalars().all()
+
+
+def _day_expr(db):
+    if db.get_bind().dialect.name == "sqlite":
+        return func.date(PredictionSession.timestamp)
+    return cast(PredictionSession.timestamp, Date)
+
+
+def _expected(db):
+    day = _day_expr(db)
+    has_owner = and_(PredictionSession.username.is_not(None), PredictionSession.timestamp.is_not(None))
+    counts = db.execute(
+        select(PredictionSession.username, day, func.count())
+        .where(has_owner)
+        .group_by(PredictionSession.username, day)
+    ).all()
+    labels = db.execute(
+        select(PredictionSession.username, day, DetectionObjects.label, func.count(), func.max(DetectionObjects.score))
+        .join(DetectionObjects, DetectionObjects.prediction_uid == PredictionSession.uid)
+        .where(has_owner)
+        .group_by(PredictionSession.username, day, DetectionObjects.label)
+    ).all()
+    return (
+        {(u, str(d)): n for u, d, n in counts},
+        {(u, str(d), label): (n, score) for u, d, label, n, score in labels},
+    )
+
+
+def _stored(db):
+    counts = db.execute(
+        select(DailyPredictionCount.username, DailyPredictionCount.day, DailyPredictionCount.session_count)
+        .where(DailyPredictionCount.session_count > 0)
+    ).all()
+    labels = db.execute(
+        select(DailyLabelCount.username, DailyLabelCount.day, DailyLabelCount.label,
+               DailyLabelCount.occurrences, DailyLabelCount.max_score)
+        .where(DailyLabelCount.occurrences > 0)
+    ).all()
+    return (
+        {(u, str(d)): n for u, d, n in counts},
+        {(u, str(d), label): (n, score) for u, d, label, n, score in labels},
+    )
+
+
+def check(db):
+    """
+    Keys whose stored rollup differs from the raw tables (empty when consistent)
+    """
+    expected, stored = _expected(db), _stored(db)
+    mismatches = []
+    for want, have in zip(expected, stored):
+        for key in sorted(set(want) | set(have), key=str):
+            if want.get(key) != have.get(key):
+                mismatches.append((key, want.get(key), have.get(key)))
+    return mismatches
+
+
+def rebuild(db):
+    """
+    Recompute every rollup row from prediction_sessions and detection_objects
+    """
+    counts, labels = _expected(db)
+    try:
+        db.execute(delete(DailyLabelCount))
+        db.execute(delete(DailyPredictionCount))
+        if counts:
+            db.execute(DailyPredictionCount.__table__.insert(), [
+                {"username": u, "day": _to_date(d), "session_count": n} for (u, d), n in counts.items()
+            ])
+        if labels:
+            db.execute(DailyLabelCount.__table__.insert(), [
+                {"username": u, "day": _to_date(d), "label": label, "occurrences": n, "max_score": score}
+                for (u, d, label), (n, score) in labels.items()
+            ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(counts), len(labels)
+
+
+def _to_date(value):
+    return date.fromisoformat(value[:10])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check or rebuild the daily prediction rollups")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--check", action="store_true", help="only report differences")
+    mode.add_argument("--rebuild", action="store_true", help="rebuild without checking")
+    args = parser.parse_args(argv)
+
+    from db import SessionLocal
+
+    with SessionLocal() as db:
+        if not args.rebuild:
+            mismatches = check(db)
+            for key, want, have in mismatches[:50]:
+                print(f"{key}: raw={want} rollup={have}")
+            print(f"{len(mismatches)} mismatched rollup rows")
+            if args.check or not mismatches:
+                return 1 if mismatches else 0
+        days, labels = rebuild(db)
+        print(f"rebuilt {days} daily counts and {labels} daily label counts")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# s3_resolver.py
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+S3_EXISTS_TTL = float(os.getenv("S3_EXISTS_TTL", "60"))
+S3_MISSING_TTL = float(os.getenv("S3_MISSING_TTL", "30"))
+S3_RESOLVER_SIZE = int(os.getenv("S3_RESOLVER_SIZE", "10000"))
+
+
+class KeyResolver:
+    """
+    Finds the first existing key among candidate locations, remembering both
+    hits (with the object's ETag) and misses for a while, so a shared image
+    requested by many users is looked up once per TTL instead of once per request.
+
+    head(key) returns the object's ETag, or None if it does not exist.
+    Cached misses are trusted for missing_ttl; callers that key other caches
+    on the ETag can ask resolve() to revalidate a cached hit (see fresh).
+    """
+
+    def __init__(self, head, exists_ttl=S3_EXISTS_TTL, missing_ttl=S3_MISSING_TTL, maxsize=S3_RESOLVER_SIZE):
+        self.head = head
+        self.exists_ttl = exists_ttl
+        self.missing_ttl = missing_ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "revalidations": 0, "lookups": 0}
+
+    def etag(self, key, fresh=False):
+        """
+        ETag of key or None if it does not exist, from the cache when not
+        expired. With fresh, a cached ETag is checked again with head().
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                if not (fresh and entry[0] is not None):
+                    self._stats["hits"] += 1
+                    return entry[0]
+                self._stats["revalidations"] += 1
+            else:
+                self._stats["misses"] += 1
+        etag = self.head(key)
+        self.remember(key, etag)
+        return etag
+
+    def resolve(self, candidates, fresh=False):
+        """
+        (key, etag) of the first candidate that exists, or (None, None).
+        With fresh, the key found is re-checked with one head() even when
+        cached, so an object replaced outside the service is not reported
+        under its old ETag; cached misses are still skipped without a request.
+        """
+        with self._lock:
+            self._stats["lookups"] += 1
+        for key in candidates:
+            etag = self.etag(key, fresh=fresh)
+            if etag is not None:
+                return key, etag
+        return None, None
+
+    def remember(self, key, etag):
+        ttl = self.exists_ttl if etag is not None else self.missing_ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (etag, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def forget(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        return stats
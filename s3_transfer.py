@@ -0,0 +1,55 @@
+# s3_transfer.py
+
+import os
+
+MB = 1024 * 1024
+
+# Size the pool for every thread that may talk to S3 at once: the I/O executor,
+# the background uploaders and each multipart transfer's own threads.
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "50"))
+S3_RETRY_MODE = os.getenv("S3_RETRY_MODE", "adaptive")
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", "5"))
+S3_CONNECT_TIMEOUT = float(os.getenv("S3_CONNECT_TIMEOUT", "5"))
+S3_READ_TIMEOUT = float(os.getenv("S3_READ_TIMEOUT", "30"))
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * MB)))
+S3_MULTIPART_CHUNKSIZE = int(os.getenv("S3_MULTIPART_CHUNKSIZE", str(8 * MB)))
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "10"))
+
+
+def client_config(**overrides):
+    """
+    botocore Config with the pool size, retry policy and timeouts above
+    """
+    from botocore.config import Config
+
+    options = {
+        "max_pool_connections": S3_MAX_POOL_CONNECTIONS,
+        "retries": {"mode": S3_RETRY_MODE, "max_attempts": S3_MAX_ATTEMPTS},
+        "connect_timeout": S3_CONNECT_TIMEOUT,
+        "read_timeout": S3_READ_TIMEOUT,
+    }
+    options.update(overrides)
+    return Config(**options)
+
+
+def transfer_config(**overrides):
+    """
+    TransferConfig for upload_file / download_file / copy
+    """
+    from boto3.s3.transfer import TransferConfig
+
+    options = {
+        "multipart_threshold": S3_MULTIPART_THRESHOLD,
+        "multipart_chunksize": S3_MULTIPART_CHUNKSIZE,
+        "max_concurrency": S3_MAX_CONCURRENCY,
+        "use_threads": S3_MAX_CONCURRENCY > 1,
+    }
+    options.update(overrides)
+    return TransferConfig(**options)
+
+
+def create_client(region_name=None, config=None, **kwargs):
+    # boto3 takes a while to import; only processes that talk to S3 pay for it
+    import boto3
+
+    return boto3.client("s3", region_name=region_name, config=config or client_config(), **kwargs)
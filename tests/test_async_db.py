@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+import uuid
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import app as app_module
+import async_repository
+from db import SessionLocal, async_url, create_async_db_engine, create_db_engine
+from models import Base
+import repository
+
+USERNAME = "async_user"
+
+
+class TestAsyncRepository(unittest.TestCase):
+    def test_async_url(self):
+        self.assertEqual(async_url("sqlite:///./predictions.db"), "sqlite+aiosqlite:///./predictions.db")
+        self.assertEqual(async_url("postgresql://u:p@h:5432/db"), "postgresql+asyncpg://u:p@h:5432/db")
+        self.assertEqual(async_url("postgresql+psycopg2://h/db"), "postgresql+asyncpg://h/db")
+
+    def test_save_and_query(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'async.db')}"
+            sync_engine = create_db_engine(url)
+            Base.metadata.create_all(bind=sync_engine)
+            sync_engine.dispose()
+
+            async def scenario():
+                engine = create_async_db_engine(url)
+                session_factory = async_sessionmaker(engine, expire_on_commit=False)
+                try:
+                    async with session_factory() as db:
+                        await async_repository.save_prediction_session(
+                            "a1", "o.jpg", "p.jpg", USERNAME, db, detections=[("cat", 0.9, [0, 0, 10, 10])])
+                        session = await async_repository.query_get_prediction_by_uid("a1", "PredictionSession", db, USERNAME)
+                        objects = await async_repository.query_get_prediction_by_uid("a1", "DetectionObjects", db, USERNAME)
+                        count = await async_repository.query_prediction_count(db, USERNAME)
+                        labels = await async_repository.query_unique_labels(db, USERNAME)
+                        by_label = await async_repository.query_get_prediction_by_label("cat", db, USERNAME)
+                        streamed = [row.uid async for row in async_repository.stream_rows(
+                            repository.predictions_by_score_stmts(0.5, USERNAME), session_factory)]
+                        deleted = await async_repository.delete_prediction("a1", USERNAME, db)
+                        gone = await async_repository.query_get_prediction_by_uid("a1", "PredictionSession", db, USERNAME)
+                    return session.uid, [o.area for o in objects], count, labels, [r.uid for r in by_label], streamed, deleted, gone
+                finally:
+                    await engine.dispose()
+
+            self.assertEqual(asyncio.run(scenario()), ("a1", [100.0], 1, ["cat"], ["a1"], ["a1"], 1, None))
+
+
+class TestAsyncEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.uid = str(uuid.uuid4())
+        with SessionLocal() as db:
+            repository.save_prediction_session(self.uid, "o.jpg", "p.jpg", USERNAME, db,
+                                               detections=[("giraffe", 0.7, [1, 2, 3, 4])])
+        self.engine = create_async_db_engine()
+        session_factory = async_sessionmaker(self.engine, expire_on_commit=False)
+
+        async def get_async_db():
+            async with session_factory() as db:
+                yield db
+
+        self.app = FastAPI()
+        self.app.include_router(app_module.async_reads)
+        self.app.dependency_overrides = {
+            app_module.verify_user_async: lambda: USERNAME,
+            app_module.get_async_db: get_async_db,
+        }
+        self._session_factory = app_module.AsyncSessionLocal
+        app_module.AsyncSessionLocal = session_factory
+        self.client = TestClient(self.app)
+        self.client.__enter__()
+
+    def tearDown(self):
+        self.client.portal.call(self.engine.dispose)
+        self.client.__exit__(None, None, None)
+        app_module.AsyncSessionLocal = self._session_factory
+        with SessionLocal() as db:
+            repository.delete_prediction(self.uid, USERNAME, db)
+
+    def test_read_endpoints(self):
+        data = self.client.get(f"/prediction/{self.uid}").json()
+        self.assertEqual(data["uid"], self.uid)
+        self.assertEqual(data["detection_objects"][0]["box"], [1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(self.client.get(f"/prediction/{uuid.uuid4()}").status_code, 404)
+        self.assertIn("giraffe", self.client.get("/labels").json()["labels"])
+        self.assertGreaterEqual(self.client.get("/prediction/count").json()["count"], 1)
+        self.assertEqual([p["uid"] for p in self.client.get("/predictions/label/giraffe").json()], [self.uid])
+        self.assertIn(self.uid, {p["uid"] for p in self.client.get("/predictions/size", params={"min_area": 4}).json()})
+
+    def test_stream(self):
+        response = self.client.get("/predictions/label/giraffe", params={"stream": True})
+        self.assertEqual([json.loads(line)["uid"] for line in response.text.splitlines()], [self.uid])
+
+
+class TestUseAsyncReads(unittest.TestCase):
+    def test_replaces_sync_twins_in_place(self):
+        target = FastAPI()
+
+        @target.get("/prediction/count")
+        def count():
+            return "sync"
+
+        @target.delete("/prediction/{uid}")
+        def delete(uid: str):
+            return "sync"
+
+        @target.get("/prediction/{uid}")
+        def get(uid: str):
+            return "sync"
+
+        app_module.use_async_reads(target)
+        routes = [(route.path, sorted(route.methods), route.endpoint) for route in target.router.routes
+                  if getattr(route, "methods", None) and route.path.startswith("/prediction/")]
+        self.assertEqual(routes[:3], [
+            ("/prediction/count", ["GET"], app_module.get_prediction_count_async),
+            ("/prediction/{uid}", ["DELETE"], delete),
+            ("/prediction/{uid}", ["GET"], app_module.get_prediction_by_uid_async),
+        ])
+        self.assertEqual(sum(route.endpoint in (count, get) for route in target.router.routes
+                             if hasattr(route, "endpoint")), 0)
@@ -0,0 +1,91 @@
+import base64
+import unittest
+import uuid
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+import app as app_module
+from app import app
+from auth import CredentialCache, hash_password, verify_password
+from db import SessionLocal
+from models import Users
+
+
+def get_basic_auth_header(username: str, password: str) -> dict:
+    token = base64.b64encode(f"{username}:{password}".encode()).decode()
+    return {"Authorization": f"Basic {token}"}
+
+
+class TestPasswordHashing(unittest.TestCase):
+
+    def test_hash_roundtrip(self):
+        stored = hash_password("secret", iterations=1000)
+        self.assertNotIn("secret", stored)
+        self.assertTrue(verify_password("secret", stored))
+        self.assertFalse(verify_password("wrong", stored))
+
+    def test_salted(self):
+        self.assertNotEqual(hash_password("secret", iterations=1000), hash_password("secret", iterations=1000))
+
+
+class TestCredentialCache(unittest.TestCase):
+
+    def test_ttl_expiry(self):
+        cache = CredentialCache(ttl=-1)
+        cache.add("u", "p")
+        self.assertFalse(cache.get("u", "p"))
+
+    def test_lru_eviction_and_invalidate(self):
+        cache = CredentialCache(ttl=60, maxsize=2)
+        cache.add("a", "1")
+        cache.add("b", "2")
+        cache.add("c", "3")
+        self.assertFalse(cache.get("a", "1"))
+        self.assertTrue(cache.get("b", "2"))
+        self.assertFalse(cache.get("b", "wrong"))
+        cache.invalidate("b")
+        self.assertFalse(cache.get("b", "2"))
+
+
+class TestAuthEndpoints(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides = {}
+        self.client = TestClient(app)
+        self.username = f"user_{uuid.uuid4()}"
+        self.password = "pa55"
+        self.headers = get_basic_auth_header(self.username, self.password)
+
+    def tearDown(self):
+        with SessionLocal() as db:
+            db.query(Users).filter_by(username=self.username).delete()
+            db.commit()
+
+    def test_password_stored_hashed(self):
+        self.client.post("/register", headers=self.headers)
+        with SessionLocal() as db:
+            user = db.query(Users).filter_by(username=self.username).first()
+        self.assertNotEqual(user.password, self.password)
+        self.assertTrue(verify_password(self.password, user.password))
+
+    def test_cached_credentials_skip_db(self):
+        self.client.post("/register", headers=self.headers)
+        self.assertEqual(self.client.get("/prediction/count", headers=self.headers).status_code, 200)
+        with patch("repository.query_user_by_credentials") as mock_query:
+            response = self.client.get("/prediction/count", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        mock_query.assert_not_called()
+
+    def test_register_invalidates_cache(self):
+        app_module.credential_cache.add(self.username, self.password)
+        self.client.post("/register", headers=self.headers)
+        self.assertFalse(app_module.credential_cache.get(self.username, self.password))
+
+    def test_legacy_plaintext_password_upgraded(self):
+        with SessionLocal() as db:
+            db.add(Users(username=self.username, password=self.password))
+            db.commit()
+        self.assertEqual(self.client.get("/prediction/count", headers=self.headers).status_code, 200)
+        with SessionLocal() as db:
+            user = db.query(Users).filter_by(username=self.username).first()
+        self.assertNotEqual(user.password, self.password)
+        self.assertTrue(verify_password(self.password, user.password))
@@ -0,0 +1,104 @@
+import io
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from botocore.exceptions import ClientError
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import app as app_module
+from app import app
+from db import SessionLocal
+from models import PredictionSession
+from uploader import BackgroundUploader
+
+
+class TestBackgroundUploader(unittest.TestCase):
+    def test_files_uploaded_in_parallel(self):
+        started = threading.Barrier(2, timeout=5)
+        done = threading.Event()
+        outcome = {}
+
+        def upload(path, key):
+            started.wait()
+
+        def on_done(uid, error):
+            outcome[uid] = error
+            done.set()
+
+        uploader = BackgroundUploader(upload, on_done, workers=2)
+        uploader.submit("uid-1", [("a.png", "k/a.png"), ("b.png", "k/b.png")])
+        self.assertTrue(done.wait(5))
+        self.assertEqual(outcome, {"uid-1": None})
+        self.assertEqual(uploader.stats()["uploaded"], 1)
+        uploader.shutdown()
+
+    def test_failure_reported(self):
+        done = threading.Event()
+        outcome = {}
+
+        def upload(path, key):
+            if key == "bad":
+                raise RuntimeError("boom")
+
+        def on_done(uid, error):
+            outcome[uid] = error
+            done.set()
+
+        uploader = BackgroundUploader(upload, on_done, workers=2)
+        uploader.submit("uid-2", [("a.png", "good"), ("b.png", "bad")])
+        self.assertTrue(done.wait(5))
+        self.assertEqual(outcome, {"uid-2": "boom"})
+        self.assertEqual(uploader.stats()["failed"], 1)
+        uploader.shutdown()
+
+
+class TestPredictUploadStatus(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides = {}
+        self.client = TestClient(app)
+        image_bytes = io.BytesIO()
+        Image.new("RGB", (40, 40), color="purple").save(image_bytes, format="PNG")
+        self.data = image_bytes.getvalue()
+
+    def _wait_for_status(self, uid):
+        for _ in range(100):
+            with SessionLocal() as db:
+                session = db.get(PredictionSession, uid)
+                if session.upload_status != "pending":
+                    return session
+            time.sleep(0.05)
+        self.fail("upload status never left pending")
+
+    def _predict(self, s3_client):
+        with patch.object(app_module, "s3_client", s3_client), patch.object(app_module, "AWS_S3_BUCKET", "bucket"):
+            response = self.client.post(
+                "/predict?dedup=false",
+                files={"file": ("pic.png", io.BytesIO(self.data), "image/png")},
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["s3_upload_status"], "pending")
+            return self._wait_for_status(response.json()["prediction_uid"])
+
+    def test_upload_recorded(self):
+        s3_client = MagicMock()
+        session = self._predict(s3_client)
+        self.assertEqual(session.upload_status, "uploaded")
+        self.assertIsNone(session.upload_error)
+        keys = sorted(call.args[2] for call in s3_client.upload_file.call_args_list)
+        self.assertEqual(keys, ["anonymous/original/pic.png", "anonymous/predicted/pic.png"])
+
+    def test_upload_failure_recorded(self):
+        s3_client = MagicMock()
+        s3_client.upload_file.side_effect = ClientError({"Error": {"Code": "500", "Message": "unavailable"}}, "PutObject")
+        session = self._predict(s3_client)
+        self.assertEqual(session.upload_status, "failed")
+        self.assertIn("unavailable", session.upload_error)
+
+    def test_no_status_without_s3(self):
+        response = self.client.post(
+            "/predict?dedup=false",
+            files={"file": ("pic.png", io.BytesIO(self.data), "image/png")},
+        )
+        self.assertIsNone(response.json()["s3_upload_status"])
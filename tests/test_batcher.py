@@ -0,0 +1,141 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.testclient import TestClient
+
+from app import app
+from batcher import InferenceBatcher
+
+
+class FakeModel:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, sources, **kwargs):
+        self.calls.append(list(sources))
+        if self.fail:
+            raise RuntimeError("boom")
+        return [f"result-{s}" for s in sources]
+
+
+class TestInferenceBatcher(unittest.TestCase):
+
+    def test_single_request(self):
+        model = FakeModel()
+        batcher = InferenceBatcher(model, max_batch_size=4, max_wait_ms=1)
+        self.assertEqual(batcher.predict("a.jpg"), "result-a.jpg")
+        self.assertEqual(model.calls, [["a.jpg"]])
+
+    def test_concurrent_requests_are_batched_and_routed(self):
+        model = FakeModel()
+        batcher = InferenceBatcher(model, max_batch_size=8, max_wait_ms=200)
+        results = {}
+
+        def worker(i):
+            results[i] = batcher.predict(f"{i}.jpg")
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for i in range(8):
+            self.assertEqual(results[i], f"result-{i}.jpg")
+        self.assertLess(len(model.calls), 8)
+        stats = batcher.stats()
+        self.assertEqual(stats["images"], 8)
+        self.assertGreater(stats["max_batch_size"], 1)
+        self.assertGreaterEqual(stats["avg_queue_wait_ms"], 0)
+
+    def test_batch_size_is_capped(self):
+        model = FakeModel()
+        batcher = InferenceBatcher(model, max_batch_size=2, max_wait_ms=50)
+        futures = [batcher.submit(i) for i in range(5)]
+        self.assertEqual([f.result() for f in futures], [f"result-{i}" for i in range(5)])
+        self.assertTrue(all(len(call) <= 2 for call in model.calls))
+
+    def test_model_error_propagates(self):
+        batcher = InferenceBatcher(FakeModel(fail=True), max_batch_size=2, max_wait_ms=1)
+        with self.assertRaises(RuntimeError):
+            batcher.predict("a.jpg")
+        self.assertEqual(batcher.stats()["errors"], 1)
+
+    def test_bad_source_fails_only_its_own_request(self):
+        class PickyModel(FakeModel):
+            def __call__(self, sources, **kwargs):
+                self.calls.append(list(sources))
+                if "bad.jpg" in sources:
+                    raise ValueError("cannot read bad.jpg")
+                return [f"result-{s}" for s in sources]
+
+        model = PickyModel()
+        batcher = InferenceBatcher(model, max_batch_size=4, max_wait_ms=200)
+        good, bad = batcher.submit("good.jpg"), batcher.submit("bad.jpg")
+        self.assertEqual(good.result(), "result-good.jpg")
+        with self.assertRaises(ValueError):
+            bad.result()
+        self.assertEqual(model.calls[0], ["good.jpg", "bad.jpg"])
+        stats = batcher.stats()
+        self.assertEqual((stats["errors"], stats["split_batches"]), (1, 1))
+
+    def test_executor_runs_batches_in_parallel(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        class SlowModel:
+            def __call__(self, sources, **kwargs):
+                with lock:
+                    active.append(1)
+                    peak.append(len(active))
+                time.sleep(0.05)
+                with lock:
+                    active.pop()
+                return list(sources)
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        batcher = InferenceBatcher(SlowModel(), max_batch_size=1, max_wait_ms=0,
+                                   executor=executor, max_in_flight=2, model_factory=SlowModel)
+        futures = [batcher.submit(i) for i in range(4)]
+        self.assertEqual([f.result() for f in futures], [0, 1, 2, 3])
+        self.assertEqual(max(peak), 2)
+        executor.shutdown()
+
+    def test_warm_up_reaches_every_slot(self):
+        built = []
+
+        def factory():
+            model = FakeModel()
+            built.append(model)
+            return model
+
+        shared = FakeModel()
+        executor = ThreadPoolExecutor(max_workers=3)
+        batcher = InferenceBatcher(shared, executor=executor, max_in_flight=3, model_factory=factory)
+        slots = batcher.warm_up("blank", runs=2)
+        executor.shutdown()
+
+        self.assertEqual(len({slot["slot"] for slot in slots}), 3)
+        self.assertEqual(len(built), 2)
+        for model in [shared] + built:
+            self.assertEqual(model.calls, [["blank"], ["blank"]])
+
+    def test_health_not_blocked_by_inference(self):
+        import app as app_module
+        release = threading.Event()
+        app_module.inference_executor.submit(release.wait, 5)
+        try:
+            client = TestClient(app)
+            response = client.get("/health")
+            self.assertEqual(response.status_code, 200)
+        finally:
+            release.set()
+
+    def test_metrics_endpoint(self):
+        client = TestClient(app)
+        response = client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("avg_batch_size", response.json()["batcher"])
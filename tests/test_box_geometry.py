@@ -0,0 +1,102 @@
+import json
+import unittest
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+
+from app import app, verify_user
+from db import SessionLocal
+from migrations import UNPARSEABLE_BOX_AREA, backfill_boxes, run_migrations
+from models import Base, DetectionObjects, PredictionSession
+import repository
+
+USERNAME = "box_user"
+
+
+class TestBoxGeometry(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides = {verify_user: lambda: USERNAME}
+        self.client = TestClient(app)
+        self.small, self.large = str(uuid.uuid4()), str(uuid.uuid4())
+        with SessionLocal() as db:
+            repository.save_prediction_sessions([
+                {"uid": self.small, "original_image": "o.jpg", "predicted_image": "p.jpg",
+                 "detections": [("cat", 0.9, [10, 10, 20, 30])]},
+                {"uid": self.large, "original_image": "o.jpg", "predicted_image": "p.jpg",
+                 "detections": [("dog", 0.8, [100.0, 50.0, 300.0, 250.0])]},
+            ], USERNAME, db)
+
+    def tearDown(self):
+        app.dependency_overrides = {}
+        uids = [self.small, self.large]
+        with SessionLocal() as db:
+            db.query(DetectionObjects).filter(DetectionObjects.prediction_uid.in_(uids)).delete()
+            db.query(PredictionSession).filter(PredictionSession.uid.in_(uids)).delete()
+            db.commit()
+
+    def _uids(self, url, **params):
+        response = self.client.get(url, params=params)
+        self.assertEqual(response.status_code, 200)
+        return {item["uid"] for item in response.json()}
+
+    def test_numeric_columns_written(self):
+        with SessionLocal() as db:
+            row = db.query(DetectionObjects).filter_by(prediction_uid=self.small).one()
+        self.assertEqual((row.x1, row.y1, row.x2, row.y2, row.area), (10, 10, 20, 30, 200))
+        self.assertEqual(json.loads(row.box), [10, 10, 20, 30])
+
+    def test_region(self):
+        self.assertEqual(self._uids("/predictions/region", x1=0, y1=0, x2=15, y2=15), {self.small})
+        self.assertEqual(self._uids("/predictions/region", x1=0, y1=0, x2=400, y2=400), {self.small, self.large})
+        self.assertEqual(self._uids("/predictions/region", x1=0, y1=0, x2=200, y2=200, contained=True), {self.small})
+        self.assertEqual(self._uids("/predictions/region", x1=30, y1=0, x2=90, y2=400), set())
+        self.assertEqual(self.client.get("/predictions/region", params={"x1": 5, "y1": 0, "x2": 5, "y2": 9}).status_code, 400)
+
+    def test_size(self):
+        self.assertEqual(self._uids("/predictions/size", min_area=1000), {self.large})
+        self.assertEqual(self._uids("/predictions/size", min_width=5, min_height=15), {self.small, self.large})
+        self.assertEqual(self._uids("/predictions/size", min_height=21), {self.large})
+        self.assertEqual(self.client.get("/predictions/size").status_code, 400)
+
+    def test_paged_and_streamed(self):
+        response = self.client.get("/predictions/size", params={"min_area": 1, "limit": 1})
+        self.assertEqual(len(response.json()), 1)
+        second = self.client.get("/predictions/size", params={"min_area": 1, "limit": 1,
+                                                             "after": response.headers["x-next-cursor"]})
+        self.assertEqual({response.json()[0]["uid"], second.json()[0]["uid"]}, {self.small, self.large})
+        streamed = self.client.get("/predictions/region", params={"x1": 0, "y1": 0, "x2": 400, "y2": 400, "stream": True})
+        self.assertEqual({json.loads(line)["uid"] for line in streamed.text.splitlines()}, {self.small, self.large})
+
+    def test_prediction_box_is_numeric(self):
+        objects = self.client.get(f"/prediction/{self.large}").json()["detection_objects"]
+        self.assertEqual(objects[0]["box"], [100.0, 50.0, 300.0, 250.0])
+
+    def test_backfill(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            # detection_objects as created before the numeric columns existed
+            conn.execute(text(
+                "CREATE TABLE detection_objects (id INTEGER PRIMARY KEY, prediction_uid VARCHAR, "
+                "label VARCHAR, score FLOAT, box VARCHAR)"
+            ))
+            conn.execute(text(
+                "INSERT INTO detection_objects (prediction_uid, label, score, box) VALUES "
+                "('a', 'cat', 0.9, '[0, 0, 4, 5]'), ('a', 'dog', 0.5, 'not json'), "
+                "('b', 'cat', 0.7, '[1.5, 2, 3.5, 4]'), ('b', 'cat', 0.6, NULL)"
+            ))
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        with engine.connect() as conn:
+            # startup only migrates the schema; the backfill is run explicitly
+            self.assertIsNone(conn.execute(text("SELECT max(x1) FROM detection_objects")).scalar())
+        self.assertEqual(backfill_boxes(engine, batch_size=1), 2)
+
+        self.assertIn("idx_detection_uid_area", {i["name"] for i in inspect(engine).get_indexes("detection_objects")})
+        with engine.connect() as conn:
+            rows = conn.execute(text("SELECT x1, y1, x2, y2, area FROM detection_objects ORDER BY id")).all()
+        self.assertEqual([tuple(r) for r in rows], [
+            (0, 0, 4, 5, 20), (None, None, None, None, UNPARSEABLE_BOX_AREA), (1.5, 2, 3.5, 4, 4), (None,) * 5,
+        ])
+        # the unparseable row is marked, so a second run finds nothing to do
+        self.assertEqual(backfill_boxes(engine), 0)
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import threading
+import unittest
+import uuid
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+import repository
+from db import create_db_engine, use_single_writer
+from models import Base, PredictionSession
+
+
+class TestSqliteProfile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_db_engine(f"sqlite:///{os.path.join(self.tmp.name, 'profile.db')}", sqlite_profile=True)
+        Base.metadata.create_all(bind=self.engine)
+        self.session_factory = sessionmaker(bind=self.engine, autoflush=False, autocommit=False)
+        self.lock = use_single_writer(self.session_factory)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_pragmas(self):
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text("PRAGMA journal_mode")).scalar(), "wal")
+            self.assertEqual(conn.execute(text("PRAGMA synchronous")).scalar(), 1)
+            self.assertGreater(conn.execute(text("PRAGMA busy_timeout")).scalar(), 0)
+            self.assertEqual(conn.execute(text("PRAGMA temp_store")).scalar(), 2)
+
+    def test_writer_lock_held_until_commit(self):
+        with self.session_factory() as db:
+            db.add(PredictionSession(uid=str(uuid.uuid4()), username="profile_user"))
+            db.flush()
+            self.assertTrue(self.lock.locked())
+            db.commit()
+            self.assertFalse(self.lock.locked())
+        with self.session_factory() as db:
+            repository.query_prediction_count(db, "profile_user")
+            self.assertFalse(self.lock.locked())
+
+    def test_released_on_rollback(self):
+        db = self.session_factory()
+        db.add(PredictionSession(uid=str(uuid.uuid4()), username="profile_user"))
+        db.flush()
+        db.close()
+        self.assertFalse(self.lock.locked())
+
+    def test_concurrent_writers(self):
+        errors = []
+
+        def write():
+            try:
+                for _ in range(10):
+                    with self.session_factory() as db:
+                        repository.save_prediction_session(
+                            str(uuid.uuid4()), "o.jpg", "p.jpg", "profile_user", db,
+                            detections=[("dog", 0.5, [0, 0, 1, 1])],
+                        )
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        with self.session_factory() as db:
+            self.assertEqual(db.query(PredictionSession).count(), 80)
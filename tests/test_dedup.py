@@ -0,0 +1,69 @@
+import io
+import os
+import random
+import threading
+import unittest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import repository
+from app import app
+
+
+def random_image():
+    # unique content per test run so earlier sessions never match
+    color = tuple(random.randrange(256) for _ in range(3))
+    image_bytes = io.BytesIO()
+    Image.new("RGB", (64, 64), color=color).save(image_bytes, format="PNG")
+    return image_bytes.getvalue()
+
+
+class TestDeduplication(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides = {}
+        self.client = TestClient(app)
+        self.image = random_image()
+
+    def predict(self, query=""):
+        return self.client.post(
+            f"/predict{query}",
+            files={"file": ("same.png", io.BytesIO(self.image), "image/png")},
+        )
+
+    def test_identical_upload_is_reused(self):
+        first = self.predict().json()
+        hits_before = self.client.get("/metrics").json()["dedup"]["hits"]
+
+        second = self.predict()
+        self.assertEqual(second.status_code, 200)
+        second = second.json()
+        self.assertFalse(first["deduplicated"])
+        self.assertTrue(second["deduplicated"])
+        self.assertNotEqual(first["prediction_uid"], second["prediction_uid"])
+        self.assertEqual(first["labels"], second["labels"])
+        self.assertTrue(os.path.exists(f"uploads/predicted/{second['prediction_uid']}.png"))
+        self.assertEqual(self.client.get("/metrics").json()["dedup"]["hits"], hits_before + 1)
+
+    def test_dedup_can_be_disabled(self):
+        self.predict()
+        response = self.predict("?dedup=false").json()
+        self.assertFalse(response["deduplicated"])
+
+    def test_batch_lookups_share_one_thread(self):
+        self.predict()
+        threads = []
+        lookup = repository.query_session_by_content
+
+        def recording_lookup(*args):
+            threads.append(threading.get_ident())
+            return lookup(*args)
+
+        with patch.object(repository, "query_session_by_content", recording_lookup):
+            response = self.client.post(
+                "/predict/batch",
+                files=[("files", (f"{i}.png", io.BytesIO(self.image), "image/png")) for i in range(4)],
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(threads), 4)
+        self.assertEqual(len(set(threads)), 1)
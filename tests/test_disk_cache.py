@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from disk_cache import DiskLRUCache
+
+
+class TestDiskLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, size):
+        def producer(path):
+            with open(path, "wb") as f:
+                f.write(b"x" * size)
+        return producer
+
+    def test_miss_then_hit(self):
+        cache = DiskLRUCache(self.directory, max_bytes=1000)
+        path = cache.get_or_create("a.jpg", self.write(10))
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(cache.get("a.jpg"), path)
+        stats = cache.stats()
+        self.assertEqual((stats["misses"], stats["hits"], stats["bytes"]), (1, 1, 10))
+
+    def test_evicts_least_recently_used(self):
+        cache = DiskLRUCache(self.directory, max_bytes=25)
+        cache.get_or_create("a", self.write(10))
+        cache.get_or_create("b", self.write(10))
+        cache.get("a")
+        cache.get_or_create("c", self.write(10))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_concurrent_misses_are_coalesced(self):
+        cache = DiskLRUCache(self.directory, max_bytes=1000)
+        calls = []
+
+        def slow_producer(path):
+            calls.append(path)
+            time.sleep(0.1)
+            self.write(5)(path)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_create("k", slow_producer)))
+                   for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(results)), 1)
+
+    def test_failed_producer_leaves_nothing(self):
+        cache = DiskLRUCache(self.directory, max_bytes=1000)
+
+        def failing(path):
+            open(path, "wb").close()
+            raise RuntimeError("render failed")
+
+        with self.assertRaises(RuntimeError):
+            cache.get_or_create("k", failing)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_existing_files_are_indexed(self):
+        DiskLRUCache(self.directory, max_bytes=1000).get_or_create("a", self.write(10))
+        cache = DiskLRUCache(self.directory, max_bytes=1000)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.stats()["bytes"], 10)
@@ -0,0 +1,92 @@
+import os
+import unittest
+import uuid
+from email.utils import formatdate
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app import app, verify_user
+from db import SessionLocal
+from models import PredictionSession
+
+
+class TestHttpCaching(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides = {verify_user: lambda: "mockuser"}
+        self.client = TestClient(app)
+        self.filename = f"{uuid.uuid4()}.png"
+        self.path = os.path.join("uploads", "predicted", self.filename)
+        os.makedirs("uploads/predicted", exist_ok=True)
+        Image.new("RGB", (64, 32), color="blue").save(self.path, format="PNG")
+        with open(self.path, "rb") as f:
+            self.content = f.read()
+        self.url = f"/image/predicted/{self.filename}"
+
+    def tearDown(self):
+        os.remove(self.path)
+        app.dependency_overrides = {}
+
+    def test_validators_present(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.content)
+        self.assertTrue(response.headers["etag"].startswith('"'))
+        self.assertIn("last-modified", response.headers)
+        self.assertIn("immutable", response.headers["cache-control"])
+        self.assertEqual(response.headers["accept-ranges"], "bytes")
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url).headers["etag"]
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response.headers["etag"], etag)
+        response = self.client.get(self.url, headers={"If-None-Match": '"other"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since(self):
+        future = formatdate(os.path.getmtime(self.path) + 60, usegmt=True)
+        past = formatdate(os.path.getmtime(self.path) - 60, usegmt=True)
+        self.assertEqual(self.client.get(self.url, headers={"If-Modified-Since": future}).status_code, 304)
+        self.assertEqual(self.client.get(self.url, headers={"If-Modified-Since": past}).status_code, 200)
+
+    def test_range(self):
+        size = len(self.content)
+        response = self.client.get(self.url, headers={"Range": "bytes=0-9"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.content[:10])
+        self.assertEqual(response.headers["content-range"], f"bytes 0-9/{size}")
+
+        response = self.client.get(self.url, headers={"Range": "bytes=-5"})
+        self.assertEqual(response.content, self.content[-5:])
+
+        response = self.client.get(self.url, headers={"Range": f"bytes={size}-"})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers["content-range"], f"bytes */{size}")
+
+    def test_if_range(self):
+        etag = self.client.get(self.url).headers["etag"]
+        response = self.client.get(self.url, headers={"Range": "bytes=0-9", "If-Range": etag})
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(self.url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.content)
+
+    def test_prediction_image_etag(self):
+        uid = str(uuid.uuid4())
+        with SessionLocal() as db:
+            db.add(PredictionSession(uid=uid, username="mockuser", predicted_image=self.path))
+            db.commit()
+        try:
+            png = self.client.get(f"/prediction/{uid}/image", headers={"Accept": "image/png"})
+            jpeg = self.client.get(f"/prediction/{uid}/image", headers={"Accept": "image/jpeg"})
+            self.assertEqual(png.status_code, 200)
+            self.assertEqual(png.headers["vary"], "Accept")
+            self.assertNotEqual(png.headers["etag"], jpeg.headers["etag"])
+            response = self.client.get(f"/prediction/{uid}/image",
+                                       headers={"Accept": "image/png", "If-None-Match": png.headers["etag"]})
+            self.assertEqual(response.status_code, 304)
+        finally:
+            with SessionLocal() as db:
+                db.query(PredictionSession).filter_by(uid=uid).delete()
+                db.commit()
@@ -0,0 +1,78 @@
+import io
+import os
+import threading
+import unittest
+import uuid
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import app as app_module
+from app import app, verify_user
+from db import SessionLocal
+from image_variants import target_size
+from models import PredictionSession
+
+
+class TestImageVariants(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides = {verify_user: lambda: "mockuser"}
+        self.client = TestClient(app)
+        self.filename = f"{uuid.uuid4()}.png"
+        self.path = os.path.join("uploads", "original", self.filename)
+        os.makedirs("uploads/original", exist_ok=True)
+        Image.new("RGB", (400, 200), color="green").save(self.path, format="PNG")
+
+    def tearDown(self):
+        os.remove(self.path)
+        app.dependency_overrides = {}
+
+    def test_target_size(self):
+        self.assertEqual(target_size((400, 200), width=100), (100, 50))
+        self.assertEqual(target_size((400, 200), height=100), (200, 100))
+        self.assertEqual(target_size((400, 200), width=100, height=100), (100, 50))
+        self.assertEqual(target_size((400, 200), width=1000), (400, 200))
+
+    def test_resized_webp_variant(self):
+        response = self.client.get(f"/image/original/{self.filename}?w=100&format=webp")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "image/webp")
+        image = Image.open(io.BytesIO(response.content))
+        self.assertEqual((image.format, image.size), ("WEBP", (100, 50)))
+
+    def test_variant_rendered_once(self):
+        misses = app_module.variant_cache.stats()["misses"]
+        results = []
+
+        def fetch():
+            results.append(self.client.get(f"/image/original/{self.filename}?h=20").content)
+
+        threads = [threading.Thread(target=fetch) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(Image.open(io.BytesIO(results[0])).size, (40, 20))
+        self.assertEqual(app_module.variant_cache.stats()["misses"], misses + 1)
+
+    def test_prediction_image_variant(self):
+        uid = str(uuid.uuid4())
+        with SessionLocal() as db:
+            db.add(PredictionSession(uid=uid, predicted_image=self.path, username="mockuser"))
+            db.commit()
+        try:
+            response = self.client.get(f"/prediction/{uid}/image?w=50&format=jpeg", headers={"accept": "image/*"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers["content-type"], "image/jpeg")
+            self.assertEqual(Image.open(io.BytesIO(response.content)).size, (50, 25))
+
+            response = self.client.get(f"/prediction/{uid}/image?format=webp", headers={"accept": "image/png"})
+            self.assertEqual(response.status_code, 406)
+        finally:
+            with SessionLocal() as db:
+                db.query(PredictionSession).filter_by(uid=uid).delete()
+                db.commit()
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(f"/image/original/{self.filename}?format=bmp").status_code, 400)
+        self.assertEqual(self.client.get(f"/image/original/{self.filename}?w=0").status_code, 422)
@@ -0,0 +1,139 @@
+import base64
+import datetime
+import io
+import threading
+import time
+import unittest
+import uuid
+from contextlib import nullcontext
+from types import SimpleNamespace
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app import app
+from db import SessionLocal
+from jobs import JobWorkerPool
+from models import DetectionObjects, PredictionJob, PredictionSession
+import repository
+
+
+def get_basic_auth_header(username: str, password: str) -> dict:
+    token = base64.b64encode(f"{username}:{password}".encode()).decode()
+    return {"Authorization": f"Basic {token}"}
+
+
+class TestPredictionJobs(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides = {}
+        self.client = TestClient(app)
+        self.username = "job_user"
+        self.password = "1234"
+        self.client.post("/register", headers=get_basic_auth_header(self.username, self.password))
+
+        self.image_bytes = io.BytesIO()
+        Image.new("RGB", (100, 100), color="red").save(self.image_bytes, format="JPEG")
+        self.image_bytes.seek(0)
+
+    def wait_for(self, job_id, headers=None, timeout=30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            response = self.client.get(f"/jobs/{job_id}", headers=headers)
+            if response.json()["status"] in ("done", "failed"):
+                return response
+            time.sleep(0.1)
+        self.fail("job did not finish in time")
+
+    def tearDown(self):
+        with SessionLocal() as db:
+            uids = [uid for (uid,) in db.query(PredictionSession.uid).filter_by(username=self.username)]
+            db.query(DetectionObjects).filter(DetectionObjects.prediction_uid.in_(uids)).delete()
+            db.query(PredictionSession).filter(PredictionSession.uid.in_(uids)).delete()
+            db.commit()
+
+    def test_async_predict(self):
+        headers = get_basic_auth_header(self.username, self.password)
+        response = self.client.post(
+            "/predict?mode=async",
+            files={"file": ("test.jpg", self.image_bytes, "image/jpeg")},
+            headers=headers,
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], "queued")
+
+        data = self.wait_for(response.json()["job_id"], headers).json()
+        self.assertEqual(data["status"], "done")
+        self.assertIn("prediction_uid", data["result"])
+        self.assertIn("detection_count", data["result"])
+
+        # the prediction is stored like a sync one
+        prediction = self.client.get(f"/prediction/{data['result']['prediction_uid']}", headers=headers)
+        self.assertEqual(prediction.status_code, 200)
+
+    def test_job_hidden_from_other_users(self):
+        headers = get_basic_auth_header(self.username, self.password)
+        response = self.client.post(
+            "/predict?mode=async",
+            files={"file": ("test.jpg", self.image_bytes, "image/jpeg")},
+            headers=headers,
+        )
+        job_id = response.json()["job_id"]
+        self.assertEqual(self.client.get(f"/jobs/{job_id}").status_code, 404)
+        self.wait_for(job_id, headers)
+
+    def test_failed_job_reports_error(self):
+        response = self.client.post("/predict?mode=async&img=beatles.jpeg")
+        self.assertEqual(response.status_code, 202)
+        data = self.wait_for(response.json()["job_id"]).json()
+        self.assertEqual(data["status"], "failed")
+        self.assertIsNotNone(data["error"])
+
+    def test_unknown_job(self):
+        self.assertEqual(self.client.get("/jobs/does-not-exist").status_code, 404)
+
+    def test_invalid_mode(self):
+        response = self.client.post(
+            "/predict?mode=later",
+            files={"file": ("test.jpg", self.image_bytes, "image/jpeg")},
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_stale_running_job_is_claimed_again(self):
+        job_id = str(uuid.uuid4())
+        with SessionLocal() as db:
+            db.query(PredictionJob).filter(PredictionJob.status != "done").delete()
+            db.add(PredictionJob(
+                job_id=job_id, status="running", filename="x.jpg",
+                started_at=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=1),
+            ))
+            db.commit()
+            self.assertIsNone(repository.claim_next_job(db, stale_after=7200))
+            job = repository.claim_next_job(db, stale_after=60)
+            self.assertEqual(job.job_id, job_id)
+            repository.finish_job(job_id, db, error="test cleanup")
+
+
+class TestJobWorkerPool(unittest.TestCase):
+    def test_worker_survives_database_error(self):
+        claims = [RuntimeError("database is locked"), SimpleNamespace(job_id="j1")]
+        finished = threading.Event()
+
+        def claim_next_job(db, stale_after):
+            outcome = claims.pop(0) if claims else None
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        def finish_job(job_id, db, result=None, error=None):
+            self.assertEqual((job_id, result), ("j1", {"ok": True}))
+            finished.set()
+
+        pool = JobWorkerPool(lambda job: {"ok": True}, lambda: nullcontext(), workers=1, poll_interval=0.01)
+        with patch.object(repository, "claim_next_job", claim_next_job), \
+                patch.object(repository, "finish_job", finish_job), \
+                self.assertLogs("jobs", level="ERROR"):
+            pool.start()
+            try:
+                self.assertTrue(finished.wait(5))
+            finally:
+                pool.stop()
@@ -0,0 +1,60 @@
+import base64
+import io
+import os
+import unittest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import app as app_module
+from app import app
+from db import SessionLocal
+from models import DetectionObjects, PredictionSession
+
+
+def get_basic_auth_header(username: str, password: str) -> dict:
+    token = base64.b64encode(f"{username}:{password}".encode()).decode()
+    return {"Authorization": f"Basic {token}"}
+
+
+class TestLazyRender(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides = {}
+        self.client = TestClient(app)
+        self.username = "render_user"
+        self.headers = get_basic_auth_header(self.username, "1234")
+        self.client.post("/register", headers=self.headers)
+
+        image_bytes = io.BytesIO()
+        Image.new("RGB", (90, 70), color="purple").save(image_bytes, format="JPEG")
+        image_bytes.seek(0)
+        self.image_bytes = image_bytes
+
+    def tearDown(self):
+        with SessionLocal() as db:
+            uids = [uid for (uid,) in db.query(PredictionSession.uid).filter_by(username=self.username)]
+            db.query(DetectionObjects).filter(DetectionObjects.prediction_uid.in_(uids)).delete()
+            db.query(PredictionSession).filter(PredictionSession.uid.in_(uids)).delete()
+            db.commit()
+
+    def test_render_deferred_until_requested(self):
+        response = self.client.post(
+            "/predict?render=false&dedup=false",
+            files={"file": ("lazy.jpg", self.image_bytes, "image/jpeg")},
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        uid = response.json()["prediction_uid"]
+        self.assertFalse(os.path.exists(f"uploads/predicted/{uid}.jpg"))
+        with SessionLocal() as db:
+            self.assertIsNone(db.query(PredictionSession).filter_by(uid=uid).first().predicted_image)
+
+        misses = app_module.render_cache.stats()["misses"]
+        first = self.client.get(f"/prediction/{uid}/image", headers={**self.headers, "accept": "image/jpeg"})
+        self.assertEqual(first.status_code, 200)
+        self.assertGreater(len(first.content), 0)
+        second = self.client.get(f"/prediction/{uid}/image", headers={**self.headers, "accept": "image/jpeg"})
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(app_module.render_cache.stats()["misses"], misses + 1)
+
+        self.client.delete(f"/prediction/{uid}", headers=self.headers)
+        self.assertIsNone(app_module.render_cache.get(f"{uid}.jpg"))
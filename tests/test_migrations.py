@@ -0,0 +1,72 @@
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from migrations import run_migrations
+from models import Base, PredictionSession
+
+
+class TestMigrations(unittest.TestCase):
+
+    def test_adds_missing_columns_and_indexes(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            # prediction_sessions as created before content hashing existed
+            conn.execute(text(
+                "CREATE TABLE prediction_sessions (uid VARCHAR PRIMARY KEY, timestamp DATETIME, "
+                "original_image VARCHAR, predicted_image VARCHAR, username VARCHAR)"
+            ))
+            conn.execute(text("INSERT INTO prediction_sessions (uid, username) VALUES ('old', 'u')"))
+        Base.metadata.create_all(bind=engine)
+
+        run_migrations(engine)
+        run_migrations(engine)  # idempotent
+
+        inspector = inspect(engine)
+        columns = {c["name"] for c in inspector.get_columns("prediction_sessions")}
+        self.assertIn("content_hash", columns)
+        indexes = {i["name"] for i in inspector.get_indexes("prediction_sessions")}
+        self.assertIn("idx_session_content", indexes)
+        with engine.connect() as conn:
+            self.assertEqual(conn.execute(text("SELECT count(*) FROM prediction_sessions")).scalar(), 1)
+
+    def test_time_window_indexes(self):
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE prediction_sessions (uid VARCHAR PRIMARY KEY, timestamp DATETIME, "
+                "original_image VARCHAR, predicted_image VARCHAR, username VARCHAR)"
+            ))
+            conn.execute(text(
+                "CREATE TABLE detection_objects (id INTEGER PRIMARY KEY, prediction_uid VARCHAR, "
+                "label VARCHAR, score FLOAT, box VARCHAR)"
+            ))
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+
+        inspector = inspect(engine)
+        self.assertIn("idx_session_user_time", {i["name"] for i in inspector.get_indexes("prediction_sessions")})
+        self.assertIn("idx_detection_uid_label", {i["name"] for i in inspector.get_indexes("detection_objects")})
+
+        since = datetime.now(timezone.utc) - timedelta(days=7)
+        with engine.connect() as conn:
+            plan = conn.execute(
+                text("EXPLAIN QUERY PLAN SELECT count(*) FROM prediction_sessions WHERE username = 'u' AND timestamp >= :since"),
+                {"since": since},
+            ).all()
+        self.assertIn("COVERING INDEX idx_session_user_time", plan[0][-1])
+
+    def test_timestamp_set_per_row(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        with Session(engine) as db:
+            db.add(PredictionSession(uid="first", username="u"))
+            db.commit()
+            time.sleep(0.01)
+            db.add(PredictionSession(uid="second", username="u"))
+            db.commit()
+            first, second = (db.get(PredictionSession, uid).timestamp for uid in ("first", "second"))
+        self.assertLess(first, second)
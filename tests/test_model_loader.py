@@ -0,0 +1,139 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+from app import app
+from model_loader import ModelLoader
+
+
+class FakeModel:
+    names = {0: "cat"}
+
+    def __call__(self, sources, **kwargs):
+        return [f"result-{i}" for i, _ in enumerate(sources)]
+
+
+class TestModelLoader(unittest.TestCase):
+    def test_loads_once(self):
+        loads = []
+
+        def load():
+            loads.append(1)
+            time.sleep(0.05)
+            return FakeModel()
+
+        loader = ModelLoader(load)
+        threads = [threading.Thread(target=loader.get) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(loader(["a", "b"]), ["result-0", "result-1"])
+        self.assertEqual(loader.names, {0: "cat"})
+        self.assertFalse(loader.ready())
+        self.assertGreater(loader.stats()["load_ms"], 0)
+
+    def test_warm_up(self):
+        loader = ModelLoader(FakeModel, warmup_runs=3, warmup_size=64)
+        calls = []
+
+        def warm_slots(image, runs):
+            calls.append((image.shape, runs))
+            return [{"slot": name, "load_ms": 1.0, "warmup_ms": 2.0} for name in ("a", "b")]
+
+        loader.warm_up(warm_slots)
+        self.assertEqual(calls, [((64, 64, 3), 3)])
+        self.assertTrue(loader.ready())
+        stats = loader.stats()
+        self.assertEqual((stats["loaded"], stats["ready"], stats["warmup_runs"]), (True, True, 6))
+        self.assertEqual([slot["slot"] for slot in stats["slots"]], ["a", "b"])
+        self.assertIsNotNone(stats["warmup_ms"])
+
+    def test_signature_hashes_loaded_weights_once(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "downloaded.pt")
+            with open(path, "wb") as f:
+                f.write(b"weights")
+            model = FakeModel()
+            model.ckpt_path = path
+            loader = ModelLoader(lambda: model, weights="missing.pt")
+            signature = loader.signature
+            os.remove(path)
+            self.assertEqual(loader.signature, signature)
+        name, digest, _ = signature.split(":")
+        self.assertEqual(name, "missing.pt")
+        self.assertEqual(len(digest), 16)
+
+    def test_failed_warm_up_stays_unready(self):
+        loader = ModelLoader(FakeModel, warmup_runs=1)
+
+        def broken(image, runs):
+            raise RuntimeError("no weights")
+
+        with self.assertRaises(RuntimeError):
+            loader.warm_up(broken)
+        self.assertFalse(loader.ready())
+        self.assertEqual(loader.stats()["error"], "no weights")
+
+
+class TestReadyEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_not_ready_until_warm(self):
+        loader = ModelLoader(FakeModel, warmup_runs=1)
+        with patch.object(app_module, "model_loader", loader):
+            response = self.client.get("/ready")
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.json()["status"], "warming_up")
+            self.assertEqual(self.client.get("/health").status_code, 200)
+
+            loader.warm_up(lambda image, runs: [{"slot": "a", "load_ms": 0, "warmup_ms": 0}])
+            response = self.client.get("/ready")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["model"]["warmup_runs"], 1)
+
+    def test_lifespan_warms_up(self):
+        loader = ModelLoader(FakeModel, warmup_runs=2)
+        batcher = MagicMock()
+        batcher.warm_up.return_value = [{"slot": "a", "load_ms": 0, "warmup_ms": 0}]
+        # the lifespan's shutdown would stop executors other tests share
+        with patch.object(app_module, "model_loader", loader), patch.object(app_module, "batcher", batcher), \
+                patch.object(app_module, "job_workers", MagicMock()), patch.object(app_module, "s3_uploader", MagicMock()):
+            with TestClient(app) as client:
+                deadline = time.monotonic() + 10
+                while client.get("/ready").status_code != 200 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                response = client.get("/ready")
+        self.assertEqual(response.status_code, 200)
+        batcher.warm_up.assert_called_once()
+        self.assertEqual(batcher.warm_up.call_args.args[1], 2)
+
+
+class TestImportLight(unittest.TestCase):
+    def test_import_does_not_load_torch(self):
+        code = (
+            "import sys, app, repository\n"
+            "heavy = [m for m in ('torch', 'ultralytics', 'boto3') if m in sys.modules]\n"
+            "assert not heavy, heavy\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+
+    def test_import_without_weights_file(self):
+        # the weights are downloaded by the first load, so import must not read them
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, PYTHONPATH=root)
+            result = subprocess.run([sys.executable, "-c", "import app"], cwd=tmp, env=env,
+                                    capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
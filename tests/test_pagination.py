@@ -0,0 +1,110 @@
+import json
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, update
+
+from app import app, verify_user
+from db import SessionLocal
+from models import Base, DetectionObjects, PredictionSession
+import repository
+
+USERNAME = "page_user"
+
+
+class TestPagination(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides = {verify_user: lambda: USERNAME}
+        self.client = TestClient(app)
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.uids = []
+        with SessionLocal() as db:
+            for i in range(7):
+                uid = str(uuid.uuid4())
+                # two sessions share a timestamp so the uid tie-break is exercised; one has none
+                timestamp = None if i == 6 else start + timedelta(minutes=min(i, 4))
+                db.add(PredictionSession(uid=uid, username=USERNAME, timestamp=timestamp))
+                db.add(DetectionObjects(prediction_uid=uid, label="zebra", score=0.1 * i))
+                self.uids.append(uid)
+            db.commit()
+            # the column default fills in None on insert
+            db.execute(update(PredictionSession).where(PredictionSession.uid == self.uids[6]).values(timestamp=None))
+            db.commit()
+
+    def tearDown(self):
+        app.dependency_overrides = {}
+        with SessionLocal() as db:
+            db.query(DetectionObjects).filter(DetectionObjects.prediction_uid.in_(self.uids)).delete()
+            db.query(PredictionSession).filter(PredictionSession.uid.in_(self.uids)).delete()
+            db.commit()
+
+    def _all_pages(self, url, limit):
+        seen = []
+        after = None
+        while True:
+            params = {"limit": limit}
+            if after:
+                params["after"] = after
+            response = self.client.get(url, params=params)
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page), limit)
+            seen.extend(item["uid"] for item in page)
+            after = response.headers.get("x-next-cursor")
+            if not after:
+                return seen
+
+    def test_pages_cover_everything_once(self):
+        full = [item["uid"] for item in self.client.get("/predictions/label/zebra").json()]
+        self.assertEqual(sorted(full), sorted(self.uids))
+        for limit in (1, 2, 3, 7):
+            self.assertEqual(self._all_pages("/predictions/label/zebra", limit), full)
+
+    def test_newest_first_nulls_last(self):
+        full = self.client.get("/predictions/score/0").json()
+        timestamps = [item["timestamp"] for item in full]
+        self.assertIsNone(timestamps[-1])
+        self.assertEqual(timestamps[:-1], sorted(timestamps[:-1], reverse=True))
+        self.assertEqual(len(self.client.get("/predictions/score/0.35").json()), 3)
+
+    def test_stream_ndjson(self):
+        response = self.client.get("/predictions/label/zebra?stream=true")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        streamed = [json.loads(line)["uid"] for line in response.text.splitlines()]
+        full = [item["uid"] for item in self.client.get("/predictions/label/zebra").json()]
+        self.assertEqual(streamed, full)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/predictions/label/zebra?limit=2&after=not-a-cursor")
+        self.assertEqual(response.status_code, 400)
+
+
+class TestCursorPlan(unittest.TestCase):
+    def _plans(self, stmts):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        executed = []
+        event.listen(engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, parameters, context, executemany: executed.append((statement, parameters)))
+        plans = []
+        with engine.connect() as conn:
+            for stmt in stmts:
+                conn.execute(stmt).all()
+                statement, parameters = executed[-1]
+                plans.append([row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)])
+        return plans
+
+    def test_cursor_page_seeks(self):
+        after = (datetime(2024, 1, 1, tzinfo=timezone.utc), str(uuid.uuid4()))
+        timestamped, untimed = self._plans(repository.predictions_by_label_stmts("zebra", USERNAME, after))
+        # a range on timestamp, not a walk over every newer session of the user
+        self.assertIn("USING COVERING INDEX idx_session_user_time (username=? AND timestamp<?)", timestamped[0])
+        self.assertFalse(any("TEMP B-TREE" in step for step in timestamped))
+        self.assertIn("USING COVERING INDEX idx_session_user_time (username=? AND timestamp=?)", untimed[0])
+
+    def test_first_page_needs_no_sort(self):
+        for plan in self._plans(repository.predictions_by_score_stmts(0.5, USERNAME)):
+            self.assertIn("idx_session_user_time", plan[0])
+            self.assertFalse(any("TEMP B-TREE" in step for step in plan))
@@ -0,0 +1,100 @@
+import base64
+import io
+import os
+import random
+import unittest
+from unittest.mock import MagicMock, patch
+import boto3
+from fastapi.testclient import TestClient
+from moto import mock_aws
+from PIL import Image
+
+import app as app_module
+from app import app
+from db import SessionLocal
+from models import DetectionObjects, PredictionSession
+
+
+def get_basic_auth_header(username: str, password: str) -> dict:
+    token = base64.b64encode(f"{username}:{password}".encode()).decode()
+    return {"Authorization": f"Basic {token}"}
+
+
+def make_image(color):
+    image_bytes = io.BytesIO()
+    Image.new("RGB", (100, 100), color=color).save(image_bytes, format="JPEG")
+    image_bytes.seek(0)
+    return image_bytes
+
+
+class TestPredictBatch(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides = {}
+        self.client = TestClient(app)
+        self.username = "batch_user"
+        self.password = "1234"
+        self.client.post("/register", headers=get_basic_auth_header(self.username, self.password))
+
+    def tearDown(self):
+        with SessionLocal() as db:
+            uids = [uid for (uid,) in db.query(PredictionSession.uid).filter_by(username=self.username)]
+            db.query(DetectionObjects).filter(DetectionObjects.prediction_uid.in_(uids)).delete()
+            db.query(PredictionSession).filter(PredictionSession.uid.in_(uids)).delete()
+            db.commit()
+
+    def test_batch_upload(self):
+        response = self.client.post(
+            "/predict/batch",
+            files=[
+                ("files", ("a.jpg", make_image("red"), "image/jpeg")),
+                ("files", ("b.jpg", make_image("blue"), "image/jpeg")),
+            ],
+            headers=get_basic_auth_header(self.username, self.password),
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["filename"] for r in results], ["a.jpg", "b.jpg"])
+        with SessionLocal() as db:
+            for r in results:
+                self.assertIn("detection_count", r)
+                row = db.query(PredictionSession).filter_by(uid=r["prediction_uid"]).first()
+                self.assertIsNotNone(row)
+                self.assertEqual(row.username, self.username)
+                self.assertIsNotNone(row.timestamp)
+
+    def test_per_image_failures_are_reported(self):
+        response = self.client.post(
+            "/predict/batch?img=notes.txt",
+            files=[("files", ("a.jpg", make_image("red"), "image/jpeg"))],
+        )
+        self.assertEqual(response.status_code, 200)
+        ok, failed = response.json()["results"]
+        self.assertIn("prediction_uid", ok)
+        self.assertEqual(failed["filename"], "notes.txt")
+        self.assertEqual(failed["status_code"], 400)
+        self.assertEqual(failed["error"], "Unsupported image extension")
+
+    def test_bad_s3_image_fails_only_itself(self):
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+        with mock_aws():
+            s3 = boto3.client("s3", region_name="us-east-1")
+            s3.create_bucket(Bucket="batch-test-bucket")
+            # random colour so no earlier session is reused and good.png reaches the model
+            color = tuple(random.randrange(256) for _ in range(3))
+            s3.put_object(Bucket="batch-test-bucket", Key="anonymous/original/good.png",
+                          Body=make_image(color).getvalue())
+            s3.put_object(Bucket="batch-test-bucket", Key="anonymous/original/bad.png", Body=os.urandom(512))
+            with patch.object(app_module, "s3_client", s3), \
+                    patch.object(app_module, "AWS_S3_BUCKET", "batch-test-bucket"), \
+                    patch.object(app_module, "s3_uploader", MagicMock()):
+                response = self.client.post("/predict/batch?img=good.png&img=bad.png")
+        self.assertEqual(response.status_code, 200)
+        good, bad = response.json()["results"]
+        self.assertIn("prediction_uid", good)
+        self.assertEqual(bad["filename"], "bad.png")
+        self.assertEqual(bad["status_code"], 400)
+
+    def test_empty_batch(self):
+        response = self.client.post("/predict/batch")
+        self.assertEqual(response.status_code, 400)
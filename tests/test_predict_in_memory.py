@@ -0,0 +1,36 @@
+import io
+import os
+import unittest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app import app
+
+
+class TestInMemoryUpload(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides = {}
+        self.client = TestClient(app)
+
+    def test_original_written_from_upload_bytes(self):
+        image_bytes = io.BytesIO()
+        Image.new("RGB", (80, 60), color="yellow").save(image_bytes, format="PNG")
+        data = image_bytes.getvalue()
+
+        response = self.client.post(
+            "/predict?dedup=false",
+            files={"file": ("frame.png", io.BytesIO(data), "image/png")},
+        )
+        self.assertEqual(response.status_code, 200)
+        uid = response.json()["prediction_uid"]
+        with open(f"uploads/original/{uid}.png", "rb") as f:
+            self.assertEqual(f.read(), data)
+        self.assertTrue(os.path.exists(f"uploads/predicted/{uid}.png"))
+
+    def test_undecodable_upload(self):
+        response = self.client.post(
+            "/predict",
+            files={"file": ("notes.jpg", io.BytesIO(b"not an image"), "image/jpeg")},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["detail"], "Could not decode image")
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import time
+import unittest
+import uuid
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+import db as db_module
+from app import app, verify_user
+from db import ReadYourWrites, SessionLocal, create_db_engine
+from models import Base
+import repository
+
+USERNAME = "replica_user"
+
+
+class TestReadYourWrites(unittest.TestCase):
+    def test_pinned_within_window(self):
+        tracker = ReadYourWrites(window=0.05)
+        self.assertFalse(tracker.pinned(USERNAME, "u1"))
+        tracker.wrote(USERNAME, ["u1"])
+        self.assertTrue(tracker.pinned(USERNAME))
+        self.assertTrue(tracker.pinned("someone_else", "u1"))
+        self.assertFalse(tracker.pinned("someone_else", "u2"))
+        time.sleep(0.06)
+        self.assertFalse(tracker.pinned(USERNAME, "u1"))
+
+    def test_disabled(self):
+        tracker = ReadYourWrites(window=0)
+        tracker.wrote(USERNAME, ["u1"])
+        self.assertFalse(tracker.pinned(USERNAME, "u1"))
+
+
+class TestReplicaRouting(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.replica = create_db_engine(f"sqlite:///{os.path.join(self.tmp.name, 'replica.db')}")
+        Base.metadata.create_all(bind=self.replica)
+        # a session only the replica has, so the answer shows where the read went
+        self.uid = str(uuid.uuid4())
+        with SessionLocal(bind=self.replica) as db:
+            repository.save_prediction_session(self.uid, "o.jpg", "p.jpg", USERNAME, db,
+                                               detections=[("okapi", 0.9, [0, 0, 5, 5])])
+        self.replicas, db_module.replica_engines = db_module.replica_engines, [self.replica]
+        self.tracker = ReadYourWrites(window=60)
+        self.app_tracker, app_module.read_your_writes = app_module.read_your_writes, self.tracker
+        app.dependency_overrides = {verify_user: lambda: USERNAME}
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        app.dependency_overrides = {}
+        db_module.replica_engines = self.replicas
+        app_module.read_your_writes = self.app_tracker
+        self.replica.dispose()
+        self.tmp.cleanup()
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(self.client.get(f"/prediction/{self.uid}").status_code, 200)
+        self.assertEqual([p["uid"] for p in self.client.get("/predictions/label/okapi").json()], [self.uid])
+        streamed = self.client.get("/predictions/label/okapi", params={"stream": True})
+        self.assertIn(self.uid, streamed.text)
+        self.assertEqual(self.client.get("/labels").json()["labels"], ["okapi"])
+
+    def test_read_your_writes_uses_primary(self):
+        self.tracker.wrote(USERNAME)
+        self.assertEqual(self.client.get(f"/prediction/{self.uid}").status_code, 404)
+        self.assertEqual(self.client.get("/predictions/label/okapi").json(), [])
+
+    def test_just_created_uid_uses_primary(self):
+        self.tracker.wrote(None, [self.uid])
+        self.assertEqual(self.client.get(f"/prediction/{self.uid}").status_code, 404)
+        # other reads of the same user still go to the replica
+        self.assertEqual(self.client.get("/labels").json()["labels"], ["okapi"])
@@ -0,0 +1,75 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session
+
+import repository
+import rollups
+from migrations import run_migrations
+from models import Base, DailyLabelCount, DailyPredictionCount
+
+
+def _session(uid, days_ago, detections):
+    return {
+        "uid": uid,
+        "timestamp": datetime.now(timezone.utc) - timedelta(days=days_ago),
+        "original_image": None,
+        "predicted_image": None,
+        "detections": detections,
+    }
+
+
+class TestRollups(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=self.engine)
+        self.db = Session(self.engine)
+        repository.save_prediction_sessions([
+            _session("today", 0, [("cat", 0.4, [0, 0, 1, 1]), ("cat", 0.8, [0, 0, 1, 1])]),
+            _session("closed", 3, [("dog", 0.6, [0, 0, 1, 1])]),
+            _session("closed2", 3, [("dog", 0.9, [0, 0, 1, 1]), ("bird", 0.2, [0, 0, 1, 1])]),
+            _session("old", 10, [("horse", 0.5, [0, 0, 1, 1])]),
+        ], "rollup_user", self.db)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_rollups_updated_on_save(self):
+        day = (datetime.now(timezone.utc) - timedelta(days=3)).date()
+        row = self.db.get(DailyPredictionCount, ("rollup_user", day))
+        self.assertEqual(row.session_count, 2)
+        dog = self.db.get(DailyLabelCount, ("rollup_user", day, "dog"))
+        self.assertEqual((dog.occurrences, dog.max_score), (2, 0.9))
+        self.assertEqual(rollups.check(self.db), [])
+
+    def test_queries_use_rollups_and_raw(self):
+        self.assertEqual(repository.query_prediction_count(self.db, "rollup_user"), 3)
+        self.assertEqual(repository.query_unique_labels(self.db, "rollup_user"), ["bird", "cat", "dog"])
+        self.assertEqual(repository.query_prediction_count(self.db, "someone_else"), 0)
+
+    def test_delete_decrements(self):
+        self.assertEqual(repository.delete_prediction("closed2", "rollup_user", self.db), 1)
+        self.assertEqual(repository.query_prediction_count(self.db, "rollup_user"), 2)
+        self.assertEqual(repository.query_unique_labels(self.db, "rollup_user"), ["cat", "dog"])
+        # closed2 held the day's highest dog score
+        day = (datetime.now(timezone.utc) - timedelta(days=3)).date()
+        self.assertEqual(self.db.get(DailyLabelCount, ("rollup_user", day, "dog")).max_score, 0.6)
+        self.assertEqual(rollups.check(self.db), [])
+        self.assertEqual(repository.delete_prediction("closed2", "rollup_user", self.db), 0)
+        self.assertEqual(repository.delete_prediction("closed", "another_user", self.db), 0)
+
+    def test_check_and_rebuild(self):
+        self.db.execute(update(DailyPredictionCount).values(session_count=99))
+        self.db.commit()
+        self.assertNotEqual(rollups.check(self.db), [])
+        rollups.rebuild(self.db)
+        self.assertEqual(rollups.check(self.db), [])
+        self.assertEqual(repository.query_prediction_count(self.db, "rollup_user"), 3)
+
+    def test_migration_backfills(self):
+        self.db.query(DailyLabelCount).delete()
+        self.db.query(DailyPredictionCount).delete()
+        self.db.commit()
+        run_migrations(self.engine)
+        self.assertEqual(rollups.check(self.db), [])
@@ -0,0 +1,121 @@
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from unittest.mock import MagicMock, patch
+import boto3
+from fastapi.testclient import TestClient
+from moto import mock_aws
+from PIL import Image
+
+import app as app_module
+from app import app
+
+BUCKET = "cache-test-bucket"
+
+
+class TestS3ReadThroughCache(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+        self.mock = mock_aws()
+        self.mock.start()
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.s3.create_bucket(Bucket=BUCKET)
+        self.patches = [
+            patch.object(app_module, "s3_client", self.s3),
+            patch.object(app_module, "AWS_S3_BUCKET", BUCKET),
+        ]
+        for p in self.patches:
+            p.start()
+        app.dependency_overrides = {}
+        self.client = TestClient(app)
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.mock.stop()
+        self.tmp.cleanup()
+
+    def _put(self, key, color):
+        data = io.BytesIO()
+        Image.new("RGB", (32, 32), color=color).save(data, format="PNG")
+        self.s3.put_object(Bucket=BUCKET, Key=key, Body=data.getvalue())
+        return data.getvalue()
+
+    def _stats(self):
+        return app_module._s3_cache_metrics()
+
+    def test_repeat_fetch_served_from_cache(self):
+        name = f"{uuid.uuid4()}.png"
+        data = self._put(f"anonymous/original/{name}", "orange")
+        before = self._stats()
+        for _ in range(2):
+            response = self.client.post(f"/predict?img={name}&dedup=false")
+            self.assertEqual(response.status_code, 200)
+            uid = response.json()["prediction_uid"]
+            with open(f"uploads/original/{uid}.png", "rb") as f:
+                self.assertEqual(f.read(), data)
+        after = self._stats()
+        self.assertEqual(after["requests"] - before["requests"], 2)
+        self.assertEqual(after["downloads"] - before["downloads"], 1)
+        self.assertEqual(after["bytes_saved"] - before["bytes_saved"], len(data))
+        self.assertIsNotNone(after["hit_ratio"])
+
+    def test_changed_object_downloaded_again(self):
+        key = f"anonymous/original/{uuid.uuid4()}.png"
+        self._put(key, "red")
+        app_module._download_cached(key, os.path.join(self.tmp.name, "a.png"))
+        data = self._put(key, "blue")
+        downloads = self._stats()["downloads"]
+        app_module._download_cached(key, os.path.join(self.tmp.name, "b.png"))
+        self.assertEqual(self._stats()["downloads"], downloads + 1)
+        with open(os.path.join(self.tmp.name, "b.png"), "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    def test_object_replaced_in_bucket_served_fresh(self):
+        name = f"{uuid.uuid4()}.png"
+        key = f"anonymous/original/{name}"
+        # the background upload of the original would race the replacement below
+        with patch.object(app_module, "s3_uploader", MagicMock()):
+            for color in ("red", "blue"):
+                # replaced directly in the bucket while the resolver still holds the old ETag
+                data = self._put(key, color)
+                response = self.client.post(f"/predict?img={name}&dedup=false")
+                self.assertEqual(response.status_code, 200)
+                uid = response.json()["prediction_uid"]
+                with open(f"uploads/original/{uid}.png", "rb") as f:
+                    self.assertEqual(f.read(), data)
+        self.assertGreater(app_module.s3_resolver.stats()["revalidations"], 0)
+
+    def test_concurrent_misses_coalesced(self):
+        key = f"anonymous/original/{uuid.uuid4()}.png"
+        self._put(key, "green")
+        original = app_module._download_from_s3
+        calls = []
+
+        def slow_download(k, path):
+            calls.append(k)
+            time.sleep(0.2)
+            original(k, path)
+
+        with patch.object(app_module, "_download_from_s3", slow_download):
+            threads = [
+                threading.Thread(target=app_module._download_cached, args=(key, os.path.join(self.tmp.name, f"{i}.png")))
+                for i in range(4)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(calls, [key])
+        self.assertEqual(len(os.listdir(self.tmp.name)), 4)
+
+    def test_missing_key(self):
+        response = self.client.post("/predict?img=absent.png")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["detail"], "Image key not found in S3")
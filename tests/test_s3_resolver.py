@@ -0,0 +1,104 @@
+import os
+import tempfile
+import time
+import unittest
+import uuid
+from unittest.mock import patch
+import boto3
+from fastapi import HTTPException
+from moto import mock_aws
+
+import app as app_module
+from s3_resolver import KeyResolver
+
+BUCKET = "resolver-test-bucket"
+
+
+class TestKeyResolver(unittest.TestCase):
+    def test_results_cached(self):
+        calls = []
+        objects = {"b": "etag-b"}
+
+        def head(key):
+            calls.append(key)
+            return objects.get(key)
+
+        resolver = KeyResolver(head, exists_ttl=60, missing_ttl=60)
+        self.assertEqual(resolver.resolve(["a", "b", "c"]), ("b", "etag-b"))
+        self.assertEqual(resolver.resolve(["a", "b", "c"]), ("b", "etag-b"))
+        self.assertEqual(calls, ["a", "b"])
+        self.assertEqual(resolver.resolve(["c"]), (None, None))
+        self.assertEqual(resolver.resolve(["c"]), (None, None))
+        self.assertEqual(calls, ["a", "b", "c"])
+
+    def test_expiry_and_forget(self):
+        calls = []
+        resolver = KeyResolver(lambda key: calls.append(key), exists_ttl=60, missing_ttl=0.05)
+        resolver.etag("a")
+        time.sleep(0.1)
+        resolver.etag("a")
+        resolver.forget("a")
+        resolver.etag("a")
+        self.assertEqual(calls, ["a", "a", "a"])
+
+
+class TestFallbackFetch(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+        self.mock = mock_aws()
+        self.mock.start()
+        self.s3 = boto3.client("s3", region_name="us-east-1")
+        self.s3.create_bucket(Bucket=BUCKET)
+        self.patches = [
+            patch.object(app_module, "s3_client", self.s3),
+            patch.object(app_module, "AWS_S3_BUCKET", BUCKET),
+            patch.object(app_module, "s3_resolver", KeyResolver(lambda key: app_module._head_etag(key))),
+        ]
+        for p in self.patches:
+            p.start()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.mock.stop()
+        self.tmp.cleanup()
+
+    def _exists(self, key):
+        try:
+            self.s3.head_object(Bucket=BUCKET, Key=key)
+            return True
+        except self.s3.exceptions.ClientError:
+            return False
+
+    def _fetch(self, img, username):
+        path = os.path.join(self.tmp.name, f"{username}-{img}")
+        app_module._fetch_s3_image(img, username, username, path)
+        return path
+
+    def test_fallback_downloaded_directly_and_copied(self):
+        name = f"{uuid.uuid4()}.png"
+        self.s3.put_object(Bucket=BUCKET, Key=f"anonymous/original/{name}", Body=b"shared image")
+        with patch.object(app_module, "_head_etag", wraps=app_module._head_etag) as head:
+            with open(self._fetch(name, "alice"), "rb") as f:
+                self.assertEqual(f.read(), b"shared image")
+            self.assertEqual(head.call_count, 2)
+            # another user looks up their own prefix, then revalidates the cached fallback
+            self._fetch(name, "bob")
+            self.assertEqual(head.call_count, 4)
+
+        for _ in range(100):
+            if self._exists(f"alice/original/{name}") and self._exists(f"bob/original/{name}"):
+                break
+            time.sleep(0.05)
+        else:
+            self.fail("fallback object was not copied into the user prefixes")
+
+    def test_missing_name_cached(self):
+        with patch.object(app_module, "_head_etag", wraps=app_module._head_etag) as head:
+            for _ in range(2):
+                with self.assertRaises(HTTPException) as ctx:
+                    self._fetch("absent.png", "alice")
+                self.assertEqual(ctx.exception.status_code, 404)
+            self.assertEqual(head.call_count, 3)
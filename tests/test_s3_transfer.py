@@ -0,0 +1,32 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import app as app_module
+from s3_transfer import client_config, create_client, transfer_config
+
+
+class TestS3Transfer(unittest.TestCase):
+    def test_client_config(self):
+        config = client_config(max_pool_connections=64)
+        self.assertEqual(config.max_pool_connections, 64)
+        self.assertEqual(config.retries["mode"], "adaptive")
+        self.assertIsNotNone(config.connect_timeout)
+        self.assertIsNotNone(config.read_timeout)
+
+    def test_client_uses_config(self):
+        client = create_client("us-east-1", config=client_config(max_pool_connections=33))
+        self.assertEqual(client.meta.config.max_pool_connections, 33)
+
+    def test_transfer_config(self):
+        config = transfer_config(multipart_chunksize=16 * 1024 * 1024, max_concurrency=4)
+        self.assertEqual(config.multipart_chunksize, 16 * 1024 * 1024)
+        self.assertEqual(config.max_concurrency, 4)
+
+    def test_transfers_share_config(self):
+        s3_client = MagicMock()
+        with patch.object(app_module, "s3_client", s3_client), patch.object(app_module, "AWS_S3_BUCKET", "bucket"):
+            app_module._upload_to_s3("uploads/original/a.png", "user/original/a.png")
+            app_module._download_from_s3("user/original/a.png", "/tmp/a.png")
+            app_module._copy_s3_object("anonymous/original/a.png", "user/original/a.png")
+        for method in (s3_client.upload_file, s3_client.download_file, s3_client.copy):
+            self.assertIs(method.call_args.kwargs["Config"], app_module.S3_TRANSFER_CONFIG)
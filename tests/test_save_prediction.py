@@ -0,0 +1,36 @@
+import unittest
+import uuid
+
+from db import SessionLocal
+from models import DetectionObjects, PredictionSession
+import repository
+
+
+class TestSavePredictionSession(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.uid = str(uuid.uuid4())
+
+    def tearDown(self):
+        self.db.query(DetectionObjects).filter_by(prediction_uid=self.uid).delete()
+        self.db.query(PredictionSession).filter_by(uid=self.uid).delete()
+        self.db.commit()
+        self.db.close()
+
+    def test_session_and_detections_saved_together(self):
+        detections = [("cat", 0.9, [1.0, 2.0, 3.0, 4.0]), ("dog", 0.5, [5.0, 6.0, 7.0, 8.0])]
+        repository.save_prediction_session(self.uid, "o.jpg", "p.jpg", "mockuser", self.db, detections=detections)
+
+        self.assertIsNotNone(self.db.query(PredictionSession).filter_by(uid=self.uid).first())
+        rows = self.db.query(DetectionObjects).filter_by(prediction_uid=self.uid).order_by(DetectionObjects.id).all()
+        self.assertEqual([r.label for r in rows], ["cat", "dog"])
+        self.assertEqual(rows[1].box, "[5.0, 6.0, 7.0, 8.0]")
+
+    def test_failure_leaves_nothing_behind(self):
+        # the second box cannot be serialized, so the whole transaction rolls back
+        detections = [("cat", 0.9, [1, 2, 3, 4]), ("dog", 0.5, object())]
+        with self.assertRaises(TypeError):
+            repository.save_prediction_session(self.uid, "o.jpg", "p.jpg", "mockuser", self.db, detections=detections)
+
+        self.assertIsNone(self.db.query(PredictionSession).filter_by(uid=self.uid).first())
+        self.assertEqual(self.db.query(DetectionObjects).filter_by(prediction_uid=self.uid).count(), 0)
@@ -0,0 +1,46 @@
+import os
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from worker_pool import ProcessInferencePool, load_image
+
+
+class TestProcessInferencePool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = ProcessInferencePool("yolov8n.pt", workers=1, threads_per_worker=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def test_batch_of_arrays_and_paths(self):
+        path = "uploads/original/worker_pool_test.jpg"
+        os.makedirs("uploads/original", exist_ok=True)
+        Image.new("RGB", (64, 48), color="red").save(path)
+        try:
+            frames = [np.zeros((120, 160, 3), dtype=np.uint8), path]
+            results = self.pool(frames, device="cpu", verbose=False)
+        finally:
+            os.remove(path)
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0].orig_img.shape, (120, 160, 3))
+        self.assertEqual(results[1].orig_img.shape, (48, 64, 3))
+        for result in results:
+            self.assertEqual(result.boxes.data.shape[1], 6)
+            self.assertEqual(result.plot().shape, result.orig_img.shape)
+        self.assertIn(0, self.pool.names)
+
+    def test_warm_up_reaches_every_worker(self):
+        slots = self.pool.warm_up(np.zeros((64, 64, 3), dtype=np.uint8), runs=1, device="cpu", verbose=False)
+        self.assertEqual(len(slots), self.pool.workers)
+        self.assertGreater(slots[0]["load_ms"], 0)
+        self.assertGreater(slots[0]["warmup_ms"], 0)
+
+    def test_load_image_rejects_unreadable_file(self):
+        with self.assertRaises(ValueError):
+            load_image("does/not/exist.jpg")
@@ -0,0 +1,132 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import app as app_module
+from app import app, verify_user
+from db import SessionLocal
+from models import DetectionObjects, PredictionSession
+from write_behind import WriteBehindQueue
+
+
+def _session(uid, username="wb_user"):
+    return {
+        "uid": uid,
+        "timestamp": datetime.now(timezone.utc),
+        "username": username,
+        "original_image": f"uploads/original/{uid}.png",
+        "predicted_image": None,
+        "detections": [("cat", 0.9, [1.0, 2.0, 3.0, 4.0])],
+    }
+
+
+class TestWriteBehindQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.journal = os.path.join(self.tmp.name, "journal.jsonl")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_batches_written_by_one_writer(self):
+        batches = []
+        queue = WriteBehindQueue(batches.append, journal_path=self.journal, flush_ms=50)
+        queue.enqueue([_session(f"s{i}") for i in range(5)])
+        self.assertIsNotNone(queue.get("s3"))
+        self.assertTrue(queue.flush(5))
+        self.assertEqual(sum(len(b) for b in batches), 5)
+        self.assertLess(len(batches), 5)
+        self.assertIsNone(queue.get("s3"))
+        self.assertEqual(os.path.getsize(self.journal), 0)
+        queue.stop()
+
+    def test_journal_replayed(self):
+        failing = WriteBehindQueue(lambda sessions: 1 / 0, journal_path=self.journal)
+        failing.enqueue([_session("a"), _session("b")])
+        self.assertTrue(failing.update("a", upload_status="uploaded"))
+        failing.stop(timeout=5)
+
+        written = []
+        replayed = WriteBehindQueue(written.extend, journal_path=self.journal)
+        self.assertTrue(replayed.flush(5))
+        self.assertEqual(sorted(s["uid"] for s in written), ["a", "b"])
+        self.assertEqual(next(s for s in written if s["uid"] == "a")["upload_status"], "uploaded")
+        self.assertIsInstance(written[0]["timestamp"], datetime)
+        replayed.stop()
+
+    def test_update_while_writing_is_written_again(self):
+        release = threading.Event()
+        started = threading.Event()
+        batches = []
+
+        def write(sessions):
+            batches.append([dict(s) for s in sessions])
+            started.set()
+            release.wait(5)
+
+        queue = WriteBehindQueue(write, journal_path=self.journal, flush_ms=0)
+        queue.enqueue([_session("u")])
+        self.assertTrue(started.wait(5))
+        self.assertTrue(queue.update("u", upload_status="failed", upload_error="boom"))
+        release.set()
+        self.assertTrue(queue.flush(5))
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(batches[1][0]["upload_status"], "failed")
+        queue.stop()
+
+
+class TestWriteBehindEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.release = threading.Event()
+
+        def write(sessions):
+            self.release.wait(10)
+            app_module._write_pending(sessions)
+
+        self.queue = WriteBehindQueue(write, journal_path=os.path.join(self.tmp.name, "journal.jsonl"))
+        self.patch = patch.object(app_module, "write_behind", self.queue)
+        self.patch.start()
+        app.dependency_overrides = {verify_user: lambda: None}
+        self.client = TestClient(app)
+        self.uids = []
+
+    def tearDown(self):
+        self.release.set()
+        self.queue.stop()
+        self.patch.stop()
+        app.dependency_overrides = {}
+        with SessionLocal() as db:
+            db.query(DetectionObjects).filter(DetectionObjects.prediction_uid.in_(self.uids)).delete()
+            db.query(PredictionSession).filter(PredictionSession.uid.in_(self.uids)).delete()
+            db.commit()
+        self.tmp.cleanup()
+
+    def test_uid_visible_before_written(self):
+        image_bytes = io.BytesIO()
+        Image.new("RGB", (48, 48), color="teal").save(image_bytes, format="PNG")
+        response = self.client.post(
+            "/predict?dedup=false",
+            files={"file": ("wb.png", io.BytesIO(image_bytes.getvalue()), "image/png")},
+        )
+        self.assertEqual(response.status_code, 200)
+        uid = response.json()["prediction_uid"]
+        self.uids.append(uid)
+
+        with SessionLocal() as db:
+            self.assertIsNone(db.get(PredictionSession, uid))
+        pending = self.client.get(f"/prediction/{uid}")
+        self.assertEqual(pending.status_code, 200)
+        self.assertEqual(pending.json()["uid"], uid)
+
+        self.release.set()
+        self.assertTrue(self.queue.flush(10))
+        with SessionLocal() as db:
+            self.assertIsNotNone(db.get(PredictionSession, uid))
+        self.assertEqual(self.client.get(f"/prediction/{uid}").json()["uid"], uid)
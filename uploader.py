@@ -0,0 +1,70 @@
+# uploader.py
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+S3_UPLOAD_WORKERS = int(os.getenv("S3_UPLOAD_WORKERS", "8"))
+# sessions whose uploads may be queued or running at once; submit() blocks beyond this
+S3_UPLOAD_MAX_PENDING = int(os.getenv("S3_UPLOAD_MAX_PENDING", "256"))
+
+
+class BackgroundUploader:
+    """
+    Bounded pool that uploads the files of a prediction session in parallel
+    after the response has been sent.
+
+    upload(path, key) does a single transfer. When every file of a session has
+    finished, on_done(uid, error) is called with None or the first error message.
+    """
+
+    def __init__(self, upload, on_done, workers=S3_UPLOAD_WORKERS, max_pending=S3_UPLOAD_MAX_PENDING):
+        self.upload = upload
+        self.on_done = on_done
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="s3-upload")
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "uploaded": 0, "failed": 0, "in_flight": 0}
+
+    def submit(self, uid, files):
+        """
+        Queue the (path, key) pairs of one session; blocks while max_pending sessions are outstanding
+        """
+        files = list(files)
+        if not files:
+            return
+        self._slots.acquire()
+        state = {"remaining": len(files), "errors": []}
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["in_flight"] += 1
+
+        def finished(future):
+            error = future.exception()
+            with self._lock:
+                if error is not None:
+                    state["errors"].append(getattr(error, "detail", None) or str(error) or type(error).__name__)
+                state["remaining"] -= 1
+                if state["remaining"]:
+                    return
+            self._finish(uid, state["errors"])
+
+        for path, key in files:
+            self._executor.submit(self.upload, path, key).add_done_callback(finished)
+
+    def _finish(self, uid, errors):
+        error = errors[0] if errors else None
+        try:
+            self.on_done(uid, error)
+        finally:
+            with self._lock:
+                self._stats["in_flight"] -= 1
+                self._stats["failed" if error else "uploaded"] += 1
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,171 @@
+# worker_pool.py
+
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+# Model instance owned by each worker process
+_worker_model = None
+_worker_load_ms = None
+_WARMUP_ROUNDS = 10
+
+
+def _init_worker(weights, threads):
+    """
+    Process initializer: pin torch thread counts and load a private model copy
+    """
+    global _worker_model, _worker_load_ms
+    started = time.perf_counter()
+    import torch
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already set in this process
+    torch.cuda.is_available = lambda: False
+
+    from ultralytics import YOLO
+    _worker_model = YOLO(weights)
+    _worker_load_ms = round((time.perf_counter() - started) * 1000, 1)
+
+
+def _worker_warm_up(shape, runs, infer_kwargs):
+    image = np.zeros(shape, dtype=np.uint8)
+    started = time.perf_counter()
+    for _ in range(runs):
+        _worker_model([image], **infer_kwargs)
+    return os.getpid(), _worker_load_ms, round((time.perf_counter() - started) * 1000, 1)
+
+
+def _worker_names():
+    return dict(_worker_model.names)
+
+
+def _worker_ckpt_path():
+    return _worker_model.ckpt_path
+
+
+def _worker_predict(handles, infer_kwargs):
+    """
+    Attach to the shared-memory blocks, run one batched forward pass and
+    return a compact (N, 6) float32 array per image: x1, y1, x2, y2, conf, cls.
+    """
+    blocks = []
+    images = results = None
+    try:
+        images = []
+        for name, shape, dtype in handles:
+            shm = shared_memory.SharedMemory(name=name)
+            blocks.append(shm)
+            images.append(np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+        results = _worker_model(images, **infer_kwargs)
+        return [r.boxes.data.cpu().numpy().astype(np.float32) for r in results]
+    finally:
+        # drop every view onto the shared buffers before closing them
+        images = results = None
+        for shm in blocks:
+            shm.close()
+
+
+def load_image(source):
+    """
+    Decode a path into a BGR array (the layout ultralytics expects); arrays pass through
+    """
+    if isinstance(source, np.ndarray):
+        return source
+    image = cv2.imread(str(source))
+    if image is None:
+        raise ValueError(f"Could not decode image: {source}")
+    return image
+
+
+class ProcessInferencePool:
+    """
+    Runs inference in a pool of worker processes, each with its own model.
+
+    Decoded images are written into multiprocessing.shared_memory blocks and
+    only the block names travel to the worker, so frames are never pickled.
+    Workers send back compact box arrays, which are rebuilt into ultralytics
+    Results objects here so callers can use .boxes and .plot() as usual.
+    The pool is callable with a list of sources, like a YOLO model.
+    """
+
+    def __init__(self, weights, workers=1, threads_per_worker=1):
+        self.workers = max(1, int(workers))
+        self.threads_per_worker = max(1, int(threads_per_worker))
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(weights, self.threads_per_worker),
+        )
+        self._names = None
+
+    @property
+    def names(self):
+        if self._names is None:
+            self._names = self._executor.submit(_worker_names).result()
+        return self._names
+
+    @property
+    def ckpt_path(self):
+        """
+        Weights file the workers loaded (after any download)
+        """
+        return self._executor.submit(_worker_ckpt_path).result()
+
+    def warm_up(self, image, runs=1, **infer_kwargs):
+        """
+        Start every worker process (each loads its model in the initializer)
+        and run runs forward passes of a frame shaped like image in each.
+        Tasks go out in rounds of one per worker until every worker has
+        answered. Returns per-worker load and warm-up times in milliseconds.
+        """
+        slots = {}
+        for _ in range(_WARMUP_ROUNDS):
+            futures = [self._executor.submit(_worker_warm_up, image.shape, runs, infer_kwargs)
+                       for _ in range(self.workers)]
+            for future in futures:
+                pid, load_ms, warmup_ms = future.result()
+                slots.setdefault(pid, {"slot": f"worker-{pid}", "load_ms": load_ms, "warmup_ms": warmup_ms})
+            if len(slots) >= self.workers:
+                break
+        return list(slots.values())
+
+    def __call__(self, sources, **infer_kwargs):
+        from ultralytics.engine.results import Results
+        import torch
+
+        images = [load_image(s) for s in sources]
+        blocks = []
+        try:
+            handles = []
+            for image in images:
+                shm = shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1))
+                blocks.append(shm)
+                np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[...] = image
+                handles.append((shm.name, image.shape, image.dtype.str))
+            outputs = self._executor.submit(_worker_predict, handles, infer_kwargs).result()
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+        names = self.names
+        return [
+            Results(
+                orig_img=image,
+                path=source if isinstance(source, str) else "image.jpg",
+                names=names,
+                boxes=torch.from_numpy(data),
+            )
+            for source, image, data in zip(sources, images, outputs)
+        ]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,218 @@
+# write_behind.py
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "0") == "1"
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "256"))
+# how long the writer waits for more sessions before committing a partial batch
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "50"))
+WRITE_BEHIND_JOURNAL = os.getenv("WRITE_BEHIND_JOURNAL", "predictions.journal")
+WRITE_BEHIND_FSYNC = os.getenv("WRITE_BEHIND_FSYNC", "0") == "1"
+_RETRY_DELAY = 1.0
+
+
+class WriteBehindQueue:
+    """
+    Buffers finished prediction sessions in memory and stores them from a
+    single background writer thread, several sessions per transaction.
+
+    Every session is appended to a JSONL journal before it is buffered, and
+    the journal is replayed on start, so a crash loses nothing that enqueue()
+    accepted. The journal is truncated whenever the buffer drains, and
+    rewritten from the buffer if it grows large under sustained load.
+    write_batch(sessions) must tolerate sessions that are already stored.
+    """
+
+    def __init__(self, write_batch, journal_path=WRITE_BEHIND_JOURNAL, max_pending=WRITE_BEHIND_MAX_PENDING,
+                 batch_size=WRITE_BEHIND_BATCH_SIZE, flush_ms=WRITE_BEHIND_FLUSH_MS, fsync=WRITE_BEHIND_FSYNC):
+        self.write_batch = write_batch
+        self.journal_path = journal_path
+        self.max_pending = max(1, max_pending)
+        self.batch_size = max(1, batch_size)
+        self.flush_ms = flush_ms
+        self.fsync = fsync
+        # uid -> [session dict, version]; the version changes whenever the session is updated
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._journal = None
+        self._journal_entries = 0
+        self._stats = {"enqueued": 0, "written": 0, "batches": 0, "errors": 0}
+        self._replay()
+
+    def _replay(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # torn last line from a crash mid-append
+                    continue
+                if "session" in entry:
+                    session = entry["session"]
+                    if session.get("timestamp"):
+                        session["timestamp"] = datetime.fromisoformat(session["timestamp"])
+                    self._pending[session["uid"]] = [session, 0]
+                elif entry.get("uid") in self._pending:
+                    self._pending[entry["uid"]][0].update(entry["update"])
+        if self._pending:
+            logger.info("replaying %d sessions from %s", len(self._pending), self.journal_path)
+            self.start()
+
+    def _append(self, entries):
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a")
+        for entry in entries:
+            self._journal.write(json.dumps(entry, default=str) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._journal_entries += len(entries)
+
+    def _rewrite_journal(self):
+        # only the sessions still buffered; an empty buffer leaves an empty journal
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for session, _ in self._pending.values():
+                f.write(json.dumps({"session": session}, default=str) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+        self._journal_entries = len(self._pending)
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, sessions):
+        """
+        Buffer session dicts (as for repository.save_prediction_sessions, with
+        username and timestamp set); blocks while the buffer is full
+        """
+        self.start()
+        with self._cond:
+            while len(self._pending) + len(sessions) > self.max_pending and self._pending and not self._stopping:
+                self._cond.wait()
+            self._append([{"session": session} for session in sessions])
+            for session in sessions:
+                self._pending[session["uid"]] = [session, 0]
+            self._stats["enqueued"] += len(sessions)
+            self._cond.notify_all()
+
+    def get(self, uid):
+        """
+        Copy of a session that is not stored yet, or None
+        """
+        with self._cond:
+            entry = self._pending.get(uid)
+            return dict(entry[0]) if entry else None
+
+    def update(self, uid, **fields):
+        """
+        Change a session that is not stored yet; returns False if it is not
+        buffered (any more), in which case the caller updates the database
+        """
+        with self._cond:
+            entry = self._pending.get(uid)
+            if entry is None:
+                return False
+            self._append([{"uid": uid, "update": fields}])
+            entry[0].update(fields)
+            entry[1] += 1
+            return True
+
+    def wait_for(self, uid, timeout=5.0):
+        """
+        Block until uid has been written; returns False on timeout
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while uid in self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def flush(self, timeout=30.0):
+        """
+        Block until the buffer is empty; returns False on timeout
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                if len(self._pending) < self.batch_size and not self._stopping:
+                    # give concurrent requests a moment to join the batch
+                    self._cond.wait(self.flush_ms / 1000)
+                batch = [(uid, entry[1], dict(entry[0])) for uid, entry in list(self._pending.items())[:self.batch_size]]
+            try:
+                self.write_batch([session for _, _, session in batch])
+            except Exception:
+                logger.exception("write-behind batch of %d sessions failed, retrying", len(batch))
+                with self._cond:
+                    self._stats["errors"] += 1
+                    if self._stopping:
+                        return
+                    self._cond.wait(_RETRY_DELAY)
+                continue
+            with self._cond:
+                for uid, version, _ in batch:
+                    entry = self._pending.get(uid)
+                    # updated while being written: stays buffered and is written again
+                    if entry is not None and entry[1] == version:
+                        del self._pending[uid]
+                self._stats["written"] += len(batch)
+                self._stats["batches"] += 1
+                if not self._pending or self._journal_entries > 4 * self.max_pending:
+                    self._rewrite_journal()
+                self._cond.notify_all()
+
+    def stop(self, timeout=30.0):
+        """
+        Write everything still buffered and stop the writer
+        """
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+        return stats